@@ -0,0 +1,250 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+
+LINK_LAST_RE = re.compile(r'<[^>]*[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+
+class GitHubError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"GitHub API {status_code}: {message}")
+        self.status_code = status_code
+
+
+class ETagCache:
+    """
+    Bounded LRU of url -> (etag, decoded body) for conditional GETs.
+    A 304 answer doesn't count against the rate limit.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, etag: str, body: Any):
+        self._entries[key] = (etag, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class AsyncGitHubClient:
+    """
+    GitHub REST client over one persistent keep-alive connection pool.
+
+    - PR file lists are fully paginated; pages after the first are
+      fetched concurrently once the `Link` header gives the last page.
+    - GETs send `If-None-Match` and reuse the cached body on 304.
+    - Requests wait out an exhausted rate limit (`X-RateLimit-*`,
+      `Retry-After`) and retry 5xx with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        base_url: str = GITHUB_API_URL,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        timeout: float = 30.0,
+        per_page: int = 100,
+        max_concurrent_pages: int = 4,
+        max_retries: int = 3,
+        max_rate_limit_wait: float = 60.0,
+        etag_cache: Optional[ETagCache] = None,
+    ):
+        token = token if token is not None else os.getenv("GITHUB_TOKEN")
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+            ),
+        )
+        self.per_page = per_page
+        self.max_retries = max_retries
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self.etags = etag_cache or ETagCache()
+        self._page_slots = asyncio.Semaphore(max_concurrent_pages)
+
+        # Last seen rate-limit state, shared by every request
+        self.rate_remaining: Optional[int] = None
+        self.rate_reset_at: float = 0.0
+
+    async def __aenter__(self) -> "AsyncGitHubClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    # -----------------------------
+    # Endpoints
+    # -----------------------------
+
+    async def fetch_pr_files(self, owner: str, repo: str, pr_number: int) -> List[Dict]:
+        path = f"/repos/{owner}/{repo}/pulls/{pr_number}/files"
+
+        first_page, link = await self._get_json(path, page=1)
+        last_page = self._last_page(link)
+
+        if last_page <= 1:
+            return list(first_page)
+
+        rest = await asyncio.gather(*(
+            self._get_page(path, page) for page in range(2, last_page + 1)
+        ))
+
+        files = list(first_page)
+        for page in rest:
+            files.extend(page)
+        return files
+
+    async def update_pr_body(self, owner: str, repo: str, pr_number: int, body: str) -> Dict:
+        response = await self._request(
+            "PATCH", f"/repos/{owner}/{repo}/pulls/{pr_number}", json={"body": body}
+        )
+        return response.json()
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    async def _get_page(self, path: str, page: int) -> List[Dict]:
+        async with self._page_slots:
+            body, _ = await self._get_json(path, page=page)
+            return body
+
+    async def _get_json(self, path: str, page: int):
+        params = {"per_page": self.per_page, "page": page}
+        key = f"{path}?per_page={self.per_page}&page={page}"
+
+        headers = {}
+        cached = self.etags.get(key)
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        response = await self._request("GET", path, params=params, headers=headers)
+
+        if response.status_code == 304 and cached is not None:
+            return cached[1]
+
+        # The Link header is cached too: a 304 need not repeat it
+        result = (response.json(), response.headers.get("Link", ""))
+        etag = response.headers.get("ETag")
+        if etag:
+            self.etags.put(key, etag, result)
+        return result
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        attempt = 0
+
+        while True:
+            await self._wait_for_rate_limit()
+            response = await self._client.request(method, path, **kwargs)
+            self._record_rate_limit(response)
+
+            if response.status_code < 400:
+                return response
+
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt >= self.max_retries:
+                raise GitHubError(response.status_code, response.text[:200])
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _wait_for_rate_limit(self):
+        if self.rate_remaining != 0:
+            return
+        wait = self.rate_reset_at - time.time()
+        if wait > 0:
+            await asyncio.sleep(min(wait, self.max_rate_limit_wait))
+        self.rate_remaining = None
+
+    def _record_rate_limit(self, response: httpx.Response):
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None and remaining.isdigit():
+            self.rate_remaining = int(remaining)
+        if reset is not None and reset.isdigit():
+            self.rate_reset_at = float(reset)
+
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> Optional[float]:
+        status = response.status_code
+
+        if status in (403, 429):
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None and retry_after.isdigit():
+                return min(float(retry_after), self.max_rate_limit_wait)
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                wait = self.rate_reset_at - time.time()
+                return min(max(wait, 0.0), self.max_rate_limit_wait)
+            return None
+
+        if status >= 500:
+            return min(2.0 ** attempt * 0.5, self.max_rate_limit_wait)
+
+        return None
+
+    def _last_page(self, link: str) -> int:
+        match = LINK_LAST_RE.search(link)
+        return int(match.group(1)) if match else 1
+
+
+class GitHubClient:
+    """
+    Blocking facade for threaded callers. All threads share one
+    `AsyncGitHubClient` (and its connection pool) running on a private
+    event loop thread.
+    """
+
+    def __init__(self, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="github-client", daemon=True
+        )
+        self._thread.start()
+        self._client: AsyncGitHubClient = self._call(self._create(kwargs))
+
+    async def _create(self, kwargs) -> AsyncGitHubClient:
+        return AsyncGitHubClient(**kwargs)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def fetch_pr_files(self, owner: str, repo: str, pr_number: int) -> List[Dict]:
+        return self._call(self._client.fetch_pr_files(owner, repo, pr_number))
+
+    def update_pr_body(self, owner: str, repo: str, pr_number: int, body: str) -> Dict:
+        return self._call(self._client.update_pr_body(owner, repo, pr_number, body))
+
+    def close(self):
+        self._call(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
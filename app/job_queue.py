@@ -0,0 +1,411 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass
+class Job:
+    job_id: str
+    key: str
+    payload: Dict[str, Any]
+    status: str = "queued"  # queued | running | done | failed
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    run_after: float = 0.0
+    deadline: float = 0.0
+    # Set by claim(); identifies this run of the job to finish()
+    lease_until: float = 0.0
+    coalesced: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def public(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("payload")
+        return data
+
+
+def job_key(payload: Dict[str, Any]) -> str:
+    """
+    Jobs for the same (owner, repo, PR) coalesce. Payloads without a PR
+    number get a unique key and are never merged.
+    """
+    pr_number = payload.get("pr_number")
+    if pr_number is None:
+        return f"job:{uuid.uuid4().hex}"
+    return f"{payload.get('owner')}/{payload.get('repo')}#{pr_number}"
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+
+class InMemoryJobBackend:
+    """
+    Process-local queue; jobs are lost on restart.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._queued_by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, payload: Dict, now: float, debounce: float, max_delay: float) -> Job:
+        with self._lock:
+            job_id = self._queued_by_key.get(key)
+            if job_id is not None:
+                job = self._jobs[job_id]
+                job.payload = payload
+                job.coalesced += 1
+                job.updated_at = now
+                job.run_after = min(now + debounce, job.deadline)
+                return job
+
+            job = Job(
+                job_id=uuid.uuid4().hex,
+                key=key,
+                payload=payload,
+                created_at=now,
+                updated_at=now,
+                run_after=now + debounce,
+                deadline=now + max_delay,
+            )
+            self._jobs[job.job_id] = job
+            self._queued_by_key[key] = job.job_id
+            return job
+
+    def claim(self, now: float, lease: float) -> Optional[Job]:
+        with self._lock:
+            running_keys = {
+                j.key for j in self._jobs.values() if j.status == "running"
+            }
+            due = [
+                j for j in self._jobs.values()
+                if j.status == "queued"
+                and j.run_after <= now
+                and j.key not in running_keys
+            ]
+            if not due:
+                return None
+
+            job = min(due, key=lambda j: j.run_after)
+            job.status = "running"
+            job.updated_at = now
+            job.lease_until = now + lease
+            del self._queued_by_key[job.key]
+            return job
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        result=None,
+        error=None,
+        lease_until: Optional[float] = None,
+    ) -> bool:
+        with self._lock:
+            job = self._jobs[job_id]
+            if lease_until is not None and job.lease_until != lease_until:
+                return False
+            job.status = status
+            job.result = result
+            job.error = error
+            job.updated_at = time.time()
+            return True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def prune(self, older_than: float):
+        with self._lock:
+            for job_id in [
+                j.job_id for j in self._jobs.values()
+                if j.status in ("done", "failed") and j.updated_at < older_than
+            ]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobBackend:
+    """
+    Durable queue shared by every worker process on the host. A running
+    job whose lease expires (its process died) becomes claimable again;
+    the lease end doubles as the claim token, so only the latest claim
+    can finish the job.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=10.0, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " key TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " run_after REAL NOT NULL,"
+            " deadline REAL NOT NULL,"
+            " lease_until REAL NOT NULL DEFAULT 0,"
+            " coalesced INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT,"
+            " error TEXT)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, run_after)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+
+    def submit(self, key: str, payload: Dict, now: float, debounce: float, max_delay: float) -> Job:
+        encoded = json.dumps(payload)
+        with self._lock, self._transaction():
+            row = self._conn.execute(
+                "SELECT job_id, deadline FROM jobs WHERE key = ? AND status = 'queued'",
+                (key,),
+            ).fetchone()
+
+            if row is not None:
+                job_id, deadline = row
+                self._conn.execute(
+                    "UPDATE jobs SET payload = ?, updated_at = ?, run_after = ?,"
+                    " coalesced = coalesced + 1 WHERE job_id = ?",
+                    (encoded, now, min(now + debounce, deadline), job_id),
+                )
+            else:
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (job_id, key, payload, status, created_at,"
+                    " updated_at, run_after, deadline)"
+                    " VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                    (job_id, key, encoded, now, now, now + debounce, now + max_delay),
+                )
+
+            return self._get(job_id)
+
+    def claim(self, now: float, lease: float) -> Optional[Job]:
+        with self._lock, self._transaction():
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs AS j"
+                " WHERE ((status = 'queued' AND run_after <= ?)"
+                "        OR (status = 'running' AND lease_until < ?))"
+                " AND NOT EXISTS (SELECT 1 FROM jobs AS r WHERE r.key = j.key"
+                "   AND r.status = 'running' AND r.lease_until >= ?"
+                "   AND r.job_id != j.job_id)"
+                " ORDER BY run_after LIMIT 1",
+                (now, now, now),
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ?, lease_until = ?"
+                " WHERE job_id = ?",
+                (now, now + lease, row[0]),
+            )
+            return self._get(row[0])
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        result=None,
+        error=None,
+        lease_until: Optional[float] = None,
+    ) -> bool:
+        """
+        Records the outcome. With `lease_until` (from claim()), a run
+        whose job was reclaimed in the meantime changes nothing and
+        gets False.
+        """
+        query = (
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?"
+            " WHERE job_id = ?"
+        )
+        params = [
+            status,
+            json.dumps(result) if result is not None else None,
+            error,
+            time.time(),
+            job_id,
+        ]
+        if lease_until is not None:
+            query += " AND status = 'running' AND lease_until = ?"
+            params.append(lease_until)
+
+        with self._lock:
+            return self._conn.execute(query, params).rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._get(job_id)
+
+    def prune(self, older_than: float):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (older_than,),
+            )
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _transaction(self):
+        conn = self._conn
+
+        class _Tx:
+            def __enter__(self):
+                conn.execute("BEGIN IMMEDIATE")
+
+            def __exit__(self, exc_type, *_):
+                conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+        return _Tx()
+
+    def _get(self, job_id: str) -> Optional[Job]:
+        row = self._conn.execute(
+            "SELECT job_id, key, payload, status, created_at, updated_at,"
+            " run_after, deadline, lease_until, coalesced, result, error"
+            " FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        return Job(
+            job_id=row[0],
+            key=row[1],
+            payload=json.loads(row[2]),
+            status=row[3],
+            created_at=row[4],
+            updated_at=row[5],
+            run_after=row[6],
+            deadline=row[7],
+            lease_until=row[8],
+            coalesced=row[9],
+            result=json.loads(row[10]) if row[10] is not None else None,
+            error=row[11],
+        )
+
+
+# -----------------------------
+# Queue + worker pool
+# -----------------------------
+
+class JobQueue:
+    """
+    Debounced, per-PR coalescing job queue drained by a pool of worker
+    threads. Jobs for one PR never run concurrently; pushes that arrive
+    while a job is still queued replace its payload, so only the latest
+    head is generated.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict], Dict],
+        backend=None,
+        workers: int = 2,
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        lease: float = 600.0,
+        poll_interval: float = 0.5,
+        retention: float = 3600.0,
+    ):
+        self.handler = handler
+        self.backend = backend or InMemoryJobBackend()
+        self.workers = workers
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retention = retention
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    @classmethod
+    def from_env(cls, handler: Callable[[Dict], Dict]) -> "JobQueue":
+        backend = None
+        if os.getenv("PR_QUEUE_BACKEND", "memory") == "sqlite":
+            backend = SQLiteJobBackend(os.getenv("PR_QUEUE_DB", "pr_jobs.sqlite3"))
+
+        return cls(
+            handler,
+            backend=backend,
+            workers=int(os.getenv("PR_QUEUE_WORKERS", 2)),
+            debounce=float(os.getenv("PR_QUEUE_DEBOUNCE", 2.0)),
+            max_delay=float(os.getenv("PR_QUEUE_MAX_DELAY", 30.0)),
+        )
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"pr-job-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, payload: Dict) -> Job:
+        job = self.backend.submit(
+            job_key(payload), payload, time.time(), self.debounce, self.max_delay
+        )
+        self._wake.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.backend.get(job_id)
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _work(self):
+        last_prune = time.time()
+
+        while not self._stopping.is_set():
+            now = time.time()
+            job = self.backend.claim(now, self.lease)
+
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                if now - last_prune > self.retention:
+                    self.backend.prune(now - self.retention)
+                    last_prune = now
+                continue
+
+            # A run that outlived its lease was reclaimed: finish() then
+            # leaves the newer run's outcome alone
+            try:
+                result = self.handler(job.payload)
+            except Exception as exc:
+                self.backend.finish(
+                    job.job_id,
+                    "failed",
+                    error=f"{type(exc).__name__}: {exc}",
+                    lease_until=job.lease_until,
+                )
+            else:
+                self.backend.finish(
+                    job.job_id, "done", result=result, lease_until=job.lease_until
+                )
@@ -1,18 +1,62 @@
-from fastapi import FastAPI, Request
-from app.pr_control import pr_controller
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from app.pr_control import check_local_diff, close_github_client, is_local_diff, pr_controller
+from app.job_queue import JobQueue
+from pr.api import PROMETHEUS_CONTENT_TYPE, metrics_registry
 
 app = FastAPI(title="Auto PR Writer")
 
+# Generation runs in background workers; see app/job_queue.py
+job_queue = JobQueue.from_env(pr_controller)
 
-@app.post("/pr-gen")
+
+@app.on_event("startup")
+def start_job_queue():
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+def stop_job_queue():
+    job_queue.stop()
+    close_github_client()
+
+
+@app.post("/pr-gen", status_code=202)
 def pr_gen_handler(payload: dict):
-    return pr_controller(payload)
+    # Checked again by the worker; rejecting here gives the caller a 400
+    if is_local_diff(payload):
+        try:
+            check_local_diff(payload)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    job = job_queue.submit(payload)
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job.job_id,
+            "status": job.status,
+            "status_url": f"/pr-gen/jobs/{job.job_id}",
+        },
+    )
 
 @app.get("/pr-gen")
 def pr_gen_health():
     return {"status": "ok"}
 
 
+@app.get("/pr-gen/jobs/{job_id}")
+def pr_gen_job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.public()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.get("/")
 def health_check():
     return {"status": "running"}
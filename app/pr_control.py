@@ -1,40 +1,150 @@
-from pr.api import generate_pr_markdown
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.github_client import GitHubClient
+from pr.api import (
+    Deadline,
+    endpoint_budget_ms,
+    generate_pr_markdown,
+    metrics_registry,
+    templates,
+)
+from pr.git_source import GitDiffSource, check_ref
+
+
+# git processes per local diff (see GitDiffSource)
+GIT_DIFF_WORKERS = int(os.getenv("PR_GIT_DIFF_WORKERS", 1))
+
+# Directories payload["repo_path"] must lie under, separated by os.pathsep
+# (PR_GIT_REPO_ROOTS). Unset: local diffs are refused
+GIT_REPO_ROOTS = tuple(
+    os.path.realpath(root)
+    for root in os.getenv("PR_GIT_REPO_ROOTS", "").split(os.pathsep)
+    if root
+)
+
+# PR_TIME_BUDGET_MS_PR_GEN; payload["time_budget_ms"] may lower it
+PR_GEN_BUDGET_MS = endpoint_budget_ms("pr_gen")
+
+
+def check_local_diff(payload: dict) -> str:
+    """
+    Validates a local-diff payload; returns the resolved repo_path.
+    Raises ValueError for refs git could take as options and for
+    checkouts outside GIT_REPO_ROOTS.
+    """
+    check_ref(payload["base"])
+    check_ref(payload["head"])
+    repo_path = os.path.realpath(payload["repo_path"])
+    for root in GIT_REPO_ROOTS:
+        if os.path.commonpath((root, repo_path)) == root:
+            return repo_path
+    raise ValueError(f"repo_path is not under PR_GIT_REPO_ROOTS: {payload['repo_path']}")
+
+
+def is_local_diff(payload: dict) -> bool:
+    return bool(payload.get("repo_path") and payload.get("base") and payload.get("head"))
+
+
+# Shared by every job worker thread (one connection pool); created on
+# first use
+_github_lock = threading.Lock()
+_github: Optional[GitHubClient] = None
+
+
+def github_client() -> GitHubClient:
+    global _github
+
+    with _github_lock:
+        if _github is None:
+            _github = GitHubClient()
+        return _github
+
+
+def close_github_client():
+    global _github
+
+    with _github_lock:
+        if _github is not None:
+            _github.close()
+            _github = None
+
+
+def github_diff(pr_files: List[Dict]) -> str:
+    """
+    Unified diff rebuilt from GitHub "files" API entries. Entries without
+    a `patch` (binary or too large for the API) are left out.
+    """
+    parts = []
+    for entry in pr_files:
+        patch = entry.get("patch")
+        if patch is None:
+            continue
+        new = entry["filename"]
+        old = entry.get("previous_filename") or new
+        status = entry.get("status")
+        parts.append(
+            f"diff --git a/{old} b/{new}\n"
+            f"--- {'/dev/null' if status == 'added' else 'a/' + old}\n"
+            f"+++ {'/dev/null' if status == 'removed' else 'b/' + new}\n"
+            f"{patch}\n"
+        )
+    return "".join(parts)
 
 
 def pr_controller(payload: dict):
 
     owner = payload["owner"]
     repo = payload["repo"]
-    git_diff_text = payload["diff"]
     files = payload.get("files", [])
+    gitattributes = payload.get("gitattributes")
+
+    # Self-hosted runners already have the checkout: diff it locally
+    # instead of receiving the diff text
+    if is_local_diff(payload):
+        diff_source = GitDiffSource(
+            check_local_diff(payload),
+            payload["base"],
+            payload["head"],
+            paths=[f if isinstance(f, str) else f.get("filename") for f in files],
+            workers=GIT_DIFF_WORKERS,
+        )
+        if gitattributes is None:
+            gitattributes = diff_source.gitattributes()
+    elif "diff" in payload:
+        diff_source = payload["diff"]
+    else:
+        # Webhook payloads may only name the PR: fetch its patches
+        diff_source = github_diff(
+            github_client().fetch_pr_files(owner, repo, payload["pr_number"])
+        )
 
     # pr_title = payload.get("pr_title", "Auto Generated PR")
     # base = payload.get("base", "main")
     # head = payload.get("head")
 
-    template = """
-                ## Summary
-                {{change}}
-
-                ## Context
-                {{context}}
-
-                ## Impact
-                {{impact}}
-
-                ## Checklist
-                {{checklist}}
-                """
+    # Compiled once; per-repo overrides live in pr/templates/repos/<owner>/<repo>/
+    template = templates.get("webhook", repo=f"{owner}/{repo}")
 
-    pr_content = generate_pr_markdown(
-        diff_text=git_diff_text,
-        files=files,
-        payload={
-            "owner": owner,
-            "repo": repo,
-        },
-        template=template
-    )
+    started = time.perf_counter()
+    deadline = Deadline.for_request(PR_GEN_BUDGET_MS, payload.get("time_budget_ms"))
+    with metrics_registry.collect() as request:
+        result = generate_pr_markdown(
+            diff_text=diff_source,
+            issue=payload.get("issue") or payload.get("pr_title", ""),
+            files=files,
+            payload={
+                "owner": owner,
+                "repo": repo,
+            },
+            template=template,
+            gitattributes=gitattributes,
+            deadline=deadline,
+        )
+    metrics_registry.record(request, "pr_gen", time.perf_counter() - started)
+    pr_content = result.markdown
 
     # update_pr_body(owner, repo, pr_number, pr_content)
 
@@ -42,5 +152,7 @@ def pr_controller(payload: dict):
         "status": "success",
         "repo": f"{owner}/{repo}",
         "pr_content": pr_content,
+        "partial": result.partial,
+        "timings": request.to_dict()["stages"] if request is not None else {},
     }
 
@@ -0,0 +1,79 @@
+"""
+Measures what the pipeline's metrics instrumentation costs.
+
+Reports the per-call cost of `metrics.stage()` outside a request (the
+disabled path), inside a collecting request, and the end-to-end
+`generate_pr_markdown` time for one synthetic diff with collection off
+and on.
+
+    python benchmarks/metrics_overhead.py --case medium
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "pr"))
+
+from metrics import MetricsRegistry, stage  # noqa: E402
+from pipeline import generate_pr_markdown  # noqa: E402
+
+from synthetic_diff import MATRIX, make_diff  # noqa: E402
+
+
+def stage_cost(calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        with stage("bench"):
+            pass
+    return (time.perf_counter() - started) / calls
+
+
+def pipeline_times(diff_text: str, registries, repeat: int):
+    """
+    Best time per registry; runs are interleaved so drift and warm-up
+    don't favour either side.
+    """
+    best = [float("inf")] * len(registries)
+    for _ in range(repeat):
+        for i, registry in enumerate(registries):
+            # Don't bill one side for collecting the other's garbage
+            gc.collect()
+            started = time.perf_counter()
+            with registry.collect():
+                generate_pr_markdown(diff_text, "Fix crash on empty cache")
+            best[i] = min(best[i], time.perf_counter() - started)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--case", default="medium")
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    disabled = MetricsRegistry(enabled=False)
+    enabled = MetricsRegistry(enabled=True)
+
+    with disabled.collect():
+        noop = stage_cost(args.calls)
+    with enabled.collect():
+        timed = stage_cost(args.calls)
+
+    spec = next(spec for spec in MATRIX if spec.name == args.case)
+    diff_text = make_diff(spec)
+    off, on = pipeline_times(diff_text, (disabled, enabled), args.repeat)
+
+    print(f"stage() disabled: {noop * 1e9:8.0f} ns/call")
+    print(f"stage() enabled:  {timed * 1e9:8.0f} ns/call")
+    print(f"pipeline ({spec.name}) off: {off * 1000:.1f} ms, on: {on * 1000:.1f} ms "
+          f"({(on - off) / off:+.2%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
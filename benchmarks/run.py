@@ -0,0 +1,406 @@
+"""
+Stage-level benchmarks for the PR pipeline.
+
+Each case of the synthetic diff matrix is pushed through the pipeline
+one stage at a time (parse, semantics, issue, classify, writers,
+markdown). Per stage we record the best wall time over `--repeat` runs,
+the peak RSS and, in a separate traced run, the peak and retained
+Python allocations. Each case runs in a fresh interpreter, so its peak
+RSS doesn't depend on the cases before it. Results are written as JSON
+and optionally compared against a stored baseline; any regression
+beyond the thresholds makes the run exit with status 1.
+`--update-baseline` replaces only the cases that were run.
+
+The gate compares best times, so `--compare` measures at least
+GATE_REPEAT runs whatever `--repeat` says. Wall times are also scaled
+by a calibration loop timed in both runs (`meta.calibration_s`), so a
+host that is slower or busier than when the baseline was recorded
+doesn't show up as a regression.
+
+Each case also reports semantics throughput in changed lines per second;
+the `lang_*` cases run the same diff shape per language, so
+`--cases lang_python,lang_javascript,lang_go,lang_yaml` compares the
+rule sets (YAML has none and takes the counts-only path).
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --compare benchmarks/baseline.json
+    python benchmarks/run.py --cases tiny,medium --update-baseline
+    python benchmarks/run.py --full --no-alloc      # includes 500 MB
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "pr"))
+
+from core.change_classifier import ChangeClassifier  # noqa: E402
+from core.diff_parser import GitDiffParser  # noqa: E402
+from core.diff_semantics import DiffSemanticAnalyzer  # noqa: E402
+from core.impact_analyzer import ImpactAnalyzer  # noqa: E402
+from core.issue_parser import IssueParser  # noqa: E402
+from explanation.change_writer import ChangeWriter  # noqa: E402
+from explanation.context_writer import ContextWriter  # noqa: E402
+from explanation.impact_writer import ImpactWriter  # noqa: E402
+from formatter.checklist_builder import ChecklistBuilder  # noqa: E402
+from formatter.markdown_builder import MarkdownBuilder  # noqa: E402
+from formatter.template_registry import TemplateRegistry  # noqa: E402
+
+from synthetic_diff import MATRIX, DiffSpec, make_diff  # noqa: E402
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+ISSUE_TEXT = (
+    "Fix crash when the cache is empty\n\n"
+    "The worker raises KeyError on startup if no entries exist. "
+    "It must not change the public API and should stay backward compatible."
+)
+
+# Relative increase over baseline that counts as a regression
+DEFAULT_THRESHOLDS = {
+    "wall_s": 0.25,
+    "peak_rss_bytes": 0.25,
+    "alloc_peak_bytes": 0.25,
+    # Stages faster than this are too noisy to gate on
+    "min_wall_s": 0.02,
+}
+
+METRICS = ("wall_s", "peak_rss_bytes", "alloc_peak_bytes")
+
+# Fewest runs a gated wall time is the best of
+GATE_REPEAT = 3
+
+
+# -----------------------------
+# Stages
+# -----------------------------
+
+def pipeline_stages(diff_text: str) -> List[Tuple[str, Callable[[Dict], object]]]:
+    """
+    The pipeline of `pipeline.build_result`, split into separately timed
+    steps. Each step reads its inputs from, and writes its output to, a
+    shared state dict.
+    """
+    template = TemplateRegistry().get("base")
+
+    def parse(state):
+        parser = GitDiffParser(diff_text)
+        state["parsed"] = parser.parse()
+        state["stats"] = parser.stats.build()
+
+    def semantics(state):
+        state["semantics"] = DiffSemanticAnalyzer(state["parsed"]).analyze()
+
+    def issue(state):
+        state["issue"] = IssueParser(ISSUE_TEXT).parse()
+
+    def classify(state):
+        state["classification"] = ChangeClassifier(
+            state["issue"], state["semantics"]
+        ).classify()
+
+    def writers(state):
+        classification = state["classification"]
+        impact = ImpactAnalyzer(state["stats"])
+        state["sections"] = {
+            "context": ContextWriter(state["issue"], classification).write(),
+            "changes": ChangeWriter(state["semantics"]).write(),
+            "impact": ImpactWriter(impact, classification).write(),
+            "checklist": ChecklistBuilder(classification).build(),
+        }
+
+    def markdown(state):
+        state["markdown"] = MarkdownBuilder(template).build(state["sections"])
+
+    return [
+        ("parse", parse),
+        ("semantics", semantics),
+        ("issue", issue),
+        ("classify", classify),
+        ("writers", writers),
+        ("markdown", markdown),
+    ]
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+
+def run_case(spec: DiffSpec, repeat: int, trace_alloc: bool) -> Dict:
+    started = time.perf_counter()
+    diff_text = make_diff(spec)
+    generate_s = time.perf_counter() - started
+
+    stages = pipeline_stages(diff_text)
+    results: Dict[str, Dict] = {name: {} for name, _ in stages}
+
+    for _ in range(repeat):
+        state: Dict = {}
+        for name, step in stages:
+            _reset_peak_rss()
+            started = time.perf_counter()
+            step(state)
+            elapsed = time.perf_counter() - started
+
+            stage = results[name]
+            stage["wall_s"] = min(stage.get("wall_s", elapsed), elapsed)
+            stage["peak_rss_bytes"] = max(stage.get("peak_rss_bytes", 0), _peak_rss())
+
+    if trace_alloc:
+        state = {}
+        tracemalloc.start()
+        try:
+            for name, step in stages:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                step(state)
+                after, peak = tracemalloc.get_traced_memory()
+                results[name]["alloc_peak_bytes"] = peak - before
+                results[name]["alloc_net_bytes"] = after - before
+        finally:
+            tracemalloc.stop()
+
+    parsed = state.get("parsed") or {}
+    changed = sum(f.additions + f.deletions for f in parsed.values())
+    semantics_s = results["semantics"]["wall_s"]
+    return {
+        "input": {
+            "bytes": len(diff_text.encode("utf-8")),
+            "files": spec.files,
+            "lines": diff_text.count("\n"),
+            "parsed_files": len(parsed),
+            "long_lines": spec.long_lines,
+            "crlf": spec.crlf,
+            "renames": spec.renames,
+            "language": spec.language,
+            "changed_lines": changed,
+            "generate_s": round(generate_s, 4),
+        },
+        "stages": results,
+        "throughput": {
+            "semantics_lines_per_s": round(changed / semantics_s) if semantics_s else None,
+        },
+    }
+
+
+def calibrate(repeat: int) -> float:
+    """
+    Best time of a fixed string-processing loop that doesn't touch the
+    pipeline, as a measure of how fast the host is right now.
+    """
+    text = "\n".join(f"+    value = compute(item, {i})  # step {i}" for i in range(50000))
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for line in text.split("\n"):
+            line[1:].strip().split()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_case_isolated(spec: DiffSpec, repeat: int, trace_alloc: bool) -> Dict:
+    """
+    `run_case` in a child interpreter: memory retained by earlier cases
+    (arenas, caches) would otherwise inflate this case's peak RSS.
+    """
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--cases", spec.name, "--repeat", str(repeat), "--in-process",
+    ]
+    if not trace_alloc:
+        command.append("--no-alloc")
+
+    child = subprocess.run(command, capture_output=True, text=True)
+    if child.returncode != 0:
+        raise RuntimeError(f"case {spec.name} failed:\n{child.stderr}")
+    return json.loads(child.stdout)["cases"][spec.name]
+
+
+def _reset_peak_rss():
+    # Linux only: resets VmHWM so each stage gets its own high-water mark
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # Process lifetime peak; KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# -----------------------------
+# Baseline comparison
+# -----------------------------
+
+def compare(results: Dict, baseline: Dict, thresholds: Dict) -> List[str]:
+    """
+    Returns one message per stage metric that regressed past its
+    threshold. Cases or stages missing from either side are ignored.
+    """
+    regressions = []
+    speed = host_speed(results, baseline)
+
+    for case, current in results["cases"].items():
+        reference = baseline.get("cases", {}).get(case)
+        if reference is None:
+            continue
+
+        for stage, metrics in current["stages"].items():
+            base_metrics = reference["stages"].get(stage)
+            if base_metrics is None:
+                continue
+
+            for metric in METRICS:
+                new, old = metrics.get(metric), base_metrics.get(metric)
+                if new is None or not old:
+                    continue
+                if metric == "wall_s":
+                    old *= speed
+                if metric == "wall_s" and max(new, old) < thresholds["min_wall_s"]:
+                    continue
+
+                change = (new - old) / old
+                if change > thresholds[metric]:
+                    regressions.append(
+                        f"{case}/{stage} {metric}: {old:.6g} -> {new:.6g} "
+                        f"(+{change:.0%}, limit +{thresholds[metric]:.0%})"
+                    )
+
+    return regressions
+
+
+def host_speed(results: Dict, baseline: Dict) -> float:
+    """
+    How much slower the host ran `results` than `baseline` (1.0 when
+    either run has no calibration).
+    """
+    new = results.get("meta", {}).get("calibration_s")
+    old = baseline.get("meta", {}).get("calibration_s")
+    return new / old if new and old else 1.0
+
+
+def _thresholds(args, baseline: Optional[Dict]) -> Dict:
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if baseline:
+        thresholds.update(baseline.get("thresholds", {}))
+    for metric in thresholds:
+        value = getattr(args, f"max_{metric}", None)
+        if value is not None:
+            thresholds[metric] = value
+    return thresholds
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", help="comma-separated case names (default: all fast cases)")
+    parser.add_argument("--full", action="store_true", help="include the slow multi-100MB cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--in-process", action="store_true", help="run all cases in this process (RSS then depends on case order)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="baseline JSON to gate against")
+    parser.add_argument("--update-baseline", nargs="?", const=DEFAULT_BASELINE, help="store results as the new baseline")
+    parser.add_argument("--max-wall-s", dest="max_wall_s", type=float, help="allowed relative wall time increase")
+    parser.add_argument("--max-peak-rss", dest="max_peak_rss_bytes", type=float, help="allowed relative RSS increase")
+    parser.add_argument("--max-alloc-peak", dest="max_alloc_peak_bytes", type=float, help="allowed relative allocation increase")
+    parser.add_argument("--min-wall-s", dest="max_min_wall_s", type=float, help="ignore stages faster than this")
+    args = parser.parse_args(argv)
+
+    specs = [spec for spec in MATRIX if args.full or not spec.slow]
+    if args.cases:
+        wanted = set(args.cases.split(","))
+        specs = [spec for spec in MATRIX if spec.name in wanted]
+        unknown = wanted - {spec.name for spec in specs}
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    repeat = max(args.repeat, GATE_REPEAT) if args.compare else args.repeat
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "repeat": repeat,
+            "calibration_s": calibrate(max(repeat, GATE_REPEAT)),
+        },
+        "cases": {},
+    }
+
+    for spec in specs:
+        measure = run_case if args.in_process else run_case_isolated
+        case = measure(spec, repeat, trace_alloc=not args.no_alloc)
+        results["cases"][spec.name] = case
+        stages = ", ".join(
+            f"{name} {stage['wall_s'] * 1000:.1f}ms" for name, stage in case["stages"].items()
+        )
+        mb = case["input"]["bytes"] / 1e6
+        rate = case["throughput"]["semantics_lines_per_s"]
+        if rate:
+            stages += f"  ({rate / 1e6:.2f}M lines/s)"
+        print(f"{spec.name:16s} {mb:9.2f} MB  {stages}", file=sys.stderr)
+
+    if args.output:
+        _write_json(args.output, results)
+
+    status = 0
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, _thresholds(args, baseline))
+        print(f"host speed vs baseline: x{host_speed(results, baseline):.2f} wall time", file=sys.stderr)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    if args.update_baseline:
+        previous = {}
+        if os.path.exists(args.update_baseline):
+            with open(args.update_baseline, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        # Cases that weren't run keep their previous numbers
+        baseline = dict(results)
+        baseline["cases"] = {**previous.get("cases", {}), **results["cases"]}
+        baseline["thresholds"] = previous.get("thresholds", DEFAULT_THRESHOLDS)
+        _write_json(args.update_baseline, baseline)
+
+    if not args.output and not args.update_baseline:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    return status
+
+
+def _write_json(path: str, data: Dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Deterministic synthetic unified diffs for the benchmark suite.
+
+Output looks like `git diff` of Python sources: `diff --git` / `index`
+headers, hunks with `@@ ... @@ def name(...)` section headers and a mix
+of context, added and removed lines (control flow, returns, comments),
+optional CRLF line endings, very long lines and pure renames. The
+`lang_*` cases emit JavaScript, Go or YAML instead (see LANGUAGES).
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Iterator, List
+
+
+@dataclass
+class DiffSpec:
+    name: str
+    target_bytes: int
+    files: int
+    long_lines: bool = False
+    crlf: bool = False
+    renames: bool = False
+    # Key of LANGUAGES
+    language: str = "python"
+    seed: int = 1
+    # Excluded from the default matrix (minutes of runtime, GBs of RAM)
+    slow: bool = False
+
+
+# Sizes span 1 KB to 500 MB and 1 to 50k files
+MATRIX: List[DiffSpec] = [
+    DiffSpec("tiny", target_bytes=1_000, files=1),
+    DiffSpec("small", target_bytes=100_000, files=10),
+    DiffSpec("medium", target_bytes=5_000_000, files=500),
+    DiffSpec("many_files", target_bytes=20_000_000, files=50_000),
+    DiffSpec("long_lines", target_bytes=10_000_000, files=50, long_lines=True),
+    DiffSpec("crlf", target_bytes=5_000_000, files=200, crlf=True),
+    DiffSpec("renames", target_bytes=2_000_000, files=10_000, renames=True),
+    # Same shape in each language, for semantics throughput per language
+    DiffSpec("lang_python", target_bytes=2_000_000, files=100),
+    DiffSpec("lang_javascript", target_bytes=2_000_000, files=100, language="javascript"),
+    DiffSpec("lang_go", target_bytes=2_000_000, files=100, language="go"),
+    DiffSpec("lang_yaml", target_bytes=2_000_000, files=100, language="yaml"),
+    DiffSpec("large", target_bytes=100_000_000, files=5_000, slow=True),
+    DiffSpec("huge", target_bytes=500_000_000, files=20_000, slow=True),
+]
+
+LONG_LINE_WIDTH = 4_000
+
+STATEMENTS = (
+    "value = compute(item, {n})",
+    "if value > {n}:",
+    "    return value",
+    "for item in items[{n}:]:",
+    "while retries < {n}:",
+    "result.append(item)",
+    "raise ValueError('bad input {n}')",
+    "try:",
+    "except KeyError:",
+    "logger.debug('step %d', {n})",
+    "# note {n}",
+    "total = total + item * {n}",
+    "pass",
+    "",
+)
+
+JAVASCRIPT_STATEMENTS = (
+    "const value = compute(item, {n});",
+    "if (value > {n}) {{",
+    "  return value;",
+    "for (const item of items.slice({n})) {{",
+    "while (retries < {n}) {{",
+    "result.push(item);",
+    "throw new Error('bad input {n}');",
+    "try {{",
+    "}} catch (err) {{",
+    "logger.debug('step %d', {n});",
+    "// note {n}",
+    "total = total + item * {n};",
+    "}}",
+    "",
+)
+
+GO_STATEMENTS = (
+    "value := compute(item, {n})",
+    "if value > {n} {{",
+    "    return value, nil",
+    "for _, item := range items[{n}:] {{",
+    "for retries < {n} {{",
+    "result = append(result, item)",
+    "return nil, fmt.Errorf(\"bad input {n}\")",
+    "defer cleanup()",
+    "if err != nil && retries > {n} {{",
+    "log.Printf(\"step %d\", {n})",
+    "// note {n}",
+    "total = total + item*{n}",
+    "}}",
+    "",
+)
+
+YAML_STATEMENTS = (
+    "value: {n}",
+    "if: ${{{{ always() }}}}",
+    "  return: value",
+    "for: items-{n}",
+    "- run: make test-{n}",
+    "  name: step {n}",
+    "# note {n}",
+    "retries: {n}",
+    "enabled: true",
+    "",
+)
+
+# language -> (file extension, hunk section header, statements)
+LANGUAGES = {
+    "python": (".py", "def func_{n}(self, items):", STATEMENTS),
+    "javascript": (".js", "function func_{n}(items) {{", JAVASCRIPT_STATEMENTS),
+    "go": (".go", "func (s *Server) func{n}(items []int) (int, error) {{", GO_STATEMENTS),
+    # No analysis rules: counted only
+    "yaml": (".yaml", "", YAML_STATEMENTS),
+}
+
+
+def iter_diff(spec: DiffSpec) -> Iterator[str]:
+    """
+    Yields the diff one file section at a time, so callers can stream
+    multi-hundred-megabyte inputs without holding them twice.
+    """
+    rng = random.Random(spec.seed)
+    newline = "\r\n" if spec.crlf else "\n"
+    per_file = max(spec.target_bytes // max(spec.files, 1), 1)
+
+    for index in range(spec.files):
+        path = f"src/pkg{index % 97}/module_{index}{LANGUAGES[spec.language][0]}"
+
+        if spec.renames:
+            yield newline.join((
+                f"diff --git a/{path} b/{path}.renamed",
+                "similarity index 100%",
+                f"rename from {path}",
+                f"rename to {path}.renamed",
+                "",
+            ))
+            continue
+
+        yield _file_section(rng, spec, path, per_file, newline)
+
+
+def make_diff(spec: DiffSpec) -> str:
+    return "".join(iter_diff(spec))
+
+
+# -----------------------------
+# Internal helpers
+# -----------------------------
+
+def _file_section(
+    rng: random.Random,
+    spec: DiffSpec,
+    path: str,
+    budget: int,
+    newline: str,
+) -> str:
+    lines = [
+        f"diff --git a/{path} b/{path}",
+        f"index {rng.getrandbits(28):07x}..{rng.getrandbits(28):07x} 100644",
+        f"--- a/{path}",
+        f"+++ b/{path}",
+    ]
+    size = sum(len(line) + 1 for line in lines)
+    old_line = new_line = 1
+
+    while True:
+        old_line += rng.randint(5, 60)
+        new_line = old_line + rng.randint(-3, 3)
+        body, removed, added = _hunk_body(rng, spec)
+        header = f"@@ -{old_line},{removed} +{max(new_line, 1)},{added} @@"
+        section = LANGUAGES[spec.language][1]
+        if section:
+            header += " " + section.format(n=old_line)
+        lines.append(header)
+        lines.extend(body)
+        size += len(header) + 1 + sum(len(line) + 1 for line in body)
+        old_line += removed
+
+        if size >= budget:
+            break
+
+    lines.append("")
+    return newline.join(lines)
+
+
+def _hunk_body(rng: random.Random, spec: DiffSpec):
+    body = []
+    removed = added = 0
+
+    for _ in range(3):
+        body.append(" " + _statement(rng, spec))
+
+    for _ in range(rng.randint(1, 8)):
+        kind = rng.random()
+        if kind < 0.45:
+            body.append("+" + _statement(rng, spec))
+            added += 1
+        elif kind < 0.8:
+            body.append("-" + _statement(rng, spec))
+            removed += 1
+        else:
+            body.append(" " + _statement(rng, spec))
+            removed += 1
+            added += 1
+
+    for _ in range(3):
+        body.append(" " + _statement(rng, spec))
+
+    return body, removed + 6, added + 6
+
+
+def _statement(rng: random.Random, spec: DiffSpec) -> str:
+    statements = LANGUAGES[spec.language][2]
+    line = "        " + rng.choice(statements).format(n=rng.randint(0, 999))
+    if spec.long_lines and rng.random() < 0.3:
+        line += "  # " + "x" * LONG_LINE_WIDTH
+    return line
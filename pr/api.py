@@ -1,98 +1,317 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+import time
+from contextlib import suppress
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from core.deadline import Deadline, endpoint_budget_ms
+from core.diff_parser import iter_byte_lines
+from metrics import PROMETHEUS_CONTENT_TYPE, count, current_request, registry, stage
+from pipeline import DiffSource, generate_pr_markdown, iter_pr_events, sharded, templates
+from raw_upload import (
+    BodyTooLarge,
+    StreamBridge,
+    UnreadableBody,
+    UnsupportedEncoding,
+    limited_body,
+    make_inflater,
+)
+from streaming import EventStream, negotiate
+from formatter.template_engine import CompiledTemplate
+from cache.fingerprint import cache_key
+from cache.result_cache import ResultCache
+from cache.incremental import IncrementalAnalyzer
+from executor import ExecutorBusy, ExecutorCrashed, ExecutorTimeout, PipelineExecutor
 
-from core.diff_parser import GitDiffParser
-from core.diff_semantics import DiffSemanticAnalyzer
-from core.issue_parser import IssueParser
-from core.change_classifier import ChangeClassifier
-from core.impact_analyzer import ImpactAnalyzer
 
-from explanation.context_writer import ContextWriter
-from explanation.change_writer import ChangeWriter
-from explanation.impact_writer import ImpactWriter
+app = FastAPI(title="God-Level PR Writer")
 
-from formatter.checklist_builder import ChecklistBuilder
-from formatter.markdown_builder import MarkdownBuilder
+# Shared with app/ so both services expose the same process-wide metrics
+metrics_registry = registry
 
+result_cache = ResultCache.from_env()
+incremental = IncrementalAnalyzer()
+executor = PipelineExecutor.from_env()
 
-import os
+# Limit for /generate-pr/raw, applied to both the upload and its
+# decompressed size
+RAW_MAX_BYTES = int(os.getenv("PR_RAW_MAX_BYTES", 512 * 1024 * 1024))
 
-app = FastAPI(title="God-Level PR Writer")
+RAW_CONTENT_TYPES = (
+    "text/x-diff", "text/x-patch", "text/plain", "application/octet-stream",
+)
+GZIP_CONTENT_TYPES = ("application/gzip", "application/x-gzip")
 
-# Load template
-TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "templates", "base.md")
-with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
-    template = f.read()
+# Time budgets in ms, opt-in via PR_TIME_BUDGET_MS[_<ENDPOINT>] (unset
+# or 0 = unlimited); requests may ask for less. Past the budget,
+# remaining files are only counted and the response is marked partial.
+GENERATE_PR_BUDGET_MS = endpoint_budget_ms("generate_pr")
+RAW_BUDGET_MS = endpoint_budget_ms("generate_pr_raw")
+STREAM_BUDGET_MS = endpoint_budget_ms("generate_pr_stream")
 
 
+@app.on_event("startup")
+def start_executor():
+    executor.start()
+
+
+@app.on_event("shutdown")
+def stop_executor():
+    executor.shutdown()
+
 
 class PRRequest(BaseModel):
     git_diff: str
     issue: str
+    previous_analysis: Optional[str] = None
+    # Lowers (never raises) the endpoint's time budget
+    time_budget_ms: Optional[int] = None
 
 
 class PRResponse(BaseModel):
     title: str
     summary: str
+    analysis_id: Optional[str] = None
+    recomputed_files: List[str] = []
+    partial: bool = False
 
 
 
 @app.post("/generate-pr", response_model=PRResponse)
-def generate_pr(req: PRRequest):
-    # -----------------------------
-    # Core analysis
-    # -----------------------------
-    parsed_diff = GitDiffParser(req.git_diff).parse()
-    first_file = next(iter(parsed_diff.keys())) if parsed_diff else "unknown"
-    semantics = DiffSemanticAnalyzer(parsed_diff).analyze()
-
-    issue = IssueParser(req.issue).parse()
-
-    classifier = ChangeClassifier(issue, semantics)
-    classification = classifier.classify()
-
-    impact = ImpactAnalyzer(
-        stats=next(iter(parsed_diff.values()))
-        if parsed_diff else None
+async def generate_pr(req: PRRequest):
+    started = time.perf_counter()
+    deadline = Deadline.for_request(GENERATE_PR_BUDGET_MS, req.time_budget_ms)
+
+    with registry.collect() as request:
+        response = await _generate_pr(req, deadline)
+        return _json_response(response, request, "generate_pr", started)
+
+
+@app.post("/generate-pr/raw", response_model=PRResponse)
+async def generate_pr_raw(request: Request):
+    """
+    `/generate-pr` without the JSON envelope: the body is the diff itself
+    (`text/x-diff`, optionally gzip/deflate via `Content-Encoding` or an
+    `application/gzip` body) and is parsed while it streams in. The issue
+    goes in `X-PR-Issue` (percent-encoded UTF-8), a previous analysis id
+    in `X-PR-Previous-Analysis`, a lower time budget in
+    `X-PR-Time-Budget-Ms`. Results are not cached.
+    """
+    started = time.perf_counter()
+    requested_ms = request.headers.get("x-pr-time-budget-ms", "")
+    deadline = Deadline.for_request(
+        RAW_BUDGET_MS, int(requested_ms) if requested_ms.isdigit() else None
     )
 
-    # -----------------------------
-    # Explanation layers
-    # -----------------------------
-    context = ContextWriter(issue, classification).write()
-    changes = ChangeWriter(semantics).write()
-    impact_text = ImpactWriter(impact, classification).write()
-    checklist = ChecklistBuilder(classification).build()
-
-    # -----------------------------
-    # Title generation
-    # -----------------------------
-    title_prefix = classification.change_type.title()
-
-    if classification.change_type == "refactor":
-        title = f"Refactor: formatting cleanup in {first_file}"
-    elif classification.change_type == "bug fix":
-        title = f"Fix: {issue.summary.lower()}"
-    elif classification.change_type == "feature":
-        title = f"Feature: {issue.summary}"
-    else:
-        title = f"{title_prefix}: update {first_file}"
-
-    # -----------------------------
-    # Markdown assembly (summary)
-    # -----------------------------
-    builder = MarkdownBuilder(template)
-
-    summary_md = builder.build({
-        "context": context,
-        "changes": changes,
-        "impact": impact_text,
-        "checklist": checklist,
-    })
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > RAW_MAX_BYTES:
+        raise HTTPException(
+            status_code=413, detail=f"Diff exceeds the {RAW_MAX_BYTES} byte limit"
+        )
+
+    content_type = request.headers.get("content-type", "text/x-diff")
+    content_type = content_type.split(";")[0].strip().lower()
+    content_encoding = request.headers.get("content-encoding", "")
+    if content_type in GZIP_CONTENT_TYPES:
+        content_encoding = "gzip"
+    elif content_type not in RAW_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415, detail=f"Unsupported Content-Type: {content_type}"
+        )
+
+    issue = unquote(request.headers.get("x-pr-issue", ""))
+    previous_analysis = request.headers.get("x-pr-previous-analysis")
+    template = templates.get("base")
+
+    try:
+        inflater = make_inflater(content_encoding)
+    except UnsupportedEncoding as exc:
+        raise HTTPException(status_code=415, detail=str(exc))
+
+    with registry.collect() as metrics_request:
+        body = limited_body(request.stream(), RAW_MAX_BYTES, inflater)
+        bridge = StreamBridge(asyncio.get_running_loop())
+        pump = asyncio.create_task(bridge.pump(body))
+
+        try:
+            with stage("pipeline"):
+                result = await run_in_threadpool(
+                    _build_pr,
+                    iter_byte_lines(bridge),
+                    issue,
+                    template,
+                    previous_analysis,
+                    deadline,
+                )
+        except BodyTooLarge as exc:
+            raise HTTPException(status_code=413, detail=str(exc))
+        except UnreadableBody as exc:
+            raise HTTPException(status_code=400, detail=f"Unreadable diff body: {exc}")
+        finally:
+            pump.cancel()
+            with suppress(asyncio.CancelledError):
+                await pump
+
+        worker_metrics = result.pop("metrics", None)
+        if metrics_request is not None:
+            metrics_request.merge(worker_metrics)
+
+        response = PRResponse(**result)
+        return _json_response(response, metrics_request, "generate_pr_raw", started)
+
+
+@app.post("/generate-pr/stream")
+async def generate_pr_stream(req: PRRequest, request: Request):
+    """
+    `/generate-pr` as a stream of events, each sent as soon as it is
+    known: `issue` (parsed issue, before the diff is read), one `file`
+    per analysed file, then `title`, `context`, `impact`, `checklist`
+    and finally `done` carrying the `PRResponse` fields. Server-sent
+    events by default, NDJSON for `Accept: application/x-ndjson`.
 
-    return PRResponse(
-        title=title,
-        summary=summary_md
+    Runs on a dedicated thread rather than the executor, and neither
+    reads nor fills the result cache. A failure after the stream has
+    started is reported as an `error` event.
+    """
+    started = time.perf_counter()
+    deadline = Deadline.for_request(STREAM_BUDGET_MS, req.time_budget_ms)
+    media_type, encode = negotiate(request.headers.get("accept", ""))
+    template = templates.get("base")
+
+    def produce():
+        with registry.collect() as metrics_request:
+            yield from iter_pr_events(
+                req.git_diff, req.issue, template=template, deadline=deadline
+            )
+        registry.record(metrics_request, "generate_pr_stream", time.perf_counter() - started)
+
+    return StreamingResponse(
+        EventStream(produce, encode),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+async def _generate_pr(req: PRRequest, deadline: Deadline) -> PRResponse:
+    template = templates.get("base")
+
+    with stage("cache"):
+        key = await run_in_threadpool(
+            cache_key, req.git_diff, req.issue, template.digest
+        )
+        cached = result_cache.get(key)
+
+    if cached is not None:
+        count("cache_hits")
+        return PRResponse(**cached)
+    count("cache_misses")
+
+    # Shardable diffs fan out from this process; a pool worker would
+    # analyse them on one core (workers never fan out again)
+    shard = len(req.git_diff) >= sharded.min_bytes and await run_in_threadpool(
+        sharded.should_parallelize, req.git_diff
+    )
+
+    try:
+        with stage("pipeline"):
+            result = await executor.run(
+                req.git_diff,
+                req.issue,
+                template,
+                inline=lambda: _build_pr(
+                    req.git_diff, req.issue, template, req.previous_analysis, deadline
+                ),
+                deadline=deadline,
+                previous=incremental.get_handle(req.previous_analysis),
+                prefer_inline=shard,
+            )
+    except (ExecutorBusy, ExecutorCrashed) as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    except ExecutorTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc))
+
+    # Worker processes return their handle; later requests build on it
+    handle = result.pop("handle", None)
+    if handle is not None:
+        incremental.adopt(handle)
+
+    # Pipeline stages ran in a worker thread or process
+    worker_metrics = result.pop("metrics", None)
+    request = current_request()
+    if request is not None:
+        request.merge(worker_metrics)
+
+    response = PRResponse(**result)
+    if response.partial:
+        # A later request with more time gets the full analysis
+        count("partial_results")
+        return response
+    result_cache.put(key, {
+        "title": response.title,
+        "summary": response.summary,
+        "analysis_id": response.analysis_id,
+    })
+    return response
+
+
+def _json_response(
+    response: PRResponse,
+    request,
+    endpoint: str,
+    started: float
+) -> Response:
+    # Encoded here (not by FastAPI) so serialization is timed too
+    with stage("encode"):
+        body = json.dumps(jsonable_encoder(response))
+
+    registry.record(request, endpoint, time.perf_counter() - started)
+
+    headers = {}
+    if request is not None:
+        headers["Server-Timing"] = request.server_timing()
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/cache-stats")
+def cache_stats():
+    return result_cache.snapshot()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _build_pr(
+    git_diff: DiffSource,
+    issue_text: str,
+    template: CompiledTemplate,
+    previous_analysis: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+) -> Dict:
+    with registry.collect() as request:
+        result = generate_pr_markdown(
+            git_diff,
+            issue_text,
+            template=template,
+            incremental=incremental,
+            previous_analysis=previous_analysis,
+            deadline=deadline,
+        )
+
+    return {
+        "title": result.title,
+        "summary": result.summary,
+        "analysis_id": result.analysis_id,
+        "recomputed_files": result.recomputed,
+        "partial": result.partial,
+        "metrics": request.to_dict() if request is not None else None,
+    }
@@ -0,0 +1,252 @@
+"""
+Offline bulk generation of PR descriptions.
+
+Jobs come either from a JSONL file (one object per line, same shape as
+`requests.jsonl`: `request_id`, `title`, `body`, plus `git_diff`/`diff`)
+or from the merge commits of a local repository. Results are appended to
+a JSONL output file, which doubles as the checkpoint: re-running with the
+same output skips every job already written. Jobs run without a time
+budget: PR_TIME_BUDGET_MS only applies to the service endpoints.
+
+    python backfill.py --jobs jobs.jsonl --output out.jsonl
+    python backfill.py --repo /src/project --range v1.0..main --output out.jsonl
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    wait,
+)
+from typing import Dict, Iterator, Set
+
+from git_source import GitDiffSource
+from pipeline import generate_pr_markdown, templates
+
+
+# -----------------------------
+# Job sources
+# -----------------------------
+
+def iter_jsonl_jobs(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            job = json.loads(line)
+            job.setdefault("request_id", job.get("id") or f"line-{number}")
+            yield job
+
+
+def iter_git_jobs(repo: str, rev_range: str, merges_only: bool = True) -> Iterator[Dict]:
+    args = ["git", "-C", repo, "rev-list", "--reverse", rev_range]
+    if merges_only:
+        args.insert(4, "--merges")
+
+    output = subprocess.run(
+        args, check=True, capture_output=True, text=True
+    ).stdout
+
+    for sha in output.split():
+        yield {"request_id": sha, "repo": repo, "commit": sha}
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+
+_TEMPLATE = None
+
+
+def _init_worker(template_name: str):
+    global _TEMPLATE
+    _TEMPLATE = templates.get(template_name)
+
+
+def _git_output(repo: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", repo, *args],
+        check=True, capture_output=True,
+    ).stdout.decode("utf-8", errors="replace")
+
+
+def _load_job(job: Dict):
+    if "commit" in job:
+        repo, sha = job["repo"], job["commit"]
+        # Streamed from git into the parser
+        diff = GitDiffSource(repo, f"{sha}^1", sha)
+        issue_text = _git_output(repo, "log", "-1", "--format=%B", sha)
+        return diff, issue_text
+
+    diff_text = job.get("git_diff") or job.get("diff") or ""
+    issue_text = job.get("issue")
+    if issue_text is None:
+        issue_text = "\n\n".join(
+            part for part in (job.get("title"), job.get("body")) if part
+        )
+    return diff_text, issue_text
+
+
+def run_job(job: Dict) -> Dict:
+    started = time.perf_counter()
+    record = {"request_id": job["request_id"]}
+
+    try:
+        diff, issue_text = _load_job(job)
+        result = generate_pr_markdown(diff, issue_text, template=_TEMPLATE)
+        record.update(
+            title=result.title,
+            summary=result.summary,
+            change_type=result.classification.change_type,
+            files=len(result.parsed_diff),
+        )
+        if isinstance(diff, GitDiffSource):
+            record["diff_bytes"] = diff.bytes_read
+        else:
+            record["diff_bytes"] = len(diff.encode("utf-8", "surrogatepass"))
+    except Exception as exc:
+        record["error"] = f"{type(exc).__name__}: {exc}"
+        record["diff_bytes"] = 0
+
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    return record
+
+
+# -----------------------------
+# Checkpointing
+# -----------------------------
+
+def load_completed(output_path: str) -> Set[str]:
+    """
+    Reads ids already written to the output and drops a trailing partial
+    line left behind by an interrupted run.
+    """
+    completed: Set[str] = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    valid_bytes = 0
+    with open(output_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                completed.add(json.loads(raw)["request_id"])
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(raw)
+
+    if valid_bytes != os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(valid_bytes)
+
+    return completed
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+
+def backfill(
+    jobs,
+    output_path: str,
+    workers: int,
+    max_in_flight: int,
+    template_name: str = "base",
+) -> Dict:
+    completed = load_completed(output_path)
+    # Fail fast on a broken template before any worker starts
+    templates.get(template_name)
+
+    stats = {"done": 0, "failed": 0, "skipped": 0, "diff_bytes": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(template_name,)
+    ) as pool:
+        pending = set()
+
+        def drain(block_until_one: bool):
+            nonlocal pending
+            if not pending:
+                return
+            done, pending = wait(
+                pending,
+                return_when=FIRST_COMPLETED if block_until_one else ALL_COMPLETED,
+            )
+            for future in done:
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                stats["done"] += 1
+                stats["failed"] += "error" in record
+                stats["diff_bytes"] += record["diff_bytes"]
+            out.flush()
+
+        for job in jobs:
+            if job["request_id"] in completed:
+                stats["skipped"] += 1
+                continue
+            pending.add(pool.submit(run_job, job))
+            if len(pending) >= max_in_flight:
+                drain(block_until_one=True)
+
+        drain(block_until_one=False)
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["prs_per_second"] = round(stats["done"] / elapsed, 2) if elapsed else 0.0
+    stats["mb_per_second"] = (
+        round(stats["diff_bytes"] / (1024 * 1024) / elapsed, 2) if elapsed else 0.0
+    )
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill PR descriptions.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--jobs", help="JSONL file of jobs")
+    source.add_argument("--repo", help="local git repository to walk")
+    parser.add_argument("--range", dest="rev_range", default="HEAD",
+                        help="commit range for --repo, e.g. v1.0..main")
+    parser.add_argument("--all-commits", action="store_true",
+                        help="include non-merge commits when walking --repo")
+    parser.add_argument("--output", required=True, help="JSONL results file")
+    parser.add_argument("--template", default="base",
+                        help="template name under pr/templates")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-in-flight", type=int, default=0,
+                        help="max submitted jobs (default: 4 x workers)")
+    args = parser.parse_args(argv)
+
+    if args.jobs:
+        jobs = iter_jsonl_jobs(args.jobs)
+    else:
+        jobs = iter_git_jobs(args.repo, args.rev_range, not args.all_commits)
+
+    stats = backfill(
+        jobs,
+        args.output,
+        workers=args.workers,
+        max_in_flight=args.max_in_flight or 4 * args.workers,
+        template_name=args.template,
+    )
+
+    print(
+        f"{stats['done']} PRs ({stats['failed']} failed, "
+        f"{stats['skipped']} already done) in {stats['seconds']}s: "
+        f"{stats['prs_per_second']} PRs/s, "
+        f"{stats['mb_per_second']} MB diff/s",
+        file=sys.stderr,
+    )
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import hashlib
+
+from core.diff_parser import iter_text_lines
+
+
+# Bump when pipeline output for the same input may change
+CACHE_VERSION = "2"
+
+
+def diff_fingerprint(diff_text: str) -> str:
+    """
+    Content fingerprint of a diff in the spirit of `git patch-id`:
+    hunk line numbers, `index` lines and trailing whitespace are ignored,
+    so the same patch applied at different positions hashes the same.
+    """
+    digest = hashlib.sha256()
+
+    for line in iter_text_lines(diff_text):
+        if line.startswith("index "):
+            continue
+
+        if line.startswith("@@"):
+            # Keep only the section header git appends after the range
+            closing = line.find("@@", 2)
+            line = "@@" + (line[closing + 2:] if closing != -1 else "")
+
+        digest.update(line.rstrip().encode("utf-8", "surrogatepass"))
+        digest.update(b"\n")
+
+    return digest.hexdigest()
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def cache_key(diff_text: str, issue_text: str, template_hash: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(CACHE_VERSION.encode())
+    digest.update(b"\0" + diff_fingerprint(diff_text).encode())
+    digest.update(b"\0" + text_fingerprint(issue_text).encode())
+    digest.update(b"\0" + template_hash.encode())
+    return digest.hexdigest()
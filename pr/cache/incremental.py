@@ -0,0 +1,305 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.deadline import DEADLINE_REASON, Deadline
+from core.diff_parser import FileDiff, GitDiffParser, iter_text_lines
+from core.diff_semantics import DiffSemanticAnalyzer, FileSemantics
+from core.diff_stats import DiffStats
+from core.file_filter import FileFilter
+from core import serialization
+from core.sharded import ShardedDiffAnalyzer
+
+
+@dataclass
+class AnalysisHandle:
+    """
+    Result of one analysis run, reusable by the next run of the same PR.
+    """
+    analysis_id: str
+    file_digests: Dict[str, str] = field(default_factory=dict)
+    semantics_by_digest: Dict[str, FileSemantics] = field(default_factory=dict)
+
+
+# (analysis id, filename -> digest, semantics in the binary format)
+PackedHandle = Tuple[str, Dict[str, str], bytes]
+
+
+def pack_handle(
+    handle: AnalysisHandle,
+    filenames: Optional[Iterable[str]] = None
+) -> PackedHandle:
+    """
+    `handle` in the compact binary format (see core.serialization), for
+    handing it to or from a worker process. With `filenames` only their
+    semantics are included; every digest is.
+    """
+    semantics = {
+        file_semantics.filename: file_semantics
+        for file_semantics in handle.semantics_by_digest.values()
+    }
+    if filenames is not None:
+        semantics = {name: semantics[name] for name in filenames if name in semantics}
+    return handle.analysis_id, dict(handle.file_digests), serialization.dumps(semantics=semantics)
+
+
+def unpack_handle(
+    packed: PackedHandle,
+    previous: Optional[AnalysisHandle] = None
+) -> AnalysisHandle:
+    """
+    Rebuilds a packed handle. Digests whose semantics were left out are
+    filled in from `previous` when it has them.
+    """
+    analysis_id, file_digests, data = packed
+    semantics = serialization.AnalysisArchive(data).all_semantics()
+    known = previous.semantics_by_digest if previous is not None else {}
+
+    handle = AnalysisHandle(analysis_id=analysis_id, file_digests=file_digests)
+    for filename, digest in file_digests.items():
+        file_semantics = semantics.get(filename) or known.get(digest)
+        if file_semantics is not None:
+            handle.semantics_by_digest[digest] = file_semantics
+    return handle
+
+
+@dataclass
+class IncrementalResult:
+    handle: AnalysisHandle
+    parsed_diff: Dict[str, FileDiff]
+    semantics: Dict[str, FileSemantics]
+    recomputed: List[str]
+    reused: List[str]
+    stats: DiffStats
+
+
+class IncrementalAnalyzer:
+    """
+    Memoises `FileDiff` -> `FileSemantics` per file, keyed by a hash of
+    that file's raw diff section (and of its full source when one is
+    given). When a PR gets a new commit only the files whose section
+    changed are re-analysed.
+
+    Handles are kept in a bounded LRU so HTTP callers can refer to a
+    previous run by its `analysis_id`.
+    """
+
+    def __init__(self, max_handles: int = 256):
+        self.max_handles = max_handles
+        self.analyzer = DiffSemanticAnalyzer({})
+        self._handles: "OrderedDict[str, AnalysisHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_handle(self, analysis_id: Optional[str]) -> Optional[AnalysisHandle]:
+        if not analysis_id:
+            return None
+        with self._lock:
+            handle = self._handles.get(analysis_id)
+            if handle is not None:
+                self._handles.move_to_end(analysis_id)
+            return handle
+
+    def adopt(self, handle: AnalysisHandle):
+        """
+        Makes `handle` available by its id, e.g. one built by a worker
+        process.
+        """
+        with self._lock:
+            self._handles[handle.analysis_id] = handle
+            self._handles.move_to_end(handle.analysis_id)
+            while len(self._handles) > self.max_handles:
+                self._handles.popitem(last=False)
+
+    def analyze(
+        self,
+        diff_text: str,
+        previous: Optional[AnalysisHandle] = None,
+        file_filter: Optional[FileFilter] = None,
+        deadline: Optional[Deadline] = None,
+        file_contents: Optional[Dict[str, str]] = None,
+    ) -> IncrementalResult:
+        return self.analyze_lines(
+            iter_text_lines(diff_text), previous, file_filter, deadline, file_contents
+        )
+
+    def analyze_lines(
+        self,
+        lines: Iterable[str],
+        previous: Optional[AnalysisHandle] = None,
+        file_filter: Optional[FileFilter] = None,
+        deadline: Optional[Deadline] = None,
+        file_contents: Optional[Dict[str, str]] = None,
+    ) -> IncrementalResult:
+        known = previous.semantics_by_digest if previous else {}
+        analyzer = self.analyzer
+        if deadline is not None:
+            analyzer = DiffSemanticAnalyzer({}, deadline=deadline)
+
+        parsed_diff, fresh, digests, stats = analyze_sections(
+            lines, _known_names(known), file_filter, deadline, file_contents, analyzer
+        )
+        return self._merge(parsed_diff, fresh, digests, stats, known)
+
+    def analyze_sharded(
+        self,
+        sharded: ShardedDiffAnalyzer,
+        diff_text: str,
+        previous: Optional[AnalysisHandle] = None,
+        file_filter: Optional[FileFilter] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> IncrementalResult:
+        """
+        `analyze` with the shards of a very large diff parsed in worker
+        processes. Workers get the known digests (not the semantics) and
+        only analyse files whose section changed.
+        """
+        known = previous.semantics_by_digest if previous else {}
+        names = _known_names(known)
+
+        parsed_diff: Dict[str, FileDiff] = {}
+        fresh: Dict[str, FileSemantics] = {}
+        digests: Dict[str, str] = {}
+        stats: List[DiffStats] = []
+
+        for shard_parsed, shard_fresh, shard_digests, shard_stats in sharded.map(
+            _analyze_shard_sections, diff_text, names, file_filter, deadline
+        ):
+            parsed_diff.update(shard_parsed)
+            fresh.update(shard_fresh)
+            digests.update(shard_digests)
+            stats.append(shard_stats)
+
+        return self._merge(parsed_diff, fresh, digests, DiffStats.concat(stats), known)
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _merge(
+        self,
+        parsed_diff: Dict[str, FileDiff],
+        fresh: Dict[str, FileSemantics],
+        digests: Dict[str, str],
+        stats: DiffStats,
+        known: Dict[str, FileSemantics],
+    ) -> IncrementalResult:
+        """
+        Fills in the reused semantics and records the new handle.
+        """
+        handle = AnalysisHandle(analysis_id=uuid.uuid4().hex)
+        semantics: Dict[str, FileSemantics] = {}
+        recomputed: List[str] = []
+        reused: List[str] = []
+
+        for filename, digest in digests.items():
+            file_semantics = fresh.get(filename)
+            if file_semantics is None:
+                file_semantics = known[digest]
+                reused.append(filename)
+            else:
+                recomputed.append(filename)
+
+            semantics[filename] = file_semantics
+            handle.file_digests[filename] = digest
+            # Cut short by the budget: analyse it properly next time
+            if file_semantics.skip_reason != DEADLINE_REASON:
+                handle.semantics_by_digest[digest] = file_semantics
+
+        self.adopt(handle)
+
+        return IncrementalResult(
+            handle=handle,
+            parsed_diff=parsed_diff,
+            semantics=semantics,
+            recomputed=recomputed,
+            reused=reused,
+            stats=stats,
+        )
+
+
+# -----------------------------
+# Sections
+# -----------------------------
+
+def analyze_sections(
+    lines: Iterable[str],
+    known: Dict[str, str],
+    file_filter: Optional[FileFilter] = None,
+    deadline: Optional[Deadline] = None,
+    file_contents: Optional[Dict[str, str]] = None,
+    analyzer: Optional[DiffSemanticAnalyzer] = None,
+) -> Tuple[Dict[str, FileDiff], Dict[str, FileSemantics], Dict[str, str], DiffStats]:
+    """
+    Parses `lines` file by file and analyses each file unless its
+    section digest is in `known` (digest -> filename). Returns the
+    parsed files, the semantics of the analysed files only, every file's
+    digest and the parser's stats.
+    """
+    file_contents = file_contents or {}
+    if analyzer is None:
+        analyzer = DiffSemanticAnalyzer({}, deadline=deadline)
+
+    parser = GitDiffParser(file_filter=file_filter, deadline=deadline)
+    parsed_diff: Dict[str, FileDiff] = {}
+    fresh: Dict[str, FileSemantics] = {}
+    digests: Dict[str, str] = {}
+
+    for file_diff, digest in _iter_sections(parser, lines, file_filter):
+        filename = file_diff.filename
+        parsed_diff[filename] = file_diff
+
+        source = file_contents.get(filename)
+        if source is not None:
+            # Full-file scopes change the result
+            digest = hashlib.sha1(
+                (digest + "\0").encode("ascii") + source.encode("utf-8", "surrogatepass")
+            ).hexdigest()
+
+        digests[filename] = digest
+        if known.get(digest) != filename:
+            fresh[filename] = analyzer.analyze_file(filename, file_diff, source)
+
+    return parsed_diff, fresh, digests, parser.stats.build()
+
+
+def _analyze_shard_sections(
+    shard: str,
+    known: Dict[str, str],
+    file_filter: Optional[FileFilter] = None,
+    deadline: Optional[Deadline] = None,
+):
+    # Worker entry point for IncrementalAnalyzer.analyze_sharded
+    return analyze_sections(iter_text_lines(shard), known, file_filter, deadline)
+
+
+def _known_names(known: Dict[str, FileSemantics]) -> Dict[str, str]:
+    return {digest: semantics.filename for digest, semantics in known.items()}
+
+
+def _iter_sections(
+    parser: GitDiffParser,
+    lines: Iterable[str],
+    file_filter: Optional[FileFilter]
+):
+    """
+    Yields (FileDiff, digest) where digest covers every raw line the
+    parser consumed for that file, and the filter settings that
+    decided whether it was skipped.
+    """
+    salt = file_filter.digest.encode("ascii") if file_filter is not None else b""
+    digest = hashlib.sha1(salt)
+
+    for line in lines:
+        finished = parser.feed(line)
+        if finished is not None:
+            yield finished, digest.hexdigest()
+            digest = hashlib.sha1(salt)
+        digest.update(line.encode("utf-8", "surrogatepass"))
+        digest.update(b"\n")
+
+    finished = parser.close()
+    if finished is not None:
+        yield finished, digest.hexdigest()
@@ -0,0 +1,229 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    disk_hits: int = 0
+    disk_evictions: int = 0
+    stores: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class MemoryTier:
+    """
+    In-process LRU bounded by total encoded value size.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.size = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: bytes) -> int:
+        """
+        Stores `value` and returns how many entries were evicted.
+        """
+        if len(value) > self.max_entry_bytes:
+            return 0
+
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+
+        self.entries[key] = value
+        self.size += len(value)
+
+        evicted = 0
+        while self.size > self.max_bytes and self.entries:
+            _, dropped = self.entries.popitem(last=False)
+            self.size -= len(dropped)
+            evicted += 1
+        return evicted
+
+
+class SQLiteTier:
+    """
+    On-disk tier shared by every worker process on the host.
+    WAL mode lets readers and the single writer proceed concurrently.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)"
+        )
+        self._create_size_total()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            return bytes(row[0])
+
+    def put(self, key: str, value: bytes) -> int:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO results (key, value, size, accessed)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET"
+                " value = excluded.value, size = excluded.size, accessed = excluded.accessed",
+                (key, value, len(value), time.time()),
+            )
+            return self._evict()
+
+    def _create_size_total(self):
+        """
+        Running SUM(size) in a one-row table kept by triggers, so `put`
+        doesn't scan the table and every process sees the others' writes.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results_size (total INTEGER NOT NULL)"
+            )
+            # Existing databases start from their current contents
+            self._conn.execute(
+                "INSERT INTO results_size (total)"
+                " SELECT COALESCE(SUM(size), 0) FROM results"
+                " WHERE NOT EXISTS (SELECT 1 FROM results_size)"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_insert AFTER INSERT ON results"
+                " BEGIN UPDATE results_size SET total = total + NEW.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_update AFTER UPDATE OF size ON results"
+                " BEGIN UPDATE results_size SET total = total + NEW.size - OLD.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_delete AFTER DELETE ON results"
+                " BEGIN UPDATE results_size SET total = total - OLD.size; END"
+            )
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _evict(self) -> int:
+        total = self._conn.execute("SELECT total FROM results_size").fetchone()[0]
+
+        evicted = 0
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM results ORDER BY accessed LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (row[0],))
+            total -= row[1]
+            evicted += 1
+        return evicted
+
+
+class ResultCache:
+    """
+    Two-tier cache for generated PR results, keyed by `cache_key()`.
+    Values are JSON-serialisable dicts.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 4 * 1024 * 1024,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.memory = MemoryTier(max_bytes, max_entry_bytes)
+        self.disk = SQLiteTier(disk_path, disk_max_bytes) if disk_path else None
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            max_bytes=int(os.getenv("PR_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            max_entry_bytes=int(
+                os.getenv("PR_CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024)
+            ),
+            disk_path=os.getenv("PR_CACHE_DB") or None,
+            disk_max_bytes=int(
+                os.getenv("PR_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024)
+            ),
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.stats.hits += 1
+                return json.loads(value)
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                with self._lock:
+                    self.stats.hits += 1
+                    self.stats.disk_hits += 1
+                    self.stats.evictions += self.memory.put(key, value)
+                return json.loads(value)
+
+        with self._lock:
+            self.stats.misses += 1
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        value = json.dumps(result, separators=(",", ":")).encode("utf-8")
+
+        with self._lock:
+            self.stats.stores += 1
+            self.stats.evictions += self.memory.put(key, value)
+
+        if self.disk is not None:
+            evicted = self.disk.put(key, value)
+            with self._lock:
+                self.stats.disk_evictions += evicted
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            self.stats.entries = len(self.memory.entries)
+            self.stats.bytes = self.memory.size
+            return asdict(self.stats)
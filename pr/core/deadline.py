@@ -0,0 +1,85 @@
+import math
+import os
+import time
+from typing import Optional
+
+
+# skip_reason for files only counted because the budget ran out
+DEADLINE_REASON = "time budget exhausted"
+
+# Budgets are opt-in: with no PR_TIME_BUDGET_MS* set, requests run
+# unlimited, as before budgets existed
+DEFAULT_BUDGET_MS = 0
+
+
+class Deadline:
+    """
+    Time budget for one request, checked cooperatively by the parser,
+    the semantic analyzer and the writers.
+
+    Past `expires_at` detailed analysis stops and remaining files are
+    only counted; writers keep rendering what was already analysed
+    until the `grace` share of the budget is also used up. `triggered`
+    records whether any component actually degraded its output.
+
+    Based on `time.monotonic()`, which is shared by processes on the
+    same host, so a deadline can be handed to worker processes.
+    """
+
+    __slots__ = ("expires_at", "hard_expires_at", "triggered")
+
+    def __init__(self, seconds: Optional[float] = None, grace: float = 0.25):
+        if seconds is None or seconds <= 0:
+            self.expires_at = math.inf
+            self.hard_expires_at = math.inf
+        else:
+            self.expires_at = time.monotonic() + seconds
+            self.hard_expires_at = self.expires_at + seconds * grace
+        self.triggered = False
+
+    @classmethod
+    def for_request(cls, endpoint_ms: int, requested_ms: Optional[int] = None) -> "Deadline":
+        """
+        The endpoint's budget, lowered (never raised) by a per-request
+        `requested_ms`. 0 means unlimited.
+        """
+        budget_ms = endpoint_ms
+        if requested_ms is not None and requested_ms > 0:
+            budget_ms = min(budget_ms, requested_ms) if budget_ms > 0 else requested_ms
+        return cls(budget_ms / 1000 if budget_ms > 0 else None)
+
+    @property
+    def unlimited(self) -> bool:
+        return self.expires_at == math.inf
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """
+        True once detailed analysis should stop.
+        """
+        if time.monotonic() < self.expires_at:
+            return False
+        self.triggered = True
+        return True
+
+    def overrun(self) -> bool:
+        """
+        True once even rendering already-analysed detail should stop.
+        """
+        if time.monotonic() < self.hard_expires_at:
+            return False
+        self.triggered = True
+        return True
+
+
+def endpoint_budget_ms(endpoint: str, default: int = DEFAULT_BUDGET_MS) -> int:
+    """
+    `PR_TIME_BUDGET_MS_<ENDPOINT>`, else `PR_TIME_BUDGET_MS`, else
+    `default` (unlimited); 0 disables the budget.
+    """
+    value = os.getenv(f"PR_TIME_BUDGET_MS_{endpoint.upper()}")
+    if value is None:
+        value = os.getenv("PR_TIME_BUDGET_MS", default)
+    return int(value)
@@ -1,17 +1,208 @@
 import re
+from array import array
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+from core.deadline import DEADLINE_REASON, Deadline
+from core.diff_stats import DiffStatsBuilder
+from core.file_filter import BINARY_MARKERS, FileFilter
+
+
+# -----------------------------
+# Line kinds
+# -----------------------------
+
+KIND_CONTEXT = 0
+KIND_ADDED = 1
+KIND_REMOVED = 2
+
+# Extended header lines between "diff --git" and the first hunk
+RENAME_FROM = "rename from "
+SIMILARITY_INDEX = "similarity index "
+
+# File header lines
+OLD_FILE = "--- a/"
+NEW_FILE = "+++ b/"
+DELETED_FILE = "+++ /dev/null"
+
+
+class LineStore:
+    """
+    The hunk lines of one file in one buffer, each line followed by a
+    newline. Every hunk owns three consecutive segments, its context,
+    added and removed lines (in KIND_* order); `offsets` holds where each
+    segment starts plus one past the last. Added / removed lines are
+    stored without their "+" / "-" prefix, context lines as is.
+    """
+
+    __slots__ = ("text", "offsets")
+
+    def __init__(self, text: str, offsets: array):
+        self.text = text
+        self.offsets = offsets
+
+
+class _LineStoreBuilder:
+    """
+    Collects one file's hunks for a LineStore. Lines are buffered per kind
+    until the hunk is complete, then appended as its three segments.
+    """
+
+    __slots__ = ("parts", "offsets", "hunks", "hunk", "lines")
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.offsets = array("q", (0,))
+        self.hunks: List[DiffHunk] = []
+        self.hunk: Optional[DiffHunk] = None
+        # Lines of `hunk`, indexed by KIND_*
+        self.lines = ([], [], [])
+
+    def start(self, hunk: Optional["DiffHunk"]):
+        self._flush()
+        self.hunk = hunk
+
+    def build(self) -> Optional[LineStore]:
+        self._flush()
+        if not self.parts:
+            return None
+        self.parts.append("")
+        store = LineStore("\n".join(self.parts), self.offsets)
+        for hunk in self.hunks:
+            hunk._store = store
+        return store
+
+    def _flush(self):
+        hunk = self.hunk
+        if hunk is None:
+            return
+        hunk._first = len(self.offsets) - 1
+        self.hunks.append(hunk)
+        position = self.offsets[-1]
+        for lines in self.lines:
+            if lines:
+                self.parts += lines
+                position += sum(map(len, lines)) + len(lines)
+            self.offsets.append(position)
+        self.hunk = None
+        self.lines = ([], [], [])
 
 
-@dataclass
 class DiffHunk:
-    old_start: int
-    old_count: int
-    new_start: int
-    new_count: int
-    added_lines: List[str] = field(default_factory=list)
-    removed_lines: List[str] = field(default_factory=list)
-    context_lines: List[str] = field(default_factory=list)
+    """
+    One hunk. Its lines live in the `LineStore` shared by the whole file
+    and `line_kinds` gives their diff order; `added_lines`,
+    `removed_lines` and `context_lines` are materialised (one slice and
+    split each) on every access.
+
+    Built by the parser, or from line lists: without `line_kinds` those
+    are taken as removed, then added, then context lines.
+    """
+
+    __slots__ = (
+        "old_start", "old_count", "new_start", "new_count",
+        "section", "line_kinds", "_store", "_first",
+    )
+
+    def __init__(
+        self,
+        old_start: int,
+        old_count: int,
+        new_start: int,
+        new_count: int,
+        added_lines: Optional[List[str]] = None,
+        removed_lines: Optional[List[str]] = None,
+        context_lines: Optional[List[str]] = None,
+        # Text after the closing "@@" (git's enclosing function line)
+        section: str = "",
+        # One KIND_* per hunk line, in diff order
+        line_kinds: Optional[bytearray] = None,
+    ):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.section = section
+        self.line_kinds = bytearray() if line_kinds is None else line_kinds
+        # Set by the parser once the file is complete
+        self._store: Optional[LineStore] = None
+        self._first = 0
+
+        if added_lines or removed_lines or context_lines:
+            if line_kinds is None:
+                self.line_kinds = bytearray(
+                    bytes((KIND_REMOVED,)) * len(removed_lines or ())
+                    + bytes((KIND_ADDED,)) * len(added_lines or ())
+                    + bytes((KIND_CONTEXT,)) * len(context_lines or ())
+                )
+            builder = _LineStoreBuilder()
+            builder.start(self)
+            builder.lines = (list(context_lines or ()), list(added_lines or ()), list(removed_lines or ()))
+            builder.build()
+
+    @property
+    def added_lines(self) -> List[str]:
+        return self._lines(KIND_ADDED)
+
+    @property
+    def removed_lines(self) -> List[str]:
+        return self._lines(KIND_REMOVED)
+
+    @property
+    def context_lines(self) -> List[str]:
+        return self._lines(KIND_CONTEXT)
+
+    def text(self, kind: int) -> str:
+        """
+        The lines of one KIND_*, newline-terminated, as a single string:
+        cheaper than the line lists for substring tests.
+        """
+        store = self._store
+        if store is None:
+            return ""
+        segment = self._first + kind
+        return store.text[store.offsets[segment]:store.offsets[segment + 1]]
+
+    def _lines(self, kind: int) -> List[str]:
+        store = self._store
+        if store is None:
+            return []
+        offsets = store.offsets
+        segment = self._first + kind
+        start = offsets[segment]
+        end = offsets[segment + 1]
+        if start == end:
+            return []
+        return store.text[start:end - 1].split("\n")
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DiffHunk):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __repr__(self) -> str:
+        return (
+            f"DiffHunk(old_start={self.old_start!r}, old_count={self.old_count!r}, "
+            f"new_start={self.new_start!r}, new_count={self.new_count!r}, "
+            f"added_lines={self.added_lines!r}, removed_lines={self.removed_lines!r}, "
+            f"context_lines={self.context_lines!r}, section={self.section!r}, "
+            f"line_kinds={self.line_kinds!r})"
+        )
+
+    def _key(self):
+        return (
+            self.old_start, self.old_count, self.new_start, self.new_count,
+            self.section, self.line_kinds,
+            self.added_lines, self.removed_lines, self.context_lines,
+        )
 
 
 @dataclass
@@ -20,61 +211,369 @@ class FileDiff:
     hunks: List[DiffHunk] = field(default_factory=list)
     additions: int = 0
     deletions: int = 0
+    # Set for files that are only counted (binary, generated, ...)
+    skip_reason: Optional[str] = None
+    # From git's "rename from" / "similarity index" extended headers
+    renamed_from: Optional[str] = None
+    similarity: Optional[int] = None
+
+
+# -----------------------------
+# Line sources
+# -----------------------------
 
+def iter_text_lines(text: str) -> Iterator[str]:
+    """
+    Lazily yields the lines of `text` without building a list of them.
+    """
+    start = 0
+    length = len(text)
+
+    while start < length:
+        end = text.find("\n", start)
+        if end == -1:
+            end = length
+        line = text[start:end]
+        if line.endswith("\r"):
+            line = line[:-1]
+        yield line
+        start = end + 1
+
+
+def iter_byte_lines(
+    chunks: Iterable[bytes],
+    encoding: str = "utf-8"
+) -> Iterator[str]:
+    """
+    Re-assembles arbitrary byte chunks (file reads, pipe reads, request
+    body pieces) into decoded lines. Only one partial line is buffered.
+    """
+    assembler = _LineAssembler(encoding)
+
+    for chunk in chunks:
+        yield from assembler.push(chunk)
+
+    yield from assembler.flush()
+
+
+async def aiter_byte_lines(
+    chunks: AsyncIterable[bytes],
+    encoding: str = "utf-8"
+) -> AsyncIterator[str]:
+    """
+    Async counterpart of `iter_byte_lines` for request bodies and
+    subprocess pipes.
+    """
+    assembler = _LineAssembler(encoding)
+
+    async for chunk in chunks:
+        for line in assembler.push(chunk):
+            yield line
+
+    for line in assembler.flush():
+        yield line
+
+
+class _LineAssembler:
+    """
+    Splits byte chunks on newlines, keeping the trailing partial line as a
+    list of parts so very long lines are not re-copied on every chunk.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self.parts: List[bytes] = []
+
+    def push(self, chunk: bytes) -> List[str]:
+        if not chunk:
+            return []
+
+        if b"\n" not in chunk:
+            self.parts.append(chunk)
+            return []
+
+        complete = chunk.split(b"\n")
+        tail = complete.pop()
+
+        if self.parts:
+            self.parts.append(complete[0])
+            complete[0] = b"".join(self.parts)
+            self.parts = []
+
+        if tail:
+            self.parts.append(tail)
+
+        return [self._decode(raw) for raw in complete]
+
+    def flush(self) -> List[str]:
+        if not self.parts:
+            return []
+        raw = b"".join(self.parts)
+        self.parts = []
+        return [self._decode(raw)]
+
+    def _decode(self, raw: bytes) -> str:
+        if raw.endswith(b"\r"):
+            raw = raw[:-1]
+        return raw.decode(self.encoding, errors="replace")
+
+
+# -----------------------------
+# Parser
+# -----------------------------
 
 class GitDiffParser:
     """
     Parses a unified git diff into structured objects.
     No assumptions. No heuristics. Pure parsing.
+
+    `parse()` works on a complete diff string. `iter_files()` and
+    `aiter_files()` accept line iterators / async byte streams and yield
+    each `FileDiff` as soon as it is complete, so only one file is held
+    in memory at a time.
+
+    Renames keep their old path in `renamed_from`; pure renames, which
+    git prints without any hunks, still produce an (empty) `FileDiff`.
+    Deleted files (`+++ /dev/null`) keep their old path as `filename`.
+
+    Binary files get `skip_reason="binary"`. With a `file_filter`, files
+    it rejects are counted but their lines are not stored.
+
+    With a `deadline`, files starting after it has expired (checked at
+    file and hunk headers only) are counted like skipped files.
+
+    Every finished file also adds a row to `stats`, the columnar per-file
+    counts `ImpactAnalyzer` works from (`stats.build()` after parsing).
+
+    Hunk lines are not kept as separate strings: each file's lines are
+    joined into one `LineStore` when the file is complete, and its hunks
+    read their lines from it.
     """
 
-    HUNK_HEADER = re.compile(r"@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@")
+    HUNK_HEADER = re.compile(r"@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@ ?(.*)")
 
-    def __init__(self, diff_text: str):
+    def __init__(
+        self,
+        diff_text: str = "",
+        file_filter: Optional[FileFilter] = None,
+        deadline: Optional[Deadline] = None,
+    ):
         self.diff_text = diff_text
+        self.file_filter = file_filter
+        self.deadline = deadline
         self.files: Dict[str, FileDiff] = {}
+        self._reset()
 
     def parse(self) -> Dict[str, FileDiff]:
-        current_file: Optional[FileDiff] = None
-        current_hunk: Optional[DiffHunk] = None
-
-        for raw_line in self.diff_text.splitlines():
-            line = raw_line.rstrip("\n")
-
-            # Detect file
-            if line.startswith("+++ b/"):
-                filename = line.replace("+++ b/", "").strip()
-                current_file = FileDiff(filename=filename)
-                self.files[filename] = current_file
-                current_hunk = None
-                continue
-
-            # Detect hunk
-            hunk_match = self.HUNK_HEADER.match(line)
-            if hunk_match and current_file:
-                old_start = int(hunk_match.group(1))
-                old_count = int(hunk_match.group(2) or "1")
-                new_start = int(hunk_match.group(3))
-                new_count = int(hunk_match.group(4) or "1")
-
-                current_hunk = DiffHunk(
-                    old_start=old_start,
-                    old_count=old_count,
-                    new_start=new_start,
-                    new_count=new_count,
-                )
-                current_file.hunks.append(current_hunk)
-                continue
-
-            # Inside hunk
-            if current_hunk:
-                if line.startswith("+") and not line.startswith("+++"):
-                    current_hunk.added_lines.append(line[1:])
-                    current_file.additions += 1
-                elif line.startswith("-") and not line.startswith("---"):
-                    current_hunk.removed_lines.append(line[1:])
-                    current_file.deletions += 1
+        for file_diff in self.iter_files(iter_text_lines(self.diff_text)):
+            self.files[file_diff.filename] = file_diff
+        return self.files
+
+    def iter_files(self, lines: Iterable[str]) -> Iterator[FileDiff]:
+        self._reset()
+
+        for line in lines:
+            finished = self.feed(line)
+            if finished is not None:
+                yield finished
+
+        finished = self.close()
+        if finished is not None:
+            yield finished
+
+    async def aiter_files(
+        self,
+        chunks: AsyncIterable[bytes],
+        encoding: str = "utf-8"
+    ) -> AsyncIterator[FileDiff]:
+        self._reset()
+
+        async for line in aiter_byte_lines(chunks, encoding):
+            finished = self.feed(line)
+            if finished is not None:
+                yield finished
+
+        finished = self.close()
+        if finished is not None:
+            yield finished
+
+    # -----------------------------
+    # Incremental interface
+    # -----------------------------
+
+    def feed(self, line: str) -> Optional[FileDiff]:
+        """
+        Consumes one diff line. Returns the previous `FileDiff` when this
+        line starts a new file, otherwise None.
+        """
+        line = line.rstrip("\n")
+
+        # File boundary: the previous file is complete
+        if line.startswith("diff --git "):
+            finished = self._finish_file()
+            separator = line.rfind(" b/")
+            if separator != -1:
+                self._header_path = line[separator + 3:].strip()
+            return finished
+
+        # Detect file
+        if line.startswith(NEW_FILE) or line.startswith(DELETED_FILE):
+            if line.startswith(NEW_FILE):
+                filename = line[len(NEW_FILE):].strip()
+            else:
+                filename = self._old_path or self._header_path
+            renamed_from, similarity = self._renamed_from, self._similarity
+            # Headers belong to this file, not to the one being finished
+            self._renamed_from = self._similarity = None
+            finished = self._finish_file()
+            if filename:
+                self._current_file = self._new_file(filename, renamed_from, similarity)
+            return finished
+
+        if line.startswith(OLD_FILE):
+            # Only needed to name a deleted file on the "+++" line
+            self._old_path = line[len(OLD_FILE):].strip()
+
+        current_file = self._current_file
+
+        if self._current_hunk is None:
+            # Binary files have no "+++" line; name them from the git header
+            if line.startswith(BINARY_MARKERS):
+                if current_file is None and self._header_path:
+                    current_file = self._current_file = FileDiff(
+                        filename=self._header_path,
+                        renamed_from=self._renamed_from,
+                        similarity=self._similarity,
+                    )
+                if current_file is not None:
+                    current_file.skip_reason = "binary"
+                return None
+            if line.startswith(RENAME_FROM):
+                self._renamed_from = line[len(RENAME_FROM):].strip()
+                return None
+            if line.startswith(SIMILARITY_INDEX):
+                value = line[len(SIMILARITY_INDEX):].rstrip("% ")
+                self._similarity = int(value) if value.isdigit() else None
+                return None
+
+        # Detect hunk
+        hunk_match = self.HUNK_HEADER.match(line)
+        if hunk_match and current_file:
+            old_start = int(hunk_match.group(1))
+            old_count = int(hunk_match.group(2) or "1")
+            new_start = int(hunk_match.group(3))
+            new_count = int(hunk_match.group(4) or "1")
+
+            self._current_hunk = DiffHunk(
+                old_start=old_start,
+                old_count=old_count,
+                new_start=new_start,
+                new_count=new_count,
+                section=hunk_match.group(5),
+            )
+            if current_file.skip_reason is None:
+                if self.deadline is not None and self.deadline.expired():
+                    # Drop the part stored so far; only count from here on
+                    current_file.skip_reason = DEADLINE_REASON
+                    current_file.hunks = []
+                    self._lines = _LineStoreBuilder()
                 else:
-                    current_hunk.context_lines.append(line)
+                    self._lines.start(self._current_hunk)
+                    current_file.hunks.append(self._current_hunk)
+            return None
 
-        return self.files
+        # Inside hunk
+        current_hunk = self._current_hunk
+        if current_hunk:
+            if current_file.skip_reason is not None:
+                self._count_line(current_file, line)
+                return None
+
+            hunk_lines = self._lines.lines
+            if line.startswith("+") and not line.startswith("+++"):
+                hunk_lines[KIND_ADDED].append(line[1:])
+                current_hunk.line_kinds.append(KIND_ADDED)
+                current_file.additions += 1
+            elif line.startswith("-") and not line.startswith("---"):
+                hunk_lines[KIND_REMOVED].append(line[1:])
+                current_hunk.line_kinds.append(KIND_REMOVED)
+                current_file.deletions += 1
+            else:
+                hunk_lines[KIND_CONTEXT].append(line)
+                current_hunk.line_kinds.append(KIND_CONTEXT)
+
+            file_filter = self.file_filter
+            if file_filter is not None and (
+                len(line) > file_filter.max_line_length
+                or current_file.additions + current_file.deletions > file_filter.max_lines
+            ):
+                # Drop what was stored so far; only count from here on
+                current_file.skip_reason = file_filter.line_reason(
+                    line, current_file.additions + current_file.deletions
+                )
+                current_file.hunks = []
+                self._lines = _LineStoreBuilder()
+
+        return None
+
+    def close(self) -> Optional[FileDiff]:
+        """
+        Signals end of input and returns the last pending `FileDiff`.
+        """
+        return self._finish_file()
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _reset(self):
+        self._current_file: Optional[FileDiff] = None
+        self._current_hunk: Optional[DiffHunk] = None
+        self._header_path: Optional[str] = None
+        self._old_path: Optional[str] = None
+        self._renamed_from: Optional[str] = None
+        self._similarity: Optional[int] = None
+        # Lines of the current file, joined into its LineStore when done
+        self._lines = _LineStoreBuilder()
+        self.stats = DiffStatsBuilder()
+
+    def _new_file(
+        self,
+        filename: str,
+        renamed_from: Optional[str] = None,
+        similarity: Optional[int] = None
+    ) -> FileDiff:
+        file_diff = FileDiff(filename=filename, renamed_from=renamed_from, similarity=similarity)
+        if self.file_filter is not None:
+            file_diff.skip_reason = self.file_filter.path_reason(filename)
+        if (
+            self.deadline is not None
+            and file_diff.skip_reason is None
+            and self.deadline.expired()
+        ):
+            file_diff.skip_reason = DEADLINE_REASON
+        return file_diff
+
+    def _count_line(self, current_file: FileDiff, line: str):
+        if line.startswith("+") and not line.startswith("+++"):
+            current_file.additions += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            current_file.deletions += 1
+
+    def _finish_file(self) -> Optional[FileDiff]:
+        finished = self._current_file
+        if finished is None and self._renamed_from is not None and self._header_path:
+            # Pure rename: no "---" / "+++" lines and no hunks follow
+            finished = self._new_file(self._header_path, self._renamed_from, self._similarity)
+        if finished is not None and finished.hunks:
+            self._lines.build()
+        self._lines = _LineStoreBuilder()
+        self._current_file = None
+        self._current_hunk = None
+        self._header_path = None
+        self._old_path = None
+        self._renamed_from = None
+        self._similarity = None
+        if finished is not None:
+            self.stats.add(finished)
+        return finished
@@ -1,8 +1,12 @@
-import re
 from dataclasses import dataclass, field
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set, Tuple
 
-from core.diff_parser import FileDiff, DiffHunk
+from core.deadline import DEADLINE_REASON, Deadline
+from core.diff_parser import FileDiff, DiffHunk, KIND_ADDED, KIND_CONTEXT, KIND_REMOVED
+from core.keyword_matcher import LineScan
+from core.languages import Language, LanguageRegistry, languages
+from core.move_detector import FileMoves
+from core.scope_index import ScopeIndex, first_line, gap_key, walk_hunk
 
 
 # -----------------------------
@@ -25,6 +29,15 @@ class FileSemantics:
     behavior_changed: bool = False
     only_formatting: bool = True
     total_logic_changes: int = 0
+    additions: int = 0
+    deletions: int = 0
+    # Copied from FileDiff; such files are counted, not analysed
+    skip_reason: Optional[str] = None
+    renamed_from: Optional[str] = None
+    # Changed lines that were moved or only reformatted; not analysed
+    moved_lines: int = 0
+    # Rule set the file was analysed with; None when its language has none
+    language: Optional[str] = None
 
 
 # -----------------------------
@@ -37,117 +50,306 @@ class DiffSemanticAnalyzer:
     - Which functions are impacted
     - Whether logic or behavior changed
     - Nature of the changes
-    """
 
-    FUNC_DEF_RE = re.compile(r"\bdef\s+([a-zA-Z_][a-zA-Z0-9_]*)")
-    CLASS_DEF_RE = re.compile(r"\bclass\s+([a-zA-Z_][a-zA-Z0-9_]*)")
+    Changed lines are attributed through a per-file `ScopeIndex`, built
+    from hunk section headers and `def` lines in the diff, or from the
+    full new file when `file_contents` has it.
+
+    Once `deadline` expires (checked per file and per hunk), files are
+    only counted, as if skipped with DEADLINE_REASON.
+
+    Lines listed in `moves` (see MoveDetector) are treated as unchanged.
 
-    LOGIC_KEYWORDS = (
-        "if ", "elif ", "else:",
-        "return ", "raise ",
-        "for ", "while ",
-        "try:", "except ",
-        "and ", "or ",
-    )
+    Rules (definition regexes, logic keywords, comment syntax) come from
+    the language registered for the file's extension; files in languages
+    without rules are only checked for non-whitespace changes.
+    """
 
-    def __init__(self, parsed_diff: Dict[str, FileDiff]):
+    def __init__(
+        self,
+        parsed_diff: Dict[str, FileDiff],
+        file_contents: Optional[Dict[str, str]] = None,
+        deadline: Optional[Deadline] = None,
+        moves: Optional[Dict[str, FileMoves]] = None,
+        registry: Optional[LanguageRegistry] = None,
+    ):
         self.parsed_diff = parsed_diff
+        self.file_contents = file_contents or {}
+        self.deadline = deadline
+        self.moves = moves or {}
+        self.languages = registry or languages
 
     def analyze(self) -> Dict[str, FileSemantics]:
         result: Dict[str, FileSemantics] = {}
 
         for filename, file_diff in self.parsed_diff.items():
-            semantics = FileSemantics(filename=filename)
+            result[filename] = self.analyze_file(
+                filename, file_diff, self.file_contents.get(filename)
+            )
+
+        return result
+
+    def analyze_file(
+        self,
+        filename: str,
+        file_diff: FileDiff,
+        source: Optional[str] = None
+    ) -> FileSemantics:
+        semantics = self._empty(filename, file_diff)
+
+        if file_diff.skip_reason is not None:
+            return self._counts_only(semantics, file_diff.skip_reason)
 
-            current_function = None
-            current_class = None
+        deadline = self.deadline
+        if deadline is not None and deadline.expired():
+            return self._counts_only(semantics, DEADLINE_REASON)
 
-            for hunk in file_diff.hunks:
-                # Analyze context first (to know where we are)
+        language = self.languages.for_path(filename)
+        if language is not None:
+            semantics.language = language.name
+
+        moves = self.moves.get(filename)
+        if moves is not None:
+            semantics.moved_lines = moves.lines
+            if moves.reformatted:
+                return semantics
+
+        if language is None:
+            return self._changed_only(semantics, file_diff, moves)
+
+        scopes = self.scope_index(file_diff, source, language)
+
+        for index, hunk in enumerate(file_diff.hunks):
+            if deadline is not None and deadline.expired():
+                # Half-analysed files would understate the change
+                return self._counts_only(self._empty(filename, file_diff), DEADLINE_REASON)
+
+            if moves is not None and (index in moves.added or index in moves.removed):
+                hunk = self._without_moves(
+                    hunk, moves.added.get(index, ()), moves.removed.get(index, ())
+                )
+
+            if language.class_marker in hunk.text(KIND_CONTEXT):
                 for ctx in hunk.context_lines:
-                    func_match = self.FUNC_DEF_RE.search(ctx)
-                    class_match = self.CLASS_DEF_RE.search(ctx)
-
-                    if func_match:
-                        current_function = func_match.group(1)
-                    if class_match:
-                        current_class = class_match.group(1)
-                        semantics.classes_changed.add(current_class)
-
-                # Analyze added lines
-                for line in hunk.added_lines:
-                    self._process_line(
-                        line=line,
-                        semantics=semantics,
-                        function=current_function,
-                        is_addition=True
-                    )
-
-                # Analyze removed lines
-                for line in hunk.removed_lines:
-                    self._process_line(
-                        line=line,
-                        semantics=semantics,
-                        function=current_function,
-                        is_addition=False
-                    )
-
-            result[filename] = semantics
+                    class_name = language.class_name(ctx)
+                    if class_name:
+                        semantics.classes_changed.add(class_name)
+
+            start = first_line(hunk)
+            uniform, function = scopes.uniform(
+                gap_key(start), gap_key(start + hunk.new_count)
+            )
+
+            removed_lines = hunk.removed_lines
+            if uniform and not language.has_function(removed_lines):
+                # Whole hunk sits in one scope: analyze in bulk
+                self._process_lines(
+                    lines=hunk.added_lines,
+                    semantics=semantics,
+                    function=function,
+                    is_addition=True,
+                    language=language
+                )
+                self._process_lines(
+                    lines=removed_lines,
+                    semantics=semantics,
+                    function=function,
+                    is_addition=False,
+                    language=language
+                )
+            else:
+                self._process_by_scope(hunk, scopes, semantics, language)
 
-        return result
+        return semantics
+
+    def scope_index(
+        self,
+        file_diff: FileDiff,
+        source: Optional[str] = None,
+        language: Optional[Language] = None
+    ) -> ScopeIndex:
+        language = language or self.languages.for_path(file_diff.filename)
+        if language is None:
+            return ScopeIndex()
+
+        if source is not None:
+            return ScopeIndex.from_source(
+                source, language.scope_name, language.rules.comment_prefixes
+            )
+
+        markers: List[Tuple[int, Optional[str]]] = []
+
+        for hunk in file_diff.hunks:
+            # git names the enclosing function line; anything else means
+            # the hunk starts outside a function
+            if hunk.section:
+                markers.append(
+                    (gap_key(first_line(hunk)), language.function_name(hunk.section))
+                )
+
+            if language.has_function((hunk.text(KIND_CONTEXT), hunk.text(KIND_ADDED))):
+                for kind, position, line in walk_hunk(hunk):
+                    if kind != KIND_REMOVED:
+                        name = language.function_name(line)
+                        if name:
+                            markers.append((position, name))
+
+        return ScopeIndex.from_markers(markers)
 
     # -----------------------------
     # Internal helpers
     # -----------------------------
 
-    def _process_line(
+    def _empty(self, filename: str, file_diff: FileDiff) -> FileSemantics:
+        return FileSemantics(
+            filename=filename,
+            additions=file_diff.additions,
+            deletions=file_diff.deletions,
+            renamed_from=file_diff.renamed_from,
+        )
+
+    def _without_moves(self, hunk: DiffHunk, added, removed) -> DiffHunk:
+        """
+        Copy of `hunk` in which moved added lines read as context (they
+        still occupy new-file lines) and moved removed lines are gone.
+        """
+        result_added: List[str] = []
+        result_removed: List[str] = []
+        result_context: List[str] = []
+        line_kinds = bytearray()
+        added_lines = iter(hunk.added_lines)
+        removed_lines = iter(hunk.removed_lines)
+        context_lines = iter(hunk.context_lines)
+        added_index = removed_index = 0
+
+        for kind in hunk.line_kinds:
+            if kind == KIND_ADDED:
+                line = next(added_lines)
+                if added_index in added:
+                    kind = KIND_CONTEXT
+                    result_context.append(line)
+                else:
+                    result_added.append(line)
+                added_index += 1
+            elif kind == KIND_REMOVED:
+                line = next(removed_lines)
+                moved = removed_index in removed
+                removed_index += 1
+                if moved:
+                    continue
+                result_removed.append(line)
+            else:
+                result_context.append(next(context_lines))
+            line_kinds.append(kind)
+
+        return DiffHunk(
+            old_start=hunk.old_start,
+            old_count=hunk.old_count,
+            new_start=hunk.new_start,
+            new_count=hunk.new_count,
+            added_lines=result_added,
+            removed_lines=result_removed,
+            context_lines=result_context,
+            section=hunk.section,
+            line_kinds=line_kinds,
+        )
+
+    def _counts_only(self, semantics: FileSemantics, reason: str) -> FileSemantics:
+        # Unknown content: neither formatting-only nor a behavior change
+        semantics.skip_reason = reason
+        semantics.only_formatting = False
+        return semantics
+
+    def _changed_only(
         self,
-        line: str,
         semantics: FileSemantics,
-        function: str,
-        is_addition: bool
+        file_diff: FileDiff,
+        moves: Optional[FileMoves]
+    ) -> FileSemantics:
+        # No rules for this language: only tell whitespace from the rest
+        for index, hunk in enumerate(file_diff.hunks):
+            if moves is not None and (index in moves.added or index in moves.removed):
+                hunk = self._without_moves(
+                    hunk, moves.added.get(index, ()), moves.removed.get(index, ())
+                )
+            if any(map(str.strip, hunk.added_lines)) or any(map(str.strip, hunk.removed_lines)):
+                semantics.only_formatting = False
+                break
+        return semantics
+
+    def _process_by_scope(
+        self,
+        hunk: DiffHunk,
+        scopes: ScopeIndex,
+        semantics: FileSemantics,
+        language: Language
     ):
-        stripped = line.strip()
-
-        # Ignore empty lines
-        if not stripped:
-            return
+        # function -> (added lines, removed lines), in first-seen order
+        groups: Dict[Optional[str], Tuple[List[str], List[str]]] = {}
+        # A removed `def` owns the removed lines that follow it
+        removed_function = None
+
+        for kind, position, line in walk_hunk(hunk):
+            if kind == KIND_CONTEXT:
+                removed_function = None
+                continue
+
+            if kind == KIND_REMOVED:
+                name = language.function_name(line)
+                if name:
+                    removed_function = name
+                function = removed_function or scopes.lookup(position)
+                groups.setdefault(function, ([], []))[1].append(line)
+            else:
+                removed_function = None
+                groups.setdefault(scopes.lookup(position), ([], []))[0].append(line)
 
-        # Comment-only change
-        if stripped.startswith("#"):
-            return
+        for function, (added, removed) in groups.items():
+            self._process_lines(added, semantics, function, True, language)
+            self._process_lines(removed, semantics, function, False, language)
 
-        # Formatting-only change
-        if stripped in ("pass",):
+    def _process_lines(
+        self,
+        lines,
+        semantics: FileSemantics,
+        function: str,
+        is_addition: bool,
+        language: Language
+    ):
+        # Drops empty lines, comment-only and formatting-only changes
+        meaningful = language.matcher.meaningful(lines)
+        if not meaningful:
             return
 
         # Now we assume real logic
         semantics.only_formatting = False
 
-        if function:
-            if function not in semantics.functions_changed:
-                semantics.functions_changed[function] = FunctionChange(name=function)
+        if not function:
+            return
+
+        if function not in semantics.functions_changed:
+            semantics.functions_changed[function] = FunctionChange(name=function)
 
-            func_change = semantics.functions_changed[function]
+        func_change = semantics.functions_changed[function]
+        scan: LineScan = language.matcher.scan(meaningful)
 
-            if is_addition:
-                func_change.added_lines += 1
-            else:
-                func_change.removed_lines += 1
-
-            # Detect logic type
-            for kw in self.LOGIC_KEYWORDS:
-                if kw in stripped:
-                    func_change.change_types.add("logic")
-                    semantics.total_logic_changes += 1
-                    semantics.behavior_changed = True
-
-            # Detect signature change
-            if stripped.startswith("def "):
-                func_change.change_types.add("signature")
-                semantics.behavior_changed = True
-
-            # Detect return modification
-            if stripped.startswith("return"):
-                func_change.change_types.add("return")
-                semantics.behavior_changed = True
+        if is_addition:
+            func_change.added_lines += scan.lines
+        else:
+            func_change.removed_lines += scan.lines
+
+        # Detect logic type (one count per keyword per line)
+        if scan.logic_hits:
+            func_change.change_types.add("logic")
+            semantics.total_logic_changes += scan.logic_hits
+            semantics.behavior_changed = True
+
+        # Detect signature change
+        if scan.signature:
+            func_change.change_types.add("signature")
+            semantics.behavior_changed = True
+
+        # Detect return modification
+        if scan.returns:
+            func_change.change_types.add("return")
+            semantics.behavior_changed = True
@@ -0,0 +1,181 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from core.deadline import DEADLINE_REASON
+
+
+class DiffStats:
+    """
+    Column-oriented per-file change counts for a whole PR: one NumPy
+    array per measure, row i describing `filenames[i]`. Aggregations
+    over tens of thousands of files stay vectorised.
+
+    `moved` counts changed lines that were only moved or reformatted;
+    they are left out of `churn`.
+    """
+
+    __slots__ = (
+        "filenames", "directories",
+        "additions", "deletions", "hunks", "directory_ids", "skipped", "moved",
+    )
+
+    def __init__(
+        self,
+        filenames: List[str],
+        directories: List[str],
+        additions: np.ndarray,
+        deletions: np.ndarray,
+        hunks: np.ndarray,
+        directory_ids: np.ndarray,
+        skipped: np.ndarray,
+        moved: Optional[np.ndarray] = None,
+    ):
+        self.filenames = filenames
+        self.directories = directories
+        self.additions = additions
+        self.deletions = deletions
+        self.hunks = hunks
+        self.directory_ids = directory_ids
+        self.skipped = skipped
+        self.moved = moved if moved is not None else np.zeros(len(filenames), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    @property
+    def churn(self) -> np.ndarray:
+        return self.additions + self.deletions - self.moved
+
+    @classmethod
+    def from_files(cls, files: Iterable) -> "DiffStats":
+        builder = DiffStatsBuilder()
+        for file_diff in files:
+            builder.add(file_diff)
+        return builder.build()
+
+    @classmethod
+    def concat(cls, parts: Sequence["DiffStats"]) -> "DiffStats":
+        """
+        Joins tables built independently (e.g. per shard), re-numbering
+        directory ids into one shared directory list.
+        """
+        directories: List[str] = []
+        index: Dict[str, int] = {}
+        remapped = []
+
+        for part in parts:
+            mapping = np.empty(len(part.directories), dtype=np.int32)
+            for i, directory in enumerate(part.directories):
+                if directory not in index:
+                    index[directory] = len(directories)
+                    directories.append(directory)
+                mapping[i] = index[directory]
+            remapped.append(mapping[part.directory_ids] if len(part) else part.directory_ids)
+
+        filenames: List[str] = []
+        for part in parts:
+            filenames.extend(part.filenames)
+
+        def column(name, dtype):
+            arrays = [getattr(part, name) for part in parts]
+            return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+        return cls(
+            filenames=filenames,
+            directories=directories,
+            additions=column("additions", np.int64),
+            deletions=column("deletions", np.int64),
+            hunks=column("hunks", np.int64),
+            directory_ids=np.concatenate(remapped) if remapped else np.empty(0, dtype=np.int32),
+            skipped=column("skipped", np.bool_),
+            moved=column("moved", np.int64),
+        )
+
+    def select(self, names: Iterable[str]) -> "DiffStats":
+        wanted = set(names)
+        rows = np.fromiter(
+            (i for i, name in enumerate(self.filenames) if name in wanted),
+            dtype=np.int64,
+        )
+        return DiffStats(
+            filenames=[self.filenames[i] for i in rows],
+            directories=self.directories,
+            additions=self.additions[rows],
+            deletions=self.deletions[rows],
+            hunks=self.hunks[rows],
+            directory_ids=self.directory_ids[rows],
+            skipped=self.skipped[rows],
+            moved=self.moved[rows],
+        )
+
+    def with_moves(self, moves: Dict) -> "DiffStats":
+        """
+        Copy with the `moved` column set from MoveDetector results
+        (filename -> FileMoves).
+        """
+        if not moves:
+            return self
+        moved = self.moved.copy()
+        for row, filename in enumerate(self.filenames):
+            file_moves = moves.get(filename)
+            if file_moves is not None:
+                moved[row] = file_moves.lines
+        return DiffStats(
+            filenames=self.filenames,
+            directories=self.directories,
+            additions=self.additions,
+            deletions=self.deletions,
+            hunks=self.hunks,
+            directory_ids=self.directory_ids,
+            skipped=self.skipped,
+            moved=moved,
+        )
+
+
+class DiffStatsBuilder:
+    """
+    Appends one row per finished file into typed arrays while the parser
+    runs; `build()` turns them into a `DiffStats` without per-object
+    passes over the parsed diff.
+    """
+
+    def __init__(self):
+        self.filenames: List[str] = []
+        self.directories: List[str] = []
+        self._directory_index: Dict[str, int] = {}
+        self._additions = array("q")
+        self._deletions = array("q")
+        self._hunks = array("q")
+        self._directory_ids = array("i")
+        self._skipped = array("b")
+
+    def add(self, file_diff):
+        filename = file_diff.filename
+        directory = filename.rpartition("/")[0]
+
+        directory_id = self._directory_index.get(directory)
+        if directory_id is None:
+            directory_id = self._directory_index[directory] = len(self.directories)
+            self.directories.append(directory)
+
+        self.filenames.append(filename)
+        self._additions.append(file_diff.additions)
+        self._deletions.append(file_diff.deletions)
+        self._hunks.append(len(file_diff.hunks))
+        self._directory_ids.append(directory_id)
+        # Files cut short by the time budget still carry real risk
+        skip_reason = file_diff.skip_reason
+        self._skipped.append(skip_reason is not None and skip_reason != DEADLINE_REASON)
+
+    def build(self) -> DiffStats:
+        return DiffStats(
+            filenames=list(self.filenames),
+            directories=list(self.directories),
+            additions=np.array(self._additions, dtype=np.int64),
+            deletions=np.array(self._deletions, dtype=np.int64),
+            hunks=np.array(self._hunks, dtype=np.int64),
+            directory_ids=np.array(self._directory_ids, dtype=np.int32),
+            skipped=np.array(self._skipped, dtype=np.bool_),
+        )
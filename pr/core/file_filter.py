@@ -0,0 +1,167 @@
+import fnmatch
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+
+# (pattern, reason). Patterns follow .gitattributes rules: without a "/"
+# they match the file name at any depth, otherwise the path from the root.
+DEFAULT_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ("package-lock.json", "lockfile"),
+    ("npm-shrinkwrap.json", "lockfile"),
+    ("yarn.lock", "lockfile"),
+    ("pnpm-lock.yaml", "lockfile"),
+    ("poetry.lock", "lockfile"),
+    ("Pipfile.lock", "lockfile"),
+    ("uv.lock", "lockfile"),
+    ("Cargo.lock", "lockfile"),
+    ("composer.lock", "lockfile"),
+    ("Gemfile.lock", "lockfile"),
+    ("go.sum", "lockfile"),
+    ("*.min.js", "minified"),
+    ("*.min.css", "minified"),
+    ("*.map", "source map"),
+    ("*.snap", "snapshot"),
+    ("**/__snapshots__/**", "snapshot"),
+    ("**/vendor/**", "vendored"),
+    ("**/node_modules/**", "vendored"),
+    ("**/third_party/**", "vendored"),
+    ("*_pb2.py", "generated"),
+    ("*_pb2_grpc.py", "generated"),
+    ("*.pb.go", "generated"),
+    ("*.generated.*", "generated"),
+)
+
+# .gitattributes attribute -> skip reason when set
+ATTRIBUTE_REASONS = (
+    ("linguist-generated", "generated"),
+    ("linguist-vendored", "vendored"),
+    ("binary", "binary"),
+)
+
+BINARY_MARKERS = ("Binary files ", "GIT binary patch")
+
+
+class FileFilter:
+    """
+    Decides which files are only counted, not analysed: generated,
+    vendored and binary files (by path pattern or `.gitattributes`
+    rules) and files with pathological lines or line counts.
+
+    The parser consults it once per file path and once per hunk line;
+    skipped files keep their addition/deletion counts but no hunks.
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[Tuple[str, str]] = DEFAULT_PATTERNS,
+        gitattributes: str = "",
+        max_line_length: int = 5000,
+        max_lines: int = 20000,
+    ):
+        self.patterns = tuple(patterns)
+        self.gitattributes = gitattributes
+        self.max_line_length = max_line_length
+        self.max_lines = max_lines
+
+        self._rules = [(_compile(pattern), reason) for pattern, reason in self.patterns]
+        self._attributes = parse_gitattributes(gitattributes)
+        self.digest = hashlib.sha1(repr((
+            self.patterns, gitattributes, max_line_length, max_lines
+        )).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_env(cls) -> "FileFilter":
+        gitattributes = ""
+        path = os.getenv("PR_GITATTRIBUTES")
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                gitattributes = f.read()
+
+        return cls(
+            gitattributes=gitattributes,
+            max_line_length=int(os.getenv("PR_SKIP_MAX_LINE_LENGTH", 5000)),
+            max_lines=int(os.getenv("PR_SKIP_MAX_FILE_LINES", 20000)),
+        )
+
+    def with_gitattributes(self, text: str) -> "FileFilter":
+        """
+        Copy with a repository's `.gitattributes` appended (its rules win).
+        """
+        return FileFilter(
+            patterns=self.patterns,
+            gitattributes=f"{self.gitattributes}\n{text}",
+            max_line_length=self.max_line_length,
+            max_lines=self.max_lines,
+        )
+
+    def path_reason(self, path: str) -> Optional[str]:
+        # Last matching .gitattributes line wins, per attribute
+        state: Dict[str, bool] = {}
+        for regex, attributes in self._attributes:
+            if regex.match(path):
+                state.update(attributes)
+
+        for attribute, reason in ATTRIBUTE_REASONS:
+            if state.get(attribute):
+                return reason
+        if state.get("diff") is False:
+            return "binary"
+        if state.get("linguist-generated") is False or state.get("linguist-vendored") is False:
+            # Explicitly marked as hand-written
+            return None
+
+        for regex, reason in self._rules:
+            if regex.match(path):
+                return reason
+        return None
+
+    def line_reason(self, line: str, changed_lines: int) -> Optional[str]:
+        if len(line) > self.max_line_length:
+            return f"line longer than {self.max_line_length} characters"
+        if changed_lines > self.max_lines:
+            return f"more than {self.max_lines} changed lines"
+        return None
+
+
+def parse_gitattributes(text: str) -> List[Tuple[Pattern, Dict[str, bool]]]:
+    """
+    `pattern attr -attr attr=value` lines -> (path regex, {attr: set?}).
+    Values other than "false" count as set.
+    """
+    rules = []
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        pattern, *attributes = line.split()
+        state: Dict[str, bool] = {}
+        for attribute in attributes:
+            if attribute.startswith(("-", "!")):
+                state[attribute[1:]] = False
+            elif "=" in attribute:
+                name, value = attribute.split("=", 1)
+                state[name] = value.lower() != "false"
+            else:
+                state[attribute] = True
+
+        if state:
+            rules.append((_compile(pattern), state))
+
+    return rules
+
+
+def _compile(pattern: str) -> Pattern:
+    pattern = pattern.rstrip("/")
+
+    if "/" not in pattern:
+        # Name pattern: any directory depth
+        return re.compile(r"(?:.*/)?" + fnmatch.translate(pattern))
+
+    pattern = pattern.lstrip("/")
+    if pattern.startswith("**/"):
+        return re.compile(r"(?:.*/)?" + fnmatch.translate(pattern[3:]))
+    return re.compile(fnmatch.translate(pattern))
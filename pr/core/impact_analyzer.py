@@ -1,5 +1,9 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import List
+
+import numpy as np
+
+from core.diff_stats import DiffStats
 
 
 @dataclass
@@ -7,34 +11,138 @@ class ImpactStats:
     files_changed: int
     additions: int
     deletions: int
+    directories: int = 0
+    skipped_files: int = 0
+    # Moved or reformatted lines, included in additions / deletions
+    moved_lines: int = 0
+
+
+@dataclass
+class Hotspot:
+    filename: str
+    additions: int
+    deletions: int
+    hunks: int
+    share: float  # of the PR's analysed churn
+
+    @property
+    def churn(self) -> int:
+        return self.additions + self.deletions
 
 
 class ImpactAnalyzer:
     """
     Analyzes the overall impact and risk of a PR based on change size and spread.
+
+    Works on the parser's columnar `DiffStats`, so every aggregate is a
+    vectorised pass regardless of file count. Files the filter skipped
+    (lockfiles, generated, vendored, binary) are reported in the totals
+    but don't drive risk, scope or hotspots. Moved and reformatted
+    lines (`DiffStats.moved`) don't count as churn.
     """
 
-    def __init__(self, stats):
+    # 90th-percentile per-file churn; with one file this is its churn,
+    # so single-file PRs keep the original bands
+    FILE_CHURN_BANDS = (50, 200)
+    TOTAL_CHURN_BANDS = (200, 1000)
+    # Directories touched: up to the first is localized, from the second broad
+    DIRECTORY_BANDS = (1, 5)
+
+    def __init__(self, stats, hotspot_count: int = 5):
         """
-        stats: FileDiff or None
+        stats: DiffStats, a single FileDiff, or None
         """
+        if stats is None:
+            stats = DiffStats.from_files(())
+        elif not isinstance(stats, DiffStats):
+            stats = DiffStats.from_files((stats,))
+
         self.stats = stats
+        self.hotspot_count = hotspot_count
+
+        churn = stats.churn
+        # Files whose every change was moved code don't spread the risk
+        self._rows = np.flatnonzero(~stats.skipped & ~((churn == 0) & (stats.moved > 0)))
+        self._churn = churn[self._rows]
+        self._total_churn = int(self._churn.sum())
+
+        touched = np.bincount(
+            stats.directory_ids[self._rows], minlength=len(stats.directories)
+        )
+        self._directories = int(np.count_nonzero(touched))
+
+    def summary(self) -> ImpactStats:
+        return ImpactStats(
+            files_changed=len(self.stats),
+            additions=int(self.stats.additions.sum()),
+            deletions=int(self.stats.deletions.sum()),
+            directories=self._directories,
+            skipped_files=int(np.count_nonzero(self.stats.skipped)),
+            moved_lines=int(self.stats.moved.sum()),
+        )
+
+    def churn_percentile(self, q: float) -> float:
+        if not len(self._churn):
+            return 0.0
+        return float(np.percentile(self._churn, q))
 
     def risk_level(self) -> str:
-        if not self.stats:
+        if not len(self._churn):
             return "Low"
 
-        churn = self.stats.additions + self.stats.deletions
+        file_churn = self.churn_percentile(90)
+        medium_file, high_file = self.FILE_CHURN_BANDS
+        medium_total, high_total = self.TOTAL_CHURN_BANDS
 
-        if churn < 50:
-            return "Low"
-        if churn < 200:
+        if file_churn >= high_file or self._total_churn >= high_total:
+            return "High"
+        if (
+            file_churn >= medium_file
+            or self._total_churn >= medium_total
+            or self._directories >= self.DIRECTORY_BANDS[1]
+        ):
             return "Medium"
-        return "High"
+        return "Low"
 
     def scope(self) -> str:
-        if not self.stats:
+        localized, broad = self.DIRECTORY_BANDS
+
+        if self._directories <= localized:
             return "Localized"
+        if self._directories < broad:
+            return "Moderate"
+        return "Broad"
+
+    def directories_touched(self) -> int:
+        return self._directories
+
+    def hotspots(self, count: int = 0) -> List[Hotspot]:
+        """
+        The files carrying the most churn, largest first.
+        """
+        count = min(count or self.hotspot_count, int(np.count_nonzero(self._churn)))
+        if count <= 0:
+            return []
+
+        churn = self._churn
+        # Everything above the count-th largest churn, then the earliest
+        # files tied with it, so equal files are picked in diff order
+        kth = -np.partition(-churn, count - 1)[count - 1]
+        above = np.flatnonzero(churn > kth)
+        tied = np.flatnonzero(churn == kth)[:count - len(above)]
+        top = np.concatenate((above, tied))
+        # Largest first; ties keep diff order
+        top = top[np.lexsort((top, -churn[top]))]
 
-        # FileDiff represents one file; broader scope handled earlier
-        return "Localized"
+        stats = self.stats
+        hotspots = []
+        for i in top:
+            row = self._rows[i]
+            hotspots.append(Hotspot(
+                filename=stats.filenames[row],
+                additions=int(stats.additions[row]),
+                deletions=int(stats.deletions[row]),
+                hunks=int(stats.hunks[row]),
+                share=int(self._churn[i]) / self._total_churn,
+            ))
+        return hotspots
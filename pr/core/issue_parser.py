@@ -1,6 +1,6 @@
 import re
 from dataclasses import dataclass
-from typing import List
+from typing import Iterator, List
 
 
 @dataclass
@@ -11,10 +11,146 @@ class IssueIntent:
     constraints: List[str]
 
 
+# -----------------------------
+# Tokenizer
+# -----------------------------
+
+BLOCK_PROSE = "prose"
+BLOCK_CODE = "code"
+BLOCK_LOG = "log"
+BLOCK_QUOTE = "quote"
+# Everything after the scan limit
+BLOCK_UNSCANNED = "unscanned"
+
+
+@dataclass
+class IssueBlock:
+    kind: str
+    start: int
+    end: int
+
+
+class IssueTokenizer:
+    """
+    Splits issue text into prose, fenced code, log output and quoted
+    replies in one forward pass. Fenced blocks are skipped with a
+    substring search for their closing fence. Nothing past
+    `max_scan_bytes` characters is looked at, so pasted logs cost at
+    most that much.
+    """
+
+    FENCE = re.compile(r"[ \t]{0,3}(`{3,}|~{3,})")
+    QUOTE_HEADER = re.compile(r"On .{1,200} wrote:\s*$")
+    LOG_LINE = re.compile(
+        r"\s*(?:"
+        r"Traceback \(most recent call last\)"
+        r"|File \".*\", line \d+"
+        r"|at [\w$.<>/]+\(.*\)$"
+        r"|\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}"
+        r"|\[?(?:TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\]?[\s:]"
+        r"|[\w.]+(?:Error|Exception):"
+        r"|\$ \S"
+        r")"
+    )
+
+    def __init__(self, max_scan_bytes: int = 256 * 1024):
+        self.max_scan_bytes = max_scan_bytes
+
+    def iter_blocks(self, text: str) -> Iterator[IssueBlock]:
+        length = len(text)
+        limit = min(length, self.max_scan_bytes)
+
+        kind = None
+        start = 0
+        pos = 0
+
+        while pos < limit:
+            # Lines running past the limit are cut at it
+            end = text.find("\n", pos, limit)
+            cut = end == -1
+            if cut:
+                end = limit if limit < length else length
+
+            fence = self.FENCE.match(text, pos, end)
+            if fence:
+                if kind is not None:
+                    yield IssueBlock(kind, start, pos)
+                    kind = None
+                block_end = _closing_fence(text, fence.group(1), end + 1, limit)
+                if block_end == -1:
+                    # Unclosed, or closed past the scan limit
+                    yield IssueBlock(BLOCK_CODE, pos, limit)
+                    pos = limit
+                    break
+                yield IssueBlock(BLOCK_CODE, pos, block_end)
+                pos = block_end + 1
+                continue
+
+            line_kind = self._line_kind(text, pos, end, kind)
+            if line_kind != kind:
+                if kind is not None:
+                    yield IssueBlock(kind, start, pos)
+                kind = line_kind
+                start = pos
+            pos = end if cut else end + 1
+
+        if kind is not None:
+            yield IssueBlock(kind, start, min(pos, length))
+        if pos < length:
+            yield IssueBlock(BLOCK_UNSCANNED, pos, length)
+
+    def _line_kind(self, text: str, pos: int, end: int, previous) -> str:
+        first = text[pos:pos + 1]
+
+        if first == ">":
+            return BLOCK_QUOTE
+        if pos == end or text[pos:end].isspace():
+            # Blank lines don't break the current block
+            return previous or BLOCK_PROSE
+        if self.LOG_LINE.match(text, pos, end):
+            return BLOCK_LOG
+        if previous == BLOCK_LOG and first in (" ", "\t"):
+            # Indented continuation of a log / stack trace
+            return BLOCK_LOG
+        if self.QUOTE_HEADER.match(text, pos, end):
+            return BLOCK_QUOTE
+        return BLOCK_PROSE
+
+
+def _closing_fence(text: str, marker: str, pos: int, limit: int) -> int:
+    """
+    End of the line closing a fence opened with `marker` (at least as
+    many of the same character, indented at most three spaces, nothing
+    else on the line), or -1 if there is none before `limit`.
+    """
+    while True:
+        found = text.find(marker, pos, limit)
+        if found == -1:
+            return -1
+
+        line_start = text.rfind("\n", 0, found) + 1
+        line_end = text.find("\n", found)
+        if line_end == -1:
+            line_end = len(text)
+
+        indent = text[line_start:found]
+        rest = text[found:line_end].rstrip(" \t\r")
+        if len(indent) <= 3 and not indent.strip(" ") and not rest.strip(marker[0]):
+            return line_end
+        pos = line_end
+
+
+# -----------------------------
+# Parser
+# -----------------------------
+
 class IssueParser:
     """
     Parses issue / ticket / description text.
     Extracts intent and constraints in a conservative manner.
+
+    Only prose is considered: fenced code, logs and quoted replies are
+    skipped, and at most `max_prose_bytes` (UTF-8) of prose is read.
     """
 
     BUG_KEYWORDS = (
@@ -37,11 +173,19 @@ class IssueParser:
         r"ensure\s+that\s+[\w\s]+",
     )
 
-    def __init__(self, issue_text: str):
+    def __init__(
+        self,
+        issue_text: str,
+        max_prose_bytes: int = 64 * 1024,
+        max_scan_bytes: int = 256 * 1024,
+    ):
         self.text = issue_text.strip()
+        self.max_prose_bytes = max_prose_bytes
+        self.tokenizer = IssueTokenizer(max_scan_bytes)
 
     def parse(self) -> IssueIntent:
-        lowered = self.text.lower()
+        prose = self._extract_prose(self.text)
+        lowered = prose.lower()
 
         intent = "update"
 
@@ -52,8 +196,11 @@ class IssueParser:
         elif self._contains_any(lowered, self.REFACTOR_KEYWORDS):
             intent = "refactor"
 
-        summary = self._extract_summary(self.text)
-        constraints = self._extract_constraints(self.text)
+        if prose:
+            summary = self._extract_summary(prose)
+        else:
+            summary = self._fallback_summary(self.text)
+        constraints = self._extract_constraints(prose)
 
         return IssueIntent(
             raw_text=self.text,
@@ -66,6 +213,28 @@ class IssueParser:
     # Internal helpers
     # -------------------------
 
+    def _extract_prose(self, text: str) -> str:
+        """
+        Prose blocks joined in order, cut off at the byte budget. The
+        tokenizer is abandoned as soon as the budget is spent.
+        """
+        parts = []
+        remaining = self.max_prose_bytes
+
+        for block in self.tokenizer.iter_blocks(text):
+            if block.kind != BLOCK_PROSE:
+                continue
+
+            chunk = text[block.start:block.end]
+            encoded = chunk.encode("utf-8", "surrogatepass")
+            if len(encoded) >= remaining:
+                parts.append(encoded[:remaining].decode("utf-8", "ignore"))
+                break
+            parts.append(chunk)
+            remaining -= len(encoded)
+
+        return "\n".join(part.strip("\n") for part in parts).strip()
+
     def _contains_any(self, text: str, keywords) -> bool:
         return any(k in text for k in keywords)
 
@@ -80,6 +249,16 @@ class IssueParser:
                 return cleaned
         return text.strip()
 
+    def _fallback_summary(self, text: str) -> str:
+        """
+        Nothing but code / logs: the first line that isn't a fence.
+        """
+        for line in text[:1000].splitlines():
+            cleaned = line.strip()
+            if cleaned and not cleaned.startswith(("```", "~~~")):
+                return cleaned[:200]
+        return ""
+
     def _extract_constraints(self, text: str) -> List[str]:
         constraints = []
         lowered = text.lower()
@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from typing import Iterable, Tuple
+
+
+@dataclass
+class LineScan:
+    lines: int = 0
+    logic_hits: int = 0
+    signature: bool = False
+    returns: bool = False
+
+
+class KeywordMatcher:
+    """
+    Classifies changed lines against a fixed rule set in bulk.
+
+    A block of lines is filtered, stripped and joined once; each keyword
+    is then located with C-level `str.find` scans over the whole block,
+    counting at most one hit per keyword per line. This is equivalent to
+    testing `kw in line` for every keyword on every line.
+
+    With `word_boundaries`, keywords match whole words instead: one
+    starting (ending) with an identifier character doesn't count when
+    the text before (after) it continues the identifier, so "try" misses
+    "retry" and "else" misses "elsewhere".
+    """
+
+    def __init__(
+        self,
+        logic_keywords: Tuple[str, ...],
+        signature_prefixes: Tuple[str, ...] = ("def ",),
+        return_prefixes: Tuple[str, ...] = ("return",),
+        comment_prefixes: Tuple[str, ...] = ("#",),
+        ignored_lines: Tuple[str, ...] = ("pass",),
+        word_boundaries: bool = False,
+    ):
+        for kw in logic_keywords:
+            if not kw or "\n" in kw:
+                raise ValueError(f"Invalid keyword: {kw!r}")
+
+        self.logic_keywords = tuple(logic_keywords)
+        self.signature_prefixes = tuple(signature_prefixes)
+        self.return_prefixes = tuple(return_prefixes)
+        self.comment_prefixes = tuple(comment_prefixes)
+        self.ignored_lines = frozenset(ignored_lines)
+        self.word_boundaries = word_boundaries
+
+        # (keyword, needs boundary before, needs boundary after); scan()
+        # inlines _is_word_char
+        self._keywords = tuple(
+            (kw, word_boundaries and _is_word_char(kw[0]), word_boundaries and _is_word_char(kw[-1]))
+            for kw in self.logic_keywords
+        )
+
+        # Prefix at the start of any line after the first one
+        self._signature_markers = tuple("\n" + p for p in signature_prefixes)
+        self._return_markers = tuple("\n" + p for p in return_prefixes)
+
+    def meaningful(self, lines: Iterable[str]) -> list:
+        """
+        Stripped lines that count as real changes (not blank, comment-only
+        or ignored statements).
+        """
+        comment_prefixes = self.comment_prefixes
+        ignored = self.ignored_lines
+
+        return [
+            s for s in map(str.strip, lines)
+            if s
+            and not s.startswith(comment_prefixes)
+            and s not in ignored
+        ]
+
+    def scan(self, stripped_lines: list) -> LineScan:
+        """
+        Scans already-filtered lines (see `meaningful`) in one block.
+        """
+        if not stripped_lines:
+            return LineScan()
+
+        block = "\n".join(stripped_lines)
+        logic_hits = 0
+
+        if len(stripped_lines) == 1 and not self.word_boundaries:
+            # Single line: plain containment tests are cheapest
+            for kw in self.logic_keywords:
+                if kw in block:
+                    logic_hits += 1
+            return self._result(block, 1, logic_hits)
+
+        end = len(block)
+        find = block.find
+        for kw, before, after in self._keywords:
+            pos = find(kw)
+            while pos != -1:
+                kw_end = pos + len(kw)
+                if before and pos:
+                    char = block[pos - 1]
+                    if char.isalnum() or char in "_$":
+                        pos = find(kw, pos + 1)
+                        continue
+                if after and kw_end < end:
+                    char = block[kw_end]
+                    if char.isalnum() or char in "_$":
+                        pos = find(kw, pos + 1)
+                        continue
+                logic_hits += 1
+                line_end = find("\n", kw_end)
+                if line_end == -1:
+                    break
+                pos = find(kw, line_end + 1)
+
+        return self._result(block, len(stripped_lines), logic_hits)
+
+    def scan_line(self, stripped: str) -> LineScan:
+        return self.scan([stripped])
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _result(self, block: str, lines: int, logic_hits: int) -> LineScan:
+        return LineScan(
+            lines=lines,
+            logic_hits=logic_hits,
+            signature=self._has_prefix(
+                block, self.signature_prefixes, self._signature_markers
+            ),
+            returns=self._has_prefix(
+                block, self.return_prefixes, self._return_markers
+            ),
+        )
+
+    def _has_prefix(self, block: str, prefixes, markers) -> bool:
+        if block.startswith(prefixes):
+            return True
+        for marker in markers:
+            if marker in block:
+                return True
+        return False
+
+
+def _is_word_char(char: str) -> bool:
+    # "$" is part of JavaScript identifiers
+    return char.isalnum() or char in "_$"
@@ -0,0 +1,240 @@
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from core.keyword_matcher import KeywordMatcher
+
+
+# -----------------------------
+# Rule tables
+# -----------------------------
+
+@dataclass(frozen=True)
+class LanguageRules:
+    """
+    What DiffSemanticAnalyzer needs to know about one language. Regexes
+    capture the name in their last matching group; `function_markers` /
+    `class_marker` are substrings every match contains, checked before
+    running the regex.
+    """
+    name: str
+    extensions: Tuple[str, ...]
+    logic_keywords: Tuple[str, ...]
+    # Finds a function definition anywhere in a line or hunk header
+    function_def: str
+    function_markers: Tuple[str, ...]
+    # Matches a stripped line that opens a function (full-file scopes);
+    # defaults to `function_def`
+    scope_def: Optional[str] = None
+    class_def: Optional[str] = None
+    class_marker: str = "class"
+    signature_prefixes: Tuple[str, ...] = ()
+    return_prefixes: Tuple[str, ...] = ("return",)
+    comment_prefixes: Tuple[str, ...] = ()
+    ignored_lines: Tuple[str, ...] = ()
+    # Indentation is syntax: re-indenting is never just formatting
+    significant_indentation: bool = False
+    # Logic keywords match whole words only (see KeywordMatcher)
+    word_boundaries: bool = False
+
+
+PYTHON = LanguageRules(
+    name="python",
+    extensions=(".py", ".pyi", ".pyw"),
+    logic_keywords=(
+        "if ", "elif ", "else:",
+        "return ", "raise ",
+        "for ", "while ",
+        "try:", "except ",
+        "and ", "or ",
+    ),
+    function_def=r"\bdef\s+([a-zA-Z_][a-zA-Z0-9_]*)",
+    function_markers=("def",),
+    scope_def=r"(?:async\s+)?def\s+([a-zA-Z_][a-zA-Z0-9_]*)",
+    class_def=r"\bclass\s+([a-zA-Z_][a-zA-Z0-9_]*)",
+    signature_prefixes=("def ",),
+    comment_prefixes=("#",),
+    ignored_lines=("pass",),
+    significant_indentation=True,
+)
+
+JAVASCRIPT = LanguageRules(
+    name="javascript",
+    extensions=(".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts"),
+    logic_keywords=(
+        "if (", "else",
+        "return ", "throw ",
+        "for (", "while (",
+        "switch (", "case ",
+        "try", "catch",
+        "&&", "||", "??",
+    ),
+    function_def=(
+        r"\bfunction\b\s*\*?\s*([A-Za-z_$][\w$]*)"
+        r"|\b(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?"
+        r"(?:function\b|\([^()]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)"
+    ),
+    function_markers=("function", "=>"),
+    scope_def=(
+        r"(?:export\s+)?(?:default\s+)?(?:async\s+)?function\b\s*\*?\s*([A-Za-z_$][\w$]*)"
+        r"|(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?"
+        r"(?:function\b|\([^()]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)"
+    ),
+    class_def=r"\bclass\s+([A-Za-z_$][\w$]*)",
+    signature_prefixes=(
+        "function ", "async function ",
+        "export function ", "export async function ", "export default function ",
+    ),
+    comment_prefixes=("//", "/*", "* ", "*/"),
+    ignored_lines=("{", "}", "};", "})", "});", ")", ");", "]", "];"),
+    word_boundaries=True,
+)
+
+GO = LanguageRules(
+    name="go",
+    extensions=(".go",),
+    logic_keywords=(
+        "if ", "else",
+        "return ", "panic(",
+        "for ", "switch ", "select ", "case ",
+        "defer ",
+        "&&", "||",
+    ),
+    function_def=r"\bfunc\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)",
+    function_markers=("func",),
+    scope_def=r"func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)",
+    class_def=r"\btype\s+([A-Za-z_]\w*)\s+(?:struct|interface)\b",
+    class_marker="type",
+    signature_prefixes=("func ",),
+    comment_prefixes=("//", "/*", "* ", "*/"),
+    ignored_lines=("{", "}", ")", "})"),
+    word_boundaries=True,
+)
+
+BUILTIN_LANGUAGES: Tuple[LanguageRules, ...] = (PYTHON, JAVASCRIPT, GO)
+
+
+# -----------------------------
+# Compiled languages
+# -----------------------------
+
+class Language:
+    """
+    A language's rules compiled once: one KeywordMatcher plus the
+    definition regexes.
+    """
+
+    __slots__ = (
+        "rules", "name", "matcher", "function_re", "scope_re", "class_re",
+        "function_markers", "class_marker",
+    )
+
+    def __init__(self, rules: LanguageRules):
+        self.rules = rules
+        self.name = rules.name
+        self.matcher = KeywordMatcher(
+            logic_keywords=rules.logic_keywords,
+            signature_prefixes=rules.signature_prefixes,
+            return_prefixes=rules.return_prefixes,
+            comment_prefixes=rules.comment_prefixes,
+            ignored_lines=rules.ignored_lines,
+            word_boundaries=rules.word_boundaries,
+        )
+        self.function_re: Pattern = re.compile(rules.function_def)
+        self.scope_re: Pattern = re.compile(rules.scope_def or rules.function_def)
+        self.class_re: Optional[Pattern] = (
+            re.compile(rules.class_def) if rules.class_def else None
+        )
+        self.function_markers = tuple(rules.function_markers)
+        self.class_marker = rules.class_marker
+
+    def has_function(self, lines: Iterable[str]) -> bool:
+        """
+        Whether any line may define a function (marker check only).
+        """
+        markers = self.function_markers
+        if len(markers) == 1:
+            marker = markers[0]
+            return any(marker in line for line in lines)
+        return any(marker in line for line in lines for marker in markers)
+
+    def function_name(self, line: str) -> Optional[str]:
+        for marker in self.function_markers:
+            if marker in line:
+                return _name(self.function_re.search(line))
+        return None
+
+    def scope_name(self, stripped: str) -> Optional[str]:
+        for marker in self.function_markers:
+            if marker in stripped:
+                return _name(self.scope_re.match(stripped))
+        return None
+
+    def class_name(self, line: str) -> Optional[str]:
+        if self.class_re is None or self.class_marker not in line:
+            return None
+        return _name(self.class_re.search(line))
+
+
+def _name(match) -> Optional[str]:
+    # Alternatives each capture the name in their own group
+    return match.group(match.lastindex) if match and match.lastindex else None
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+
+class LanguageRegistry:
+    """
+    Compiled languages keyed by file extension. Files whose extension no
+    language claims are only counted by DiffSemanticAnalyzer.
+
+    Third parties add languages (or replace a built-in one by reusing its
+    name or extensions) with `register()`. Register at startup: cached
+    results and worker processes started earlier don't see the change.
+    """
+
+    def __init__(self, rules: Iterable[LanguageRules] = BUILTIN_LANGUAGES):
+        self._by_name: Dict[str, Language] = {}
+        self._by_extension: Dict[str, Language] = {}
+        self._lock = threading.Lock()
+        for language_rules in rules:
+            self.register(language_rules)
+
+    def register(self, rules: LanguageRules) -> Language:
+        for extension in rules.extensions:
+            if not extension.startswith(".") or extension.count(".") != 1:
+                raise ValueError(f"Invalid extension for {rules.name}: {extension!r}")
+
+        language = Language(rules)
+        with self._lock:
+            previous = self._by_name.get(rules.name)
+            by_extension = {
+                extension: known for extension, known in self._by_extension.items()
+                if known is not previous
+            }
+            for extension in rules.extensions:
+                by_extension[extension.lower()] = language
+            self._by_name[rules.name] = language
+            # Swapped whole so lookups never need the lock
+            self._by_extension = by_extension
+        return language
+
+    def get(self, name: str) -> Optional[Language]:
+        return self._by_name.get(name)
+
+    def for_path(self, filename: str) -> Optional[Language]:
+        extension = os.path.splitext(filename)[1]
+        if not extension:
+            return None
+        return self._by_extension.get(extension.lower())
+
+    def names(self) -> List[str]:
+        return list(self._by_name)
+
+
+# Shared by every analyzer that isn't given its own registry
+languages = LanguageRegistry()
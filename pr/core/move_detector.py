@@ -0,0 +1,268 @@
+import os
+import re
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.diff_parser import FileDiff, KIND_ADDED, KIND_REMOVED
+from core.languages import LanguageRegistry, languages
+
+
+@dataclass
+class FileMoves:
+    """
+    Lines of one file that were moved or only reformatted, as indexes
+    into each hunk's `added_lines` / `removed_lines`, keyed by hunk index.
+    """
+    filename: str
+    added: Dict[int, Set[int]] = field(default_factory=dict)
+    removed: Dict[int, Set[int]] = field(default_factory=dict)
+    # Every changed line is moved or whitespace-only
+    reformatted: bool = False
+
+    @property
+    def lines(self) -> int:
+        return sum(map(len, self.added.values())) + sum(map(len, self.removed.values()))
+
+
+# Maximal runs of added or of removed lines in `DiffHunk.line_kinds`
+_RUN = re.compile(b"\x01+|\x02+")
+
+# A string literal (an unterminated one runs to the end of the line) or a
+# run of whitespace
+_TOKEN = re.compile(r"""("(?:\\.|[^"\\])*"?|'(?:\\.|[^'\\])*'?|`[^`]*`?)|\s+""")
+
+# Indentation-sensitive formats without language rules
+INDENTED_EXTENSIONS = frozenset((".yaml", ".yml"))
+
+# (kind, hunk index, first line, end line) of lines to mark
+_Span = Tuple[int, int, int, int]
+
+
+class _Run:
+    """
+    Consecutive added (or removed) lines of one hunk that hold at least
+    one window, with the key of each window.
+    """
+
+    __slots__ = ("hunk", "kind", "start", "end", "offsets", "keys")
+
+    def __init__(self, hunk: int, kind: int, start: int, normalized: List[str], keys: List):
+        self.hunk = hunk
+        self.kind = kind
+        # Indexes into the hunk's added / removed lines, end exclusive
+        self.start = start
+        self.end = start + len(normalized)
+        # Index of every non-blank line; None when none is blank
+        self.offsets: Optional[List[int]] = None
+        if "" in normalized:
+            self.offsets = [start + i for i, line in enumerate(normalized) if line]
+        self.keys = keys
+
+    def offset(self, j: int) -> int:
+        return self.start + j if self.offsets is None else self.offsets[j]
+
+
+class MoveDetector:
+    """
+    Finds changed lines that carry no change: code moved within or
+    between files, and whitespace-only reformatting.
+
+    Each changed line is normalised once (trimmed, runs of whitespace
+    outside string literals collapsed to one space; leading indentation
+    kept for Python, YAML and other indentation-sensitive files) and
+    every window of lines is hashed once, so a whole PR costs O(lines):
+
+    - a removed block directly replaced by added lines with the same
+      normalised text is reformatting (re-indent, re-wrap);
+    - a window of `min_block_lines` non-blank normalised lines removed
+      somewhere in the PR and added somewhere else (or vice versa) is
+      moved code. Windows shorter than `min_block_chars` are ignored so
+      runs of braces or `else:` don't match.
+
+    A file whose normalised removed and added text are identical is
+    reformatted as a whole.
+    """
+
+    def __init__(
+        self,
+        min_block_lines: int = 3,
+        min_block_chars: int = 24,
+        registry: Optional[LanguageRegistry] = None,
+    ):
+        self.min_block_lines = max(1, min_block_lines)
+        self.min_block_chars = min_block_chars
+        self.languages = registry or languages
+
+    def detect(self, parsed_diff: Dict[str, FileDiff]) -> Dict[str, FileMoves]:
+        moves: Dict[str, FileMoves] = {}
+        runs: List[Tuple[str, _Run]] = []
+        windows = {KIND_ADDED: set(), KIND_REMOVED: set()}
+
+        for filename, file_diff in parsed_diff.items():
+            if file_diff.skip_reason is not None or not file_diff.hunks:
+                continue
+
+            file_runs, replaced, reformatted = self._scan_file(file_diff)
+            if reformatted:
+                moves[filename] = self._whole_file(filename, file_diff)
+                continue
+
+            for kind, hunk, first, last in replaced:
+                self._mark(moves, filename, kind, hunk, first, last)
+            for run in file_runs:
+                windows[run.kind].update(run.keys)
+                runs.append((filename, run))
+
+        for kind_windows in windows.values():
+            kind_windows.discard(None)
+
+        size = self.min_block_lines
+        for filename, run in runs:
+            other = windows[KIND_ADDED if run.kind == KIND_REMOVED else KIND_REMOVED]
+            last_window = len(run.keys) - 1
+            marked_until = run.start
+            for j in [j for j, key in enumerate(run.keys) if key in other]:
+                # Blank lines at either end of the run go with the block
+                first = run.start if j == 0 else run.offset(j)
+                last = run.end if j == last_window else run.offset(j + size - 1) + 1
+                first = max(first, marked_until)
+                if first < last:
+                    self._mark(moves, filename, run.kind, run.hunk, first, last)
+                    marked_until = last
+
+        for filename, file_moves in moves.items():
+            file_diff = parsed_diff[filename]
+            if file_moves.lines == file_diff.additions + file_diff.deletions:
+                file_moves.reformatted = True
+
+        return moves
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _scan_file(self, file_diff: FileDiff) -> Tuple[List[_Run], List[_Span], bool]:
+        """
+        Runs holding windows, spans of replaced blocks whose text only
+        differs in whitespace, and whether that holds for the whole file.
+        """
+        size = self.min_block_lines
+        runs: List[_Run] = []
+        replaced: List[_Span] = []
+        text = {KIND_ADDED: [], KIND_REMOVED: []}
+        keep_indent = self._indentation_matters(file_diff.filename)
+
+        for h, hunk in enumerate(file_diff.hunks):
+            kinds = bytes(hunk.line_kinds)
+            if KIND_ADDED not in kinds and KIND_REMOVED not in kinds:
+                continue
+
+            normalized = {
+                KIND_ADDED: [normalize_line(line, keep_indent) for line in hunk.added_lines],
+                KIND_REMOVED: [normalize_line(line, keep_indent) for line in hunk.removed_lines],
+            }
+            position = {KIND_ADDED: 0, KIND_REMOVED: 0}
+            previous = None
+
+            for match in _RUN.finditer(kinds):
+                kind = kinds[match.start()]
+                start = position[kind]
+                end = position[kind] = start + match.end() - match.start()
+                lines = normalized[kind][start:end]
+                # Blank lines are dropped, line breaks read as one space
+                joined = " ".join(filter(None, lines))
+                if joined:
+                    text[kind].append(joined)
+
+                # git prints a replaced block as its removed lines followed
+                # directly by the added ones
+                if (
+                    kind == KIND_ADDED
+                    and previous is not None
+                    and previous[0] == match.start()
+                    and previous[3] == joined
+                ):
+                    replaced.append((KIND_REMOVED, h, previous[1], previous[2]))
+                    replaced.append((KIND_ADDED, h, start, end))
+                previous = (match.end(), start, end, joined) if kind == KIND_REMOVED else None
+
+                if len(lines) >= size:
+                    keys = self._window_keys([line for line in lines if line])
+                    if keys:
+                        runs.append(_Run(h, kind, start, lines, keys))
+
+        reformatted = " ".join(text[KIND_REMOVED]) == " ".join(text[KIND_ADDED])
+        return runs, replaced, reformatted
+
+    def _indentation_matters(self, filename: str) -> bool:
+        language = self.languages.for_path(filename)
+        if language is not None:
+            return language.rules.significant_indentation
+        return os.path.splitext(filename)[1].lower() in INDENTED_EXTENSIONS
+
+    def _window_keys(self, text: List[str]) -> List[Optional[int]]:
+        """
+        Hash of every window of `min_block_lines` lines; None for windows
+        with too little text to be distinctive.
+        """
+        size = self.min_block_lines
+        count = len(text) - size + 1
+        if count <= 0:
+            return []
+
+        # str hashes are cached, so each line is hashed only once
+        keys = list(map(hash, zip(*(text[i:i + count] for i in range(size)))))
+
+        # Spaces kept by normalize_line don't count towards the minimum
+        bounds = list(accumulate((len(line) - line.count(" ") for line in text), initial=0))
+        minimum = self.min_block_chars
+        for j in range(count):
+            if bounds[j + size] - bounds[j] < minimum:
+                keys[j] = None
+        return keys
+
+    def _mark(
+        self,
+        moves: Dict[str, FileMoves],
+        filename: str,
+        kind: int,
+        hunk: int,
+        first: int,
+        last: int,
+    ):
+        file_moves = moves.get(filename)
+        if file_moves is None:
+            file_moves = moves[filename] = FileMoves(filename=filename)
+        marks = file_moves.added if kind == KIND_ADDED else file_moves.removed
+        marks.setdefault(hunk, set()).update(range(first, last))
+
+    def _whole_file(self, filename: str, file_diff: FileDiff) -> FileMoves:
+        file_moves = FileMoves(filename=filename, reformatted=True)
+        for h, hunk in enumerate(file_diff.hunks):
+            added = hunk.line_kinds.count(KIND_ADDED)
+            if added:
+                file_moves.added[h] = set(range(added))
+            removed = hunk.line_kinds.count(KIND_REMOVED)
+            if removed:
+                file_moves.removed[h] = set(range(removed))
+        return file_moves
+
+
+def normalize_line(line: str, keep_indent: bool = False) -> str:
+    """
+    `line` with whitespace that can't change meaning normalised: trimmed,
+    and each run outside string literals collapsed to one space. With
+    `keep_indent` the leading whitespace is kept as is.
+    """
+    text = line.strip()
+    if not text:
+        return ""
+    indent = line[:line.index(text[0])] if keep_indent else ""
+    if '"' not in text and "'" not in text and "`" not in text:
+        return indent + " ".join(text.split())
+    return indent + _TOKEN.sub(_collapse, text)
+
+
+def _collapse(match) -> str:
+    return match.group(1) or " "
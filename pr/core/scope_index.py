@@ -0,0 +1,187 @@
+from bisect import bisect_right
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from core.diff_parser import KIND_ADDED, KIND_REMOVED
+
+
+# -----------------------------
+# Positions
+# -----------------------------
+# Positions are new-file line numbers in half-line units: line L is 2L
+# and the gap just before it (where removed lines sit) is 2L - 1.
+
+NO_END = float("inf")
+
+
+def line_key(line: int) -> int:
+    return 2 * line
+
+
+def gap_key(line: int) -> int:
+    return 2 * line - 1
+
+
+def first_line(hunk) -> int:
+    """
+    New-file line number of the hunk's first line. A hunk that only
+    removes lines names the line *before* the removal.
+    """
+    return hunk.new_start + 1 if hunk.new_count == 0 else hunk.new_start
+
+
+def walk_hunk(hunk) -> Iterator[Tuple[int, int, str]]:
+    """
+    Yields (kind, position, line) for every hunk line in diff order.
+    """
+    added = iter(hunk.added_lines)
+    removed = iter(hunk.removed_lines)
+    context = iter(hunk.context_lines)
+    line_no = first_line(hunk)
+
+    for kind in hunk.line_kinds:
+        if kind == KIND_REMOVED:
+            yield kind, gap_key(line_no), next(removed)
+        elif kind == KIND_ADDED:
+            yield kind, line_key(line_no), next(added)
+            line_no += 1
+        else:
+            line = next(context)
+            yield kind, line_key(line_no), line
+            # "\ No newline at end of file" is not a file line
+            if not line.startswith("\\"):
+                line_no += 1
+
+
+# -----------------------------
+# Index
+# -----------------------------
+
+class ScopeIndex:
+    """
+    Sorted, non-overlapping intervals of innermost enclosing function
+    for one file. Lookups are a bisect over the interval starts.
+    """
+
+    __slots__ = ("starts", "ends", "names")
+
+    def __init__(self, intervals: Iterable[Tuple[int, float, str]] = ()):
+        self.starts: List[int] = []
+        self.ends: List[float] = []
+        self.names: List[str] = []
+
+        for start, end, name in intervals:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.names.append(name)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def lookup(self, position: int) -> Optional[str]:
+        i = bisect_right(self.starts, position) - 1
+        if i >= 0 and position <= self.ends[i]:
+            return self.names[i]
+        return None
+
+    def uniform(self, lo: int, hi: int) -> Tuple[bool, Optional[str]]:
+        """
+        (True, name) when every position in [lo, hi] resolves to the same
+        scope (or to none), otherwise (False, None).
+        """
+        i = bisect_right(self.starts, lo) - 1
+        if i != bisect_right(self.starts, hi) - 1:
+            return False, None
+        if i < 0 or self.ends[i] < lo:
+            return True, None
+        if self.ends[i] >= hi:
+            return True, self.names[i]
+        return False, None
+
+    # -----------------------------
+    # Builders
+    # -----------------------------
+
+    @classmethod
+    def from_markers(cls, markers: Iterable[Tuple[int, Optional[str]]]) -> "ScopeIndex":
+        """
+        Each (position, name) marker opens a scope that lasts until the
+        next marker; a None name closes the current one. Later markers at
+        the same position win.
+        """
+        ordered = sorted(markers, key=lambda marker: marker[0])
+        intervals = []
+
+        for i, (start, name) in enumerate(ordered):
+            end = ordered[i + 1][0] - 1 if i + 1 < len(ordered) else NO_END
+            if name and end >= start:
+                intervals.append((start, end, name))
+
+        return cls(intervals)
+
+    @classmethod
+    def from_source(
+        cls,
+        text: str,
+        scope_name: Callable[[str], Optional[str]],
+        comment_prefixes: Tuple[str, ...] = ("#",),
+    ) -> "ScopeIndex":
+        """
+        Exact scopes from the full new file, using indentation to find
+        where each function ends. `scope_name` returns the name of the
+        function a stripped line opens, if any.
+        """
+        scopes = []
+        open_scopes: List[Tuple[int, str, int]] = []  # (indent, name, start)
+        last_code_line = 0
+
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            stripped = line.lstrip()
+            if not stripped or stripped.startswith(comment_prefixes):
+                continue
+
+            indent = len(line) - len(stripped)
+            while open_scopes and indent <= open_scopes[-1][0]:
+                _, name, start = open_scopes.pop()
+                scopes.append((start, last_code_line, name))
+
+            name = scope_name(stripped)
+            if name:
+                open_scopes.append((indent, name, line_no))
+            last_code_line = line_no
+
+        while open_scopes:
+            _, name, start = open_scopes.pop()
+            scopes.append((start, last_code_line, name))
+
+        # A scope also owns the gap after its last line (trailing removals)
+        return cls(_flatten(
+            (line_key(start), line_key(end) + 1, name)
+            for start, end, name in scopes
+        ))
+
+
+def _flatten(intervals: Iterable[Tuple[int, int, str]]) -> List[Tuple[int, int, str]]:
+    """
+    Turns nested intervals into non-overlapping innermost segments.
+    """
+    segments: List[Tuple[int, int, str]] = []
+    stack: List[Tuple[int, str]] = []  # (end, name)
+    cursor = 0
+
+    def close_until(position):
+        nonlocal cursor
+        while stack and stack[-1][0] < position:
+            end, name = stack.pop()
+            if cursor <= end:
+                segments.append((cursor, end, name))
+                cursor = end + 1
+
+    for start, end, name in sorted(intervals, key=lambda i: (i[0], -i[1])):
+        close_until(start)
+        if stack and cursor < start:
+            segments.append((cursor, start - 1, stack[-1][1]))
+        stack.append((end, name))
+        cursor = start
+
+    close_until(NO_END)
+    return segments
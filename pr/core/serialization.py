@@ -0,0 +1,476 @@
+"""
+Compact binary encoding of parsed diffs and their semantics, for caches
+and for handing results between processes.
+
+Binary layout (little-endian), version 3:
+
+    header      MAGIC, version, flags, string/file/semantics counts and
+                the offsets of the two indexes and the string table
+    files       one record per FileDiff
+    semantics   one record per FileSemantics
+    indexes     (name string id, record offset) per file / per semantics
+    strings     offsets (count + 1) followed by one UTF-8 blob
+
+Every name, skip reason, rename source, language, hunk section and
+change type is a string table id (NO_STRING for None). A hunk stores its
+line kinds verbatim and its added / removed / context lines as three
+"\\n"-joined blobs, so loading is three `split()` calls rather than a
+line-by-line re-parse.
+"""
+
+import gc
+import mmap
+import struct
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.diff_parser import DiffHunk, FileDiff, KIND_ADDED, KIND_CONTEXT, KIND_REMOVED
+from core.diff_semantics import FileSemantics, FunctionChange
+
+
+MAGIC = b"PRDX"
+# 2: rename source / similarity per file, moved lines per semantics
+# 3: language per semantics
+FORMAT_VERSION = 3
+
+NO_STRING = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<4sHHIIIQQQ")
+_INDEX_ENTRY = struct.Struct("<IQ")
+_FILE = struct.Struct("<IIIIIIi")           # filename, skip reason, +, -, hunks, renamed from, similarity
+_HUNK = struct.Struct("<IIIIIIIII")         # starts/counts, section, kinds, 3 blob sizes
+_SEMANTICS = struct.Struct("<IIBIIIIIIII")  # filename, skip, flags, logic, +, -, moved, renamed from,
+                                            # language, classes, functions
+_FUNCTION = struct.Struct("<IIII")          # name, +, -, change types
+_U32 = struct.Struct("<I")
+
+_BEHAVIOR_CHANGED = 1
+_ONLY_FORMATTING = 2
+
+_ENCODING = "utf-8"
+_ERRORS = "surrogatepass"
+
+
+class SerializationError(ValueError):
+    pass
+
+
+# What decoding a damaged record raises
+_CORRUPT = (struct.error, IndexError, UnicodeDecodeError)
+
+
+# -----------------------------
+# Writing
+# -----------------------------
+
+class _StringTable:
+    __slots__ = ("ids", "blobs")
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.blobs: List[bytes] = []
+
+    def id(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.blobs)
+            self.blobs.append(value.encode(_ENCODING, _ERRORS))
+        return string_id
+
+    def encode(self) -> bytes:
+        offsets = []
+        offset = 0
+        for blob in self.blobs:
+            offsets.append(offset)
+            offset += len(blob)
+        offsets.append(offset)
+        return struct.pack(f"<{len(offsets)}Q", *offsets) + b"".join(self.blobs)
+
+
+def dumps(
+    parsed_diff: Optional[Dict[str, FileDiff]] = None,
+    semantics: Optional[Dict[str, FileSemantics]] = None,
+) -> bytes:
+    """
+    Encodes parsed files and/or their semantics. Accepts anything shaped
+    like `FileDiff` / `DiffHunk` / `FileSemantics`.
+    """
+    parsed_diff = parsed_diff or {}
+    semantics = semantics or {}
+
+    strings = _StringTable()
+    out: List[bytes] = [b""]  # header placeholder
+    offset = _HEADER.size
+
+    file_index = []
+    for file_diff in parsed_diff.values():
+        name_id = strings.id(file_diff.filename)
+        file_index.append(_INDEX_ENTRY.pack(name_id, offset))
+        record = _encode_file(file_diff, name_id, strings)
+        out.append(record)
+        offset += len(record)
+
+    semantics_index = []
+    for file_semantics in semantics.values():
+        name_id = strings.id(file_semantics.filename)
+        semantics_index.append(_INDEX_ENTRY.pack(name_id, offset))
+        record = _encode_semantics(file_semantics, name_id, strings)
+        out.append(record)
+        offset += len(record)
+
+    file_index_offset = offset
+    out.extend(file_index)
+    offset += _INDEX_ENTRY.size * len(file_index)
+
+    semantics_index_offset = offset
+    out.extend(semantics_index)
+    offset += _INDEX_ENTRY.size * len(semantics_index)
+
+    out.append(strings.encode())
+    out[0] = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0,
+        len(strings.blobs), len(file_index), len(semantics_index),
+        file_index_offset, semantics_index_offset, offset,
+    )
+    return b"".join(out)
+
+
+def dump(
+    path: str,
+    parsed_diff: Optional[Dict[str, FileDiff]] = None,
+    semantics: Optional[Dict[str, FileSemantics]] = None,
+):
+    with open(path, "wb") as f:
+        f.write(dumps(parsed_diff, semantics))
+
+
+def _encode_file(file_diff, name_id: int, strings: _StringTable) -> bytes:
+    parts = [_FILE.pack(
+        name_id,
+        strings.id(file_diff.skip_reason),
+        file_diff.additions,
+        file_diff.deletions,
+        len(file_diff.hunks),
+        strings.id(file_diff.renamed_from),
+        -1 if file_diff.similarity is None else file_diff.similarity,
+    )]
+
+    for hunk in file_diff.hunks:
+        kinds = bytes(hunk.line_kinds)
+        added = _join_lines(hunk.added_lines)
+        removed = _join_lines(hunk.removed_lines)
+        context = _join_lines(hunk.context_lines)
+        parts.append(_HUNK.pack(
+            hunk.old_start, hunk.old_count, hunk.new_start, hunk.new_count,
+            strings.id(hunk.section),
+            len(kinds), len(added), len(removed), len(context),
+        ))
+        parts.extend((kinds, added, removed, context))
+
+    return b"".join(parts)
+
+
+def _encode_semantics(file_semantics: FileSemantics, name_id: int, strings: _StringTable) -> bytes:
+    flags = 0
+    if file_semantics.behavior_changed:
+        flags |= _BEHAVIOR_CHANGED
+    if file_semantics.only_formatting:
+        flags |= _ONLY_FORMATTING
+
+    classes = sorted(file_semantics.classes_changed)
+    parts = [_SEMANTICS.pack(
+        name_id,
+        strings.id(file_semantics.skip_reason),
+        flags,
+        file_semantics.total_logic_changes,
+        file_semantics.additions,
+        file_semantics.deletions,
+        file_semantics.moved_lines,
+        strings.id(file_semantics.renamed_from),
+        strings.id(file_semantics.language),
+        len(classes),
+        len(file_semantics.functions_changed),
+    )]
+    parts.extend(_U32.pack(strings.id(name)) for name in classes)
+
+    for function in file_semantics.functions_changed.values():
+        change_types = sorted(function.change_types)
+        parts.append(_FUNCTION.pack(
+            strings.id(function.name),
+            function.added_lines,
+            function.removed_lines,
+            len(change_types),
+        ))
+        parts.extend(_U32.pack(strings.id(name)) for name in change_types)
+
+    return b"".join(parts)
+
+
+def _join_lines(lines) -> bytes:
+    # Parsed lines never contain "\n", so the blob splits back exactly
+    return "\n".join(lines).encode(_ENCODING, _ERRORS)
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+
+class AnalysisArchive:
+    """
+    Read access to one encoded analysis. Records are decoded on demand,
+    so over a memory-mapped file (`open_archive`) fetching a single file
+    touches only that file's bytes plus the string table.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        if len(self._view) < _HEADER.size:
+            raise SerializationError("Truncated analysis header")
+
+        (
+            magic, version, _flags,
+            string_count, file_count, semantics_count,
+            file_index_offset, semantics_index_offset, strings_offset,
+        ) = _HEADER.unpack_from(self._view, 0)
+
+        if magic != MAGIC:
+            raise SerializationError("Not a serialised analysis")
+        if version != FORMAT_VERSION:
+            raise SerializationError(f"Unsupported analysis format version {version}")
+
+        try:
+            self._strings = self._read_strings(strings_offset, string_count)
+            self._file_offsets = self._read_index(file_index_offset, file_count)
+            self._semantics_offsets = self._read_index(semantics_index_offset, semantics_count)
+        except _CORRUPT as exc:
+            raise SerializationError(f"Corrupt analysis: {exc}") from exc
+
+    # -----------------------------
+    # Public interface
+    # -----------------------------
+
+    @property
+    def filenames(self) -> List[str]:
+        return list(self._file_offsets)
+
+    def file(self, filename: str) -> Optional[FileDiff]:
+        offset = self._file_offsets.get(filename)
+        return None if offset is None else self._read_file(offset)
+
+    def semantics(self, filename: str) -> Optional[FileSemantics]:
+        offset = self._semantics_offsets.get(filename)
+        return None if offset is None else self._read_semantics(offset)
+
+    def iter_files(self) -> Iterator[FileDiff]:
+        for offset in self._file_offsets.values():
+            yield self._read_file(offset)
+
+    def parsed_diff(self) -> Dict[str, FileDiff]:
+        with _gc_paused():
+            return {name: self._read_file(offset) for name, offset in self._file_offsets.items()}
+
+    def all_semantics(self) -> Dict[str, FileSemantics]:
+        with _gc_paused():
+            return {
+                name: self._read_semantics(offset)
+                for name, offset in self._semantics_offsets.items()
+            }
+
+    def release(self):
+        self._view.release()
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _read_strings(self, offset: int, count: int) -> List[str]:
+        view = self._view
+        bounds = struct.unpack_from(f"<{count + 1}Q", view, offset)
+        blob = view[offset + 8 * (count + 1):]
+        return [
+            str(blob[bounds[i]:bounds[i + 1]], _ENCODING, _ERRORS)
+            for i in range(count)
+        ]
+
+    def _read_index(self, offset: int, count: int) -> Dict[str, int]:
+        strings = self._strings
+        entries = self._view[offset:offset + _INDEX_ENTRY.size * count]
+        return {strings[name_id]: record for name_id, record in _INDEX_ENTRY.iter_unpack(entries)}
+
+    def _string(self, string_id: int) -> Optional[str]:
+        return None if string_id == NO_STRING else self._strings[string_id]
+
+    def _read_file(self, offset: int) -> FileDiff:
+        try:
+            return self._decode_file(offset)
+        except _CORRUPT as exc:
+            raise SerializationError(f"Corrupt file record at {offset}: {exc}") from exc
+
+    def _read_semantics(self, offset: int) -> FileSemantics:
+        try:
+            return self._decode_semantics(offset)
+        except _CORRUPT as exc:
+            raise SerializationError(f"Corrupt semantics record at {offset}: {exc}") from exc
+
+    def _decode_file(self, offset: int) -> FileDiff:
+        view = self._view
+        (
+            name_id, skip_id, additions, deletions, hunk_count, renamed_id, similarity,
+        ) = _FILE.unpack_from(view, offset)
+        offset += _FILE.size
+
+        hunks = []
+        for _ in range(hunk_count):
+            (
+                old_start, old_count, new_start, new_count, section_id,
+                kinds_size, added_size, removed_size, context_size,
+            ) = _HUNK.unpack_from(view, offset)
+            offset += _HUNK.size
+            if offset + kinds_size + added_size + removed_size + context_size > len(view):
+                raise SerializationError(f"Truncated hunk at {offset}")
+
+            line_kinds = bytearray(view[offset:offset + kinds_size])
+            offset += kinds_size
+            added_lines = _split_lines(view[offset:offset + added_size], added_size)
+            offset += added_size
+            removed_lines = _split_lines(view[offset:offset + removed_size], removed_size)
+            offset += removed_size
+            context_lines = _split_lines(view[offset:offset + context_size], context_size)
+            offset += context_size
+
+            # An empty blob is either no lines or one empty line
+            if not added_size and KIND_ADDED in line_kinds:
+                added_lines = [""] * line_kinds.count(KIND_ADDED)
+            if not removed_size and KIND_REMOVED in line_kinds:
+                removed_lines = [""] * line_kinds.count(KIND_REMOVED)
+            if not context_size and KIND_CONTEXT in line_kinds:
+                context_lines = [""] * line_kinds.count(KIND_CONTEXT)
+
+            hunks.append(DiffHunk(
+                old_start=old_start,
+                old_count=old_count,
+                new_start=new_start,
+                new_count=new_count,
+                added_lines=added_lines,
+                removed_lines=removed_lines,
+                context_lines=context_lines,
+                section=self._strings[section_id],
+                line_kinds=line_kinds,
+            ))
+
+        return FileDiff(
+            filename=self._strings[name_id],
+            hunks=hunks,
+            additions=additions,
+            deletions=deletions,
+            skip_reason=self._string(skip_id),
+            renamed_from=self._string(renamed_id),
+            similarity=None if similarity < 0 else similarity,
+        )
+
+    def _decode_semantics(self, offset: int) -> FileSemantics:
+        view = self._view
+        strings = self._strings
+        (
+            name_id, skip_id, flags, logic, additions, deletions, moved, renamed_id,
+            language_id, class_count, function_count,
+        ) = _SEMANTICS.unpack_from(view, offset)
+        offset += _SEMANTICS.size
+
+        class_ids = struct.unpack_from(f"<{class_count}I", view, offset)
+        offset += 4 * class_count
+
+        functions: Dict[str, FunctionChange] = {}
+        for _ in range(function_count):
+            function_id, added, removed, type_count = _FUNCTION.unpack_from(view, offset)
+            offset += _FUNCTION.size
+            type_ids = struct.unpack_from(f"<{type_count}I", view, offset)
+            offset += 4 * type_count
+
+            name = strings[function_id]
+            functions[name] = FunctionChange(
+                name=name,
+                added_lines=added,
+                removed_lines=removed,
+                change_types={strings[i] for i in type_ids},
+            )
+
+        return FileSemantics(
+            filename=strings[name_id],
+            functions_changed=functions,
+            classes_changed={strings[i] for i in class_ids},
+            behavior_changed=bool(flags & _BEHAVIOR_CHANGED),
+            only_formatting=bool(flags & _ONLY_FORMATTING),
+            total_logic_changes=logic,
+            additions=additions,
+            deletions=deletions,
+            skip_reason=self._string(skip_id),
+            renamed_from=self._string(renamed_id),
+            moved_lines=moved,
+            language=self._string(language_id),
+        )
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Bulk decoding allocates only acyclic containers; without this the
+    allocation burst triggers collections that cost as much as decoding.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _split_lines(blob: memoryview, size: int) -> List[str]:
+    if not size:
+        return []
+    return str(blob, _ENCODING, _ERRORS).split("\n")
+
+
+def loads(data) -> Tuple[Dict[str, FileDiff], Dict[str, FileSemantics]]:
+    """
+    Decodes everything written by `dumps()`.
+    """
+    archive = AnalysisArchive(data)
+    return archive.parsed_diff(), archive.all_semantics()
+
+
+class _MappedArchive(AnalysisArchive):
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            super().__init__(self._mmap)
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def release(self):
+        super().release()
+        self._mmap.close()
+
+    def __enter__(self) -> "AnalysisArchive":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def open_archive(path: str) -> AnalysisArchive:
+    """
+    Memory-maps a file written by `dump()`; use as a context manager or
+    call `release()` when done.
+    """
+    return _MappedArchive(path)
+
+
+def load(path: str) -> Tuple[Dict[str, FileDiff], Dict[str, FileSemantics]]:
+    with open_archive(path) as archive:
+        return archive.parsed_diff(), archive.all_semantics()
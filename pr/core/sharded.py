@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.deadline import Deadline
+from core.diff_parser import GitDiffParser, FileDiff
+from core.diff_semantics import DiffSemanticAnalyzer, FileSemantics
+from core.diff_stats import DiffStats
+from core.file_filter import FileFilter
+
+
+FILE_BOUNDARY = "\ndiff --git "
+PLAIN_FILE_HEADER = "\n+++ b/"
+
+
+def split_file_shards(diff_text: str, shard_count: int) -> List[str]:
+    """
+    Cuts the diff into roughly equal pieces, only ever at the start of a
+    file section, so every shard parses independently.
+    """
+    length = len(diff_text)
+    if shard_count <= 1 or length == 0:
+        return [diff_text]
+
+    shards = []
+    start = 0
+    for i in range(1, shard_count):
+        target = max(start, length * i // shard_count)
+        cut = _next_boundary(diff_text, target)
+        if cut == -1:
+            break
+        if cut > start:
+            shards.append(diff_text[start:cut])
+            start = cut
+
+    shards.append(diff_text[start:])
+    return shards
+
+
+def _next_boundary(diff_text: str, pos: int) -> int:
+    found = diff_text.find(FILE_BOUNDARY, pos)
+    if found != -1:
+        return found + 1
+
+    # No git headers: cut before the "--- a/" line preceding "+++ b/"
+    found = diff_text.find(PLAIN_FILE_HEADER, pos)
+    if found == -1:
+        return -1
+    return diff_text.rfind("\n", 0, found) + 1
+
+
+def _parse_and_analyze(
+    shard: str,
+    file_filter: Optional[FileFilter] = None,
+    deadline: Optional[Deadline] = None,
+) -> Tuple[Dict[str, FileDiff], Dict[str, FileSemantics], DiffStats]:
+    # Also the worker entry point; results are pickled back as they are
+    parser = GitDiffParser(shard, file_filter, deadline)
+    parsed = parser.parse()
+    semantics = DiffSemanticAnalyzer(parsed, deadline=deadline).analyze()
+    return parsed, semantics, parser.stats.build()
+
+
+class ShardedDiffAnalyzer:
+    """
+    Parses and analyses very large diffs in parallel worker processes,
+    one shard of whole files per task, and merges the results back in
+    original file order. A deadline is shared with the workers (it is
+    based on the host-wide monotonic clock).
+
+    Small diffs lose to the cost of shipping results back, so
+    `should_parallelize` only says yes above `min_bytes` / `min_files`.
+    `map` runs any per-shard function (see IncrementalAnalyzer) on the
+    same pool.
+    """
+
+    def __init__(
+        self,
+        workers: int = 0,
+        min_bytes: int = 8 * 1024 * 1024,
+        min_files: int = 64,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_bytes = min_bytes
+        self.min_files = min_files
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def should_parallelize(self, diff_text: str) -> bool:
+        if self.workers < 2 or len(diff_text) < self.min_bytes:
+            return False
+        # Worker processes never fan out again
+        if multiprocessing.parent_process() is not None:
+            return False
+        return diff_text.count(FILE_BOUNDARY) + 1 >= self.min_files
+
+    def run(
+        self,
+        diff_text: str,
+        file_filter: Optional[FileFilter] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[Dict[str, FileDiff], Dict[str, FileSemantics], DiffStats]:
+        if not self.should_parallelize(diff_text):
+            return _parse_and_analyze(diff_text, file_filter, deadline)
+
+        parsed: Dict[str, FileDiff] = {}
+        semantics: Dict[str, FileSemantics] = {}
+        stats: List[DiffStats] = []
+
+        for shard_parsed, shard_semantics, shard_stats in self.map(
+            _parse_and_analyze, diff_text, file_filter, deadline
+        ):
+            parsed.update(shard_parsed)
+            semantics.update(shard_semantics)
+            stats.append(shard_stats)
+
+        return parsed, semantics, DiffStats.concat(stats)
+
+    def map(self, fn: Callable, diff_text: str, *args) -> Iterator:
+        """
+        Yields `fn(shard, *args)` for every shard of `diff_text`, computed
+        in the worker processes. `fn` must be a module-level function.
+        """
+        # A few shards per worker evens out uneven file sizes
+        shards = split_file_shards(diff_text, self.workers * 4)
+        # map() yields in submission order, so merges are deterministic
+        return self._get_pool().map(fn, shards, *([arg] * len(shards) for arg in args))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
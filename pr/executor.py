@@ -0,0 +1,303 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, Optional, Tuple
+
+from cache.incremental import (
+    AnalysisHandle,
+    IncrementalAnalyzer,
+    PackedHandle,
+    pack_handle,
+    unpack_handle,
+)
+from core.deadline import Deadline
+from formatter.template_engine import CompiledTemplate
+from metrics import registry
+from pipeline import generate_pr_markdown
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class ExecutorTimeout(Exception):
+    pass
+
+
+class ExecutorCrashed(Exception):
+    pass
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def _run_from_text(
+    diff_text: str,
+    issue_text: str,
+    template: CompiledTemplate,
+    deadline: Optional[Deadline] = None,
+    previous: Optional[PackedHandle] = None,
+) -> Dict:
+    # The parent owns the handles: it sends the previous one packed and
+    # gets back only the semantics this run recomputed
+    incremental = IncrementalAnalyzer(max_handles=2)
+    if previous is not None:
+        previous_id = previous[0]
+        incremental.adopt(unpack_handle(previous))
+    else:
+        previous_id = None
+
+    # Stage timings travel back with the result; the parent records them
+    with registry.collect() as request:
+        result = generate_pr_markdown(
+            diff_text,
+            issue_text,
+            template=template,
+            incremental=incremental,
+            previous_analysis=previous_id,
+            deadline=deadline,
+        )
+
+    handle = incremental.get_handle(result.analysis_id)
+    return {
+        "title": result.title,
+        "summary": result.summary,
+        "analysis_id": result.analysis_id,
+        "recomputed_files": result.recomputed,
+        "partial": result.partial,
+        "handle": pack_handle(handle, result.recomputed) if handle is not None else None,
+        "metrics": request.to_dict() if request is not None else None,
+    }
+
+
+def _run_from_shared_memory(
+    name: str,
+    size: int,
+    issue_text: str,
+    template: CompiledTemplate,
+    deadline: Optional[Deadline] = None,
+    previous: Optional[PackedHandle] = None,
+) -> Dict:
+    shm = shared_memory.SharedMemory(name=name)
+    # The parent owns (and unlinks) the segment; don't track it here too
+    resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        diff_text = str(shm.buf[:size], "utf-8", "surrogatepass")
+    finally:
+        shm.close()
+    return _run_from_text(diff_text, issue_text, template, deadline, previous)
+
+
+# -----------------------------
+# Executor
+# -----------------------------
+
+class PipelineExecutor:
+    """
+    Runs the CPU-bound pipeline either in the server's threadpool
+    ("inline") or in a warm pool of worker processes ("process").
+
+    In process mode, diffs above `shm_min_bytes` are handed over through
+    shared memory instead of being pickled, and diffs below
+    `inline_max_bytes` still run inline to avoid IPC overhead.
+
+    `timeout` only applies to runs in worker processes: a thread can't
+    be stopped, so inline runs are bounded by the request's Deadline
+    alone. A worker that times out keeps its `max_queue` slot until it
+    actually finishes.
+
+    Incremental handles stay in this process; workers get the previous
+    one and return the new one in the compact binary format (see
+    `pack_handle`), the latter holding only the recomputed semantics.
+
+    If a worker dies (e.g. OOM-killed) the pool is replaced: the runs it
+    had in flight fail with ExecutorCrashed, later ones use the new pool.
+    """
+
+    def __init__(
+        self,
+        mode: str = "inline",
+        workers: int = 0,
+        max_queue: int = 64,
+        timeout: float = 60.0,
+        inline_max_bytes: int = 256 * 1024,
+        shm_min_bytes: int = 1024 * 1024,
+    ):
+        if mode not in ("inline", "process"):
+            raise ValueError(f"Unknown execution mode: {mode}")
+
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.inline_max_bytes = inline_max_bytes
+        self.shm_min_bytes = shm_min_bytes
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "PipelineExecutor":
+        return cls(
+            mode=os.getenv("PR_EXEC_MODE", "inline"),
+            workers=int(os.getenv("PR_EXEC_WORKERS", 0)),
+            max_queue=int(os.getenv("PR_EXEC_MAX_QUEUE", 64)),
+            timeout=float(os.getenv("PR_EXEC_TIMEOUT", 60)),
+            inline_max_bytes=int(os.getenv("PR_EXEC_INLINE_MAX_BYTES", 256 * 1024)),
+            shm_min_bytes=int(os.getenv("PR_EXEC_SHM_MIN_BYTES", 1024 * 1024)),
+        )
+
+    def start(self):
+        if self.mode != "process" or self._pool is not None:
+            return
+
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Spawn every worker up front so the first requests don't pay for it
+        for future in [self._pool.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(
+        self,
+        git_diff: str,
+        issue_text: str,
+        template: CompiledTemplate,
+        inline: Callable[[], Dict],
+        deadline: Optional[Deadline] = None,
+        previous: Optional[AnalysisHandle] = None,
+        prefer_inline: bool = False,
+    ) -> Dict:
+        """
+        Returns the pipeline result dict. `inline` is called in the
+        threadpool when the diff is small, process mode is off or
+        `prefer_inline` is set (diffs that fan out over their own pool).
+        `deadline` goes to the worker as is, so time spent queued
+        counts against it. Worker results carry the new incremental
+        handle under "handle", built on top of `previous`.
+        """
+        loop = asyncio.get_running_loop()
+
+        if self._pool is None or prefer_inline or len(git_diff) < self.inline_max_bytes:
+            return await loop.run_in_executor(None, inline)
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise ExecutorBusy("Too many pending PR generations")
+            self._pending += 1
+
+        try:
+            # Encoding and copying 100 MB+ diffs would stall the event loop
+            pool, future = await loop.run_in_executor(
+                None, self._submit, git_diff, issue_text, template, deadline, previous
+            )
+        except BaseException:
+            self._release()
+            raise
+
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise ExecutorTimeout(
+                f"PR generation exceeded {self.timeout:.0f}s"
+            ) from None
+        except BrokenProcessPool as exc:
+            self._replace_pool(pool)
+            raise ExecutorCrashed("PR generation worker died") from exc
+
+        packed = result.get("handle")
+        if packed is not None:
+            result["handle"] = await loop.run_in_executor(None, unpack_handle, packed, previous)
+        return result
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _submit(
+        self,
+        git_diff: str,
+        issue_text: str,
+        template: CompiledTemplate,
+        deadline: Optional[Deadline],
+        previous: Optional[AnalysisHandle],
+    ) -> Tuple[ProcessPoolExecutor, Future]:
+        """
+        Hands the diff to a worker. The queue slot (and shared memory)
+        is released when the worker finishes, not when the caller stops
+        waiting.
+        """
+        packed = pack_handle(previous) if previous is not None else None
+
+        if len(git_diff) < self.shm_min_bytes:
+            pool, future = self._pool_submit(
+                _run_from_text, git_diff, issue_text, template, deadline, packed
+            )
+            future.add_done_callback(lambda _: self._release())
+            return pool, future
+
+        encoded = git_diff.encode("utf-8", "surrogatepass")
+        shm = shared_memory.SharedMemory(create=True, size=max(len(encoded), 1))
+        try:
+            shm.buf[:len(encoded)] = encoded
+            pool, future = self._pool_submit(
+                _run_from_shared_memory,
+                shm.name, len(encoded), issue_text, template, deadline, packed,
+            )
+        except BaseException:
+            _unlink(shm)
+            raise
+
+        def finished(_):
+            _unlink(shm)
+            self._release()
+
+        future.add_done_callback(finished)
+        return pool, future
+
+    def _pool_submit(self, fn, *args) -> Tuple[ProcessPoolExecutor, Future]:
+        """
+        `pool.submit`, replacing a pool that broke since the last run
+        (this run didn't cause that, so it is retried once). Returns the
+        pool too, so a crash replaces that pool and not a newer one.
+        """
+        pool = self._pool
+        try:
+            return pool, pool.submit(fn, *args)
+        except BrokenProcessPool:
+            pool = self._replace_pool(pool)
+            return pool, pool.submit(fn, *args)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is broken and broken is not None:
+                broken.shutdown(wait=False, cancel_futures=True)
+                # Workers start on demand; only start() warms them up
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                registry.counter(
+                    "pr_executor_pool_restarts_total", "Worker pools replaced after a crash."
+                ).inc()
+            return self._pool
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+
+def _unlink(shm: shared_memory.SharedMemory):
+    shm.close()
+    shm.unlink()
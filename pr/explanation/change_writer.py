@@ -1,45 +1,96 @@
-from typing import Dict
+from typing import Dict, List, Optional
+from core.deadline import DEADLINE_REASON, Deadline
 from core.diff_semantics import FileSemantics
 
 
 class ChangeWriter:
     """
     Writes the 'What Changed' section.
+
+    Once `deadline` is overrun, the remaining analysed files are listed
+    with their line counts only.
     """
 
-    def __init__(self, semantics: Dict[str, FileSemantics]):
+    def __init__(self, semantics: Dict[str, FileSemantics], deadline: Optional[Deadline] = None):
         self.semantics = semantics
+        self.deadline = deadline
 
     def write(self) -> str:
         lines = []
+        skipped = []
+        overrun = False
 
         for filename, file_sem in self.semantics.items():
-            lines.append(f"### `{filename}`")
+            if file_sem.skip_reason:
+                skipped.append((file_sem, file_sem.skip_reason))
+                continue
 
-            # 👇 NEW: Explicit formatting-only explanation
-            if file_sem.only_formatting:
-                lines.append(
-                    "- Formatting-only adjustments to improve readability "
-                    "and consistency; no logic changes."
-                )
-                lines.append("")
+            if not overrun and self.deadline is not None:
+                overrun = self.deadline.overrun()
+            if overrun:
+                skipped.append((file_sem, DEADLINE_REASON))
                 continue
 
-            if not file_sem.functions_changed:
+            lines.extend(self.write_file(filename, file_sem))
+            lines.append("")
+
+        if skipped:
+            lines.append("### Summarised without analysis")
+            for file_sem, reason in skipped:
+                lines.append(self.skipped_entry(file_sem, reason))
+            lines.append("")
+
+        return "\n".join(lines)
+
+    def write_file(self, filename: str, file_sem: FileSemantics) -> List[str]:
+        """
+        The entry for one analysed file.
+        """
+        lines = [f"### `{filename}`"]
+
+        if file_sem.renamed_from:
+            lines.append(f"- Renamed from `{file_sem.renamed_from}`")
+            if not (file_sem.additions or file_sem.deletions):
+                return lines
+
+        # 👇 NEW: Explicit formatting-only explanation
+        if file_sem.only_formatting:
+            if file_sem.moved_lines:
+                lines.append("- Moved or reformatted code only; no logic changes.")
+            else:
                 lines.append(
-                    "- Internal cleanup and small structural improvements "
-                    "without functional changes."
+                    "- Formatting-only adjustments to improve readability "
+                    "and consistency; no logic changes."
                 )
-                lines.append("")
-                continue
-
+            return lines
+
+        if file_sem.language is None:
+            lines.append(
+                f"- Content updated (+{file_sem.additions}/-{file_sem.deletions} lines); "
+                "no analysis rules for this file type."
+            )
+        elif not file_sem.functions_changed:
+            lines.append(
+                "- Internal cleanup and small structural improvements "
+                "without functional changes."
+            )
+        else:
             for func_name, func_change in file_sem.functions_changed.items():
                 description = self._describe_function_change(func_change)
                 lines.append(f"- **{func_name}**: {description}")
 
-            lines.append("")
-
-        return "\n".join(lines)
+        if file_sem.moved_lines:
+            lines.append(
+                f"- {file_sem.moved_lines} moved or reformatted "
+                f"{'line' if file_sem.moved_lines == 1 else 'lines'} not counted as changes"
+            )
+        return lines
+
+    def skipped_entry(self, file_sem: FileSemantics, reason: Optional[str] = None) -> str:
+        entry = f"- `{file_sem.filename}` ({reason or file_sem.skip_reason})"
+        if file_sem.additions or file_sem.deletions:
+            entry += f": +{file_sem.additions}/-{file_sem.deletions} lines"
+        return entry
 
     def _describe_function_change(self, func_change) -> str:
         parts = []
@@ -18,8 +18,18 @@ class ImpactWriter:
     def write(self) -> str:
         lines = []
 
+        summary = self.impact.summary()
+        directories = self.impact.directories_touched()
+
         lines.append(f"- **Risk level:** {self.impact.risk_level()}")
         lines.append(f"- **Change scope:** {self.impact.scope()}")
+        lines.append(
+            f"- **Size:** {summary.files_changed} "
+            f"{'file' if summary.files_changed == 1 else 'files'}, "
+            f"+{summary.additions}/-{summary.deletions} lines"
+            + (f" across {directories} directories" if directories > 1 else "")
+            + (f" ({summary.moved_lines} moved or reformatted)" if summary.moved_lines else "")
+        )
 
         if self.classification.breaking:
             lines.append(
@@ -28,6 +38,17 @@ class ImpactWriter:
         else:
             lines.append("- **Breaking change:** No")
 
+        hotspots = self.impact.hotspots()
+        if len(hotspots) > 1:
+            lines.append("")
+            lines.append("**Hotspots:**")
+            for hotspot in hotspots:
+                entry = f"- `{hotspot.filename}`: +{hotspot.additions}/-{hotspot.deletions} lines"
+                # Files only counted past the time budget have no hunks kept
+                if hotspot.hunks:
+                    entry += f" in {hotspot.hunks} {'hunk' if hotspot.hunks == 1 else 'hunks'}"
+                lines.append(f"{entry} ({hotspot.share:.0%} of changes)")
+
         lines.append("")
         lines.append("**Review focus:**")
         lines.append(self._review_guidance())
@@ -1,4 +1,10 @@
-from typing import Dict
+from typing import Dict, Union
+
+from formatter.template_engine import CompiledTemplate, compile_template
+
+
+# Sections the pipeline fills in; templates may use any subset
+SECTIONS = ("context", "changes", "impact", "checklist")
 
 
 class MarkdownBuilder:
@@ -6,11 +12,11 @@ class MarkdownBuilder:
     Assembles the final PR markdown using templates.
     """
 
-    def __init__(self, template: str):
+    def __init__(self, template: Union[str, CompiledTemplate]):
+        if isinstance(template, str):
+            template = compile_template(template, known=SECTIONS)
         self.template = template
 
     def build(self, sections: Dict[str, str]) -> str:
-        output = self.template
-        for key, value in sections.items():
-            output = output.replace(f"{{{{{key}}}}}", value.strip())
-        return output.strip()
+        values = {key: value.strip() for key, value in sections.items()}
+        return self.template.render(values).strip()
@@ -0,0 +1,96 @@
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+PLACEHOLDER_RE = re.compile(r"\{\{([^{}]*)\}\}")
+NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class CompiledTemplate:
+    """
+    A template split once into literal text and placeholder names.
+    Rendering is a single join; no scanning of the template per call.
+    """
+
+    __slots__ = ("name", "text", "digest", "literals", "placeholders")
+
+    def __init__(
+        self,
+        name: str,
+        text: str,
+        literals: Tuple[str, ...],
+        placeholders: Tuple[str, ...],
+    ):
+        self.name = name
+        self.text = text
+        self.digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.literals = literals
+        self.placeholders = placeholders
+
+    def render(self, values: Dict[str, str]) -> str:
+        literals = self.literals
+        parts: List[str] = [literals[0]]
+
+        for index, placeholder in enumerate(self.placeholders, start=1):
+            try:
+                parts.append(values[placeholder])
+            except KeyError:
+                raise TemplateError(
+                    f"Template '{self.name}' needs a value for '{placeholder}'"
+                ) from None
+            parts.append(literals[index])
+
+        return "".join(parts)
+
+
+def compile_template(
+    text: str,
+    name: str = "<inline>",
+    known: Optional[Iterable[str]] = None,
+) -> CompiledTemplate:
+    """
+    Parses `{{name}}` placeholders. Malformed placeholders, stray braces
+    and (when `known` is given) unknown names raise `TemplateError`.
+    """
+    known_names = set(known) if known is not None else None
+
+    literals: List[str] = []
+    placeholders: List[str] = []
+    position = 0
+
+    for match in PLACEHOLDER_RE.finditer(text):
+        placeholder = match.group(1)
+        line = text.count("\n", 0, match.start()) + 1
+
+        if not NAME_RE.fullmatch(placeholder):
+            raise TemplateError(
+                f"Template '{name}' line {line}: invalid placeholder "
+                f"{match.group(0)!r}"
+            )
+        if known_names is not None and placeholder not in known_names:
+            raise TemplateError(
+                f"Template '{name}' line {line}: unknown placeholder "
+                f"'{placeholder}' (expected one of {sorted(known_names)})"
+            )
+
+        literals.append(text[position:match.start()])
+        placeholders.append(placeholder)
+        position = match.end()
+
+    literals.append(text[position:])
+
+    for literal in literals:
+        if "{{" in literal or "}}" in literal:
+            raise TemplateError(f"Template '{name}': unbalanced '{{{{' / '}}}}'")
+
+    return CompiledTemplate(
+        name=name,
+        text=text,
+        literals=tuple(literals),
+        placeholders=tuple(placeholders),
+    )
@@ -0,0 +1,126 @@
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from formatter.markdown_builder import SECTIONS
+from formatter.template_engine import CompiledTemplate, compile_template
+
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+
+REPO_RE = re.compile(r"[A-Za-z0-9_.-]+/[A-Za-z0-9_.-]+")
+
+
+@dataclass
+class _Entry:
+    template: CompiledTemplate
+    mtime_ns: int
+    size: int
+    checked_at: float
+
+
+class TemplateRegistry:
+    """
+    Named, precompiled templates loaded from `templates/<name>.md`.
+
+    A repository can override any template with
+    `templates/repos/<owner>/<repo>/<name>.md` or via `register()`.
+    Files are re-stat'ed at most every `check_interval` seconds and
+    recompiled when their mtime or size changes; a broken edit or a
+    deleted file keeps the last good version.
+    """
+
+    def __init__(
+        self,
+        root: str = TEMPLATES_DIR,
+        known: Optional[Iterable[str]] = SECTIONS,
+        check_interval: float = 1.0,
+    ):
+        self.root = root
+        self.known = tuple(known) if known is not None else None
+        self.check_interval = check_interval
+        self._files: Dict[str, _Entry] = {}
+        self._registered: Dict[Tuple[str, Optional[str]], CompiledTemplate] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, text: str, repo: Optional[str] = None) -> CompiledTemplate:
+        compiled = compile_template(text, name=name, known=self.known)
+        with self._lock:
+            self._registered[(name, repo)] = compiled
+        return compiled
+
+    def get(self, name: str = "base", repo: Optional[str] = None) -> CompiledTemplate:
+        if repo is not None:
+            compiled = self._registered.get((name, repo))
+            if compiled is not None:
+                return compiled
+
+            override = self._repo_path(name, repo)
+            if override is not None and os.path.exists(override):
+                return self._load(override, name)
+
+        compiled = self._registered.get((name, None))
+        if compiled is not None:
+            return compiled
+
+        return self._load(os.path.join(self.root, f"{name}.md"), name)
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _repo_path(self, name: str, repo: str) -> Optional[str]:
+        if not REPO_RE.fullmatch(repo) or ".." in repo:
+            return None
+        owner, repo_name = repo.split("/")
+        return os.path.join(self.root, "repos", owner, repo_name, f"{name}.md")
+
+    def _load(self, path: str, name: str) -> CompiledTemplate:
+        now = time.monotonic()
+        entry = self._files.get(path)
+
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            return entry.template
+
+        with self._lock:
+            entry = self._files.get(path)
+            try:
+                stat = os.stat(path)
+            except OSError as exc:
+                if entry is None:
+                    raise
+                logger.warning("Keeping previous version of template %s: %s", path, exc)
+                entry.checked_at = now
+                return entry.template
+
+            if entry is not None and (stat.st_mtime_ns, stat.st_size) == (
+                entry.mtime_ns, entry.size
+            ):
+                entry.checked_at = now
+                return entry.template
+
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+
+            try:
+                compiled = compile_template(text, name=name, known=self.known)
+            except ValueError:
+                if entry is None:
+                    raise
+                logger.exception("Keeping previous version of template %s", path)
+                entry.checked_at = now
+                return entry.template
+
+            self._files[path] = _Entry(
+                template=compiled,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                checked_at=now,
+            )
+            return compiled
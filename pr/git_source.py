@@ -0,0 +1,340 @@
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from core.diff_parser import iter_byte_lines
+from metrics import count
+
+
+# Extensions -> git's builtin diff drivers, so hunk headers name the
+# enclosing function. Used as core.attributesFile, which the repository's
+# own .gitattributes and info/attributes override.
+FUNCNAME_DRIVERS = (
+    ("*.py", "python"),
+    ("*.pyi", "python"),
+    ("*.go", "golang"),
+    ("*.rb", "ruby"),
+    ("*.rs", "rust"),
+    ("*.java", "java"),
+    ("*.kt", "kotlin"),
+    ("*.cs", "csharp"),
+    ("*.c", "cpp"),
+    ("*.h", "cpp"),
+    ("*.cc", "cpp"),
+    ("*.cpp", "cpp"),
+    ("*.hpp", "cpp"),
+    ("*.m", "objc"),
+    ("*.php", "php"),
+    ("*.pl", "perl"),
+    ("*.pm", "perl"),
+    ("*.sh", "bash"),
+    ("*.ex", "elixir"),
+    ("*.exs", "elixir"),
+    ("*.css", "css"),
+    ("*.html", "html"),
+    ("*.md", "markdown"),
+    ("*.tex", "tex"),
+)
+
+# Always produce what GitDiffParser expects, whatever the user's config
+DIFF_OPTIONS = (
+    "--no-color",
+    "--no-ext-diff",
+    "--no-textconv",
+    "--src-prefix=a/",
+    "--dst-prefix=b/",
+)
+
+READ_SIZE = 64 * 1024
+
+
+class GitError(RuntimeError):
+    def __init__(self, args: Sequence[str], returncode: int, stderr: str):
+        super().__init__(f"{' '.join(args[:4])} ... exited with {returncode}: {stderr.strip()}")
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class GitDiffSource:
+    """
+    `git diff base head` of a local repository as a stream of lines,
+    read from git's stdout in chunks and handed to the parser as they
+    arrive; the diff is never held in memory as a whole.
+
+    With `workers > 1` the changed paths are split across that many
+    `git diff` processes (rename pairs stay together so `-M` still sees
+    both sides). Their output is concatenated in path order; each
+    process may run at most `max_buffered` chunks ahead of the reader.
+
+    `base` and `head` may come from callers: they are checked with
+    `check_ref` and resolved to commit SHAs once, and only the SHAs
+    reach `git diff` / `git show`.
+    """
+
+    def __init__(
+        self,
+        repo: str,
+        base: str,
+        head: str,
+        paths: Sequence[str] = (),
+        workers: int = 1,
+        find_renames: bool = True,
+        max_buffered: int = 64,
+        git: str = "git",
+    ):
+        self.repo = repo
+        self.base = check_ref(base)
+        self.head = check_ref(head)
+        self.paths = tuple(paths)
+        self.workers = max(1, workers)
+        self.find_renames = find_renames
+        self.max_buffered = max_buffered
+        self.git = git
+        self.bytes_read = 0
+        self._revisions: Optional[Tuple[str, str]] = None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter_byte_lines(self.iter_chunks())
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        self.bytes_read = 0
+        # Resolved before any worker thread builds a command
+        self.revisions()
+
+        if self.workers == 1:
+            groups = [list(self.paths)]
+        else:
+            groups = _split_paths(self.changed_paths(), self.workers)
+
+        try:
+            if len(groups) == 1:
+                yield from self._stream(groups[0])
+            else:
+                yield from self._stream_parallel(groups)
+        finally:
+            count("diff_bytes", self.bytes_read)
+
+    def changed_paths(self) -> List[Tuple[str, ...]]:
+        """
+        Changed paths in diff order; a rename or copy is one entry
+        holding both its source and destination.
+        """
+        args = self._command("--name-status", "-z")
+        output = _run(args)
+
+        fields = output.split(b"\0")
+        entries = []
+        i = 0
+        while i < len(fields) - 1:
+            status = fields[i].decode("ascii", "replace")
+            if status[:1] in ("R", "C"):
+                entries.append((_path(fields[i + 1]), _path(fields[i + 2])))
+                i += 3
+            else:
+                entries.append((_path(fields[i + 1]),))
+                i += 2
+        return entries
+
+    def gitattributes(self) -> str:
+        """
+        `.gitattributes` at `head`, for the file filter ("" if none).
+        """
+        _, head = self.revisions()
+        try:
+            output = _run([self.git, "-C", self.repo, "show", f"{head}:.gitattributes"])
+        except GitError:
+            return ""
+        return output.decode("utf-8", "replace")
+
+    def revisions(self) -> Tuple[str, str]:
+        """
+        (base, head) as commit SHAs. Raises GitError for refs that don't
+        name a commit.
+        """
+        if self._revisions is None:
+            self._revisions = (self._rev_parse(self.base), self._rev_parse(self.head))
+        return self._revisions
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+
+    def _command(self, *extra: str, paths: Sequence[str] = ()) -> List[str]:
+        args = [
+            self.git, "-C", self.repo,
+            "-c", f"core.attributesFile={_funcname_attributes()}",
+            "-c", "core.quotePath=false",
+            "diff", *DIFF_OPTIONS,
+        ]
+        if self.find_renames:
+            args.append("-M")
+        args.extend(extra)
+        args.extend((*self.revisions(), "--"))
+        # Literal pathspecs: file names are not glob patterns
+        args.extend(f":(literal){path}" for path in (paths or self.paths))
+        return args
+
+    def _rev_parse(self, ref: str) -> str:
+        output = _run([
+            self.git, "-C", self.repo,
+            "rev-parse", "--verify", "--end-of-options", f"{ref}^{{commit}}",
+        ])
+        return output.decode("ascii").strip()
+
+    def _stream(self, paths: Sequence[str]) -> Iterator[bytes]:
+        args = self._command(paths=paths)
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr)
+            complete = False
+            try:
+                while True:
+                    chunk = process.stdout.read1(READ_SIZE)
+                    if not chunk:
+                        complete = True
+                        break
+                    self.bytes_read += len(chunk)
+                    yield chunk
+            finally:
+                _finish(process, args, stderr, complete)
+
+    def _stream_parallel(self, groups: List[List[str]]) -> Iterator[bytes]:
+        stop = threading.Event()
+        buffers = []
+        threads = []
+
+        for paths in groups:
+            buffer: queue.Queue = queue.Queue(self.max_buffered)
+            thread = threading.Thread(
+                target=self._fill, args=(paths, buffer, stop),
+                name="pr-git-diff", daemon=True,
+            )
+            thread.start()
+            buffers.append(buffer)
+            threads.append(thread)
+
+        try:
+            for buffer in buffers:
+                while True:
+                    item = buffer.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    self.bytes_read += len(item)
+                    yield item
+        finally:
+            stop.set()
+            for buffer in buffers:
+                # Unblock readers waiting on a full buffer
+                while not buffer.empty():
+                    buffer.get_nowait()
+            for thread in threads:
+                thread.join()
+
+    def _fill(self, paths: Sequence[str], buffer: queue.Queue, stop: threading.Event):
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        args = self._command(paths=paths)
+        try:
+            with tempfile.TemporaryFile() as stderr:
+                process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr)
+                complete = False
+                try:
+                    while True:
+                        chunk = process.stdout.read1(READ_SIZE)
+                        if not chunk:
+                            complete = True
+                            break
+                        if not put(chunk):
+                            break
+                finally:
+                    _finish(process, args, stderr, complete)
+        except Exception as exc:
+            put(exc)
+        else:
+            put(None)
+
+
+def check_ref(ref: str) -> str:
+    """
+    Rejects refs git could read as an option or that aren't one token.
+    """
+    if not isinstance(ref, str) or not ref or ref.startswith("-") or any(c in ref for c in "\0\r\n"):
+        raise ValueError(f"Invalid git ref: {ref!r}")
+    return ref
+
+
+def _split_paths(entries: List[Tuple[str, ...]], groups: int) -> List[List[str]]:
+    """
+    Contiguous runs of entries, so concatenated output keeps diff order.
+    """
+    if not entries:
+        # Nothing changed (or nothing to split): one plain diff
+        return [[]]
+
+    size = -(-len(entries) // groups)
+    return [
+        [path for entry in entries[start:start + size] for path in entry]
+        for start in range(0, len(entries), size)
+    ]
+
+
+def _finish(process: subprocess.Popen, args: Sequence[str], stderr, complete: bool):
+    """
+    Reaps git. Raises GitError if it failed after its output was read to
+    the end; a reader that stopped early just kills it.
+    """
+    if not complete:
+        process.kill()
+    process.stdout.close()
+    returncode = process.wait()
+
+    if returncode != 0 and complete:
+        stderr.seek(0)
+        raise GitError(args, returncode, stderr.read().decode("utf-8", "replace"))
+
+
+def _run(args: Sequence[str]) -> bytes:
+    result = subprocess.run(args, capture_output=True)
+    if result.returncode != 0:
+        raise GitError(args, result.returncode, result.stderr.decode("utf-8", "replace"))
+    return result.stdout
+
+
+def _path(raw: bytes) -> str:
+    return os.fsdecode(raw)
+
+
+_attributes_lock = threading.Lock()
+_attributes_path: Optional[str] = None
+
+
+def _funcname_attributes() -> str:
+    """
+    Path of the attributes file enabling FUNCNAME_DRIVERS, written once
+    per process into a private (0700) temp directory: git trusts this
+    file, so it must not be one another user could have planted.
+    """
+    global _attributes_path
+
+    with _attributes_lock:
+        if _attributes_path is None:
+            directory = tempfile.mkdtemp(prefix="pr-writer-")
+            atexit.register(shutil.rmtree, directory, ignore_errors=True)
+            path = os.path.join(directory, "funcname.gitattributes")
+            with open(path, "w", encoding="ascii") as f:
+                f.writelines(f"{pattern} diff={driver}\n" for pattern, driver in FUNCNAME_DRIVERS)
+            _attributes_path = path
+        return _attributes_path
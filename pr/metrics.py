@@ -0,0 +1,275 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Seconds; tuned for a pipeline that spans ~1 ms to tens of seconds
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+# -----------------------------
+# Metric types
+# -----------------------------
+
+class Counter:
+    __slots__ = ("name", "help", "_values", "_lock")
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_labels(key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    __slots__ = ("name", "help", "buckets", "_series", "_lock")
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            for key, (counts, total) in self._series.items():
+                cumulative = 0
+                for bound, hits in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += hits
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    lines.append(
+                        f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}"
+                    )
+                lines.append(f"{self.name}_sum{_labels(key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(key)} {cumulative}")
+
+        return lines
+
+
+# -----------------------------
+# Per-request collection
+# -----------------------------
+
+class RequestMetrics:
+    """
+    Stage timings and counts gathered while serving one request. Plain
+    data, so worker processes can ship it back with their result.
+    """
+
+    __slots__ = ("stages", "counts")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, float] = {}
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: float = 1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def merge(self, data: Optional[Dict]):
+        if not data:
+            return
+        for name, seconds in data.get("stages", {}).items():
+            self.add_stage(name, seconds)
+        for name, value in data.get("counts", {}).items():
+            self.count(name, value)
+
+    def to_dict(self) -> Dict:
+        return {"stages": dict(self.stages), "counts": dict(self.counts)}
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()
+        )
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "pr_request_metrics", default=None
+)
+
+
+class _Stage:
+    __slots__ = ("request", "name", "started")
+
+    def __init__(self, request: RequestMetrics, name: str):
+        self.request = request
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.request.add_stage(self.name, time.perf_counter() - self.started)
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NOOP_STAGE = _NoopStage()
+
+
+def stage(name: str):
+    """
+    Times a block into the request being collected. Outside a request
+    (or with metrics disabled) this is a shared no-op context manager.
+    """
+    request = _current.get()
+    if request is None:
+        return _NOOP_STAGE
+    return _Stage(request, name)
+
+
+def current_request() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def count(name: str, value: float = 1):
+    request = _current.get()
+    if request is not None:
+        request.count(name, value)
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+
+class MetricsRegistry:
+    """
+    Process-wide metrics with Prometheus text exposition. When disabled,
+    `collect()` yields None and every `stage()` / `count()` call in the
+    pipeline short-circuits to a no-op.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+        self.stage_seconds = self.histogram(
+            "pr_stage_seconds", "Time spent in each pipeline stage."
+        )
+        self.request_seconds = self.histogram(
+            "pr_request_seconds", "End-to-end request latency."
+        )
+        self.requests = self.counter("pr_requests_total", "Requests served.")
+
+    @classmethod
+    def from_env(cls) -> "MetricsRegistry":
+        return cls(enabled=os.getenv("PR_METRICS", "1") not in ("0", "false", "off"))
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help, buckets))
+
+    @contextmanager
+    def collect(self) -> Iterator[Optional[RequestMetrics]]:
+        if not self.enabled:
+            yield None
+            return
+
+        request = RequestMetrics()
+        token = _current.set(request)
+        try:
+            yield request
+        finally:
+            _current.reset(token)
+
+    def record(self, request: Optional[RequestMetrics], endpoint: str, seconds: float):
+        """
+        Folds one finished request into the process-wide metrics.
+        """
+        if request is None:
+            return
+
+        self.requests.inc(endpoint=endpoint)
+        self.request_seconds.observe(seconds, endpoint=endpoint)
+        for name, stage_seconds in request.stages.items():
+            self.stage_seconds.observe(stage_seconds, stage=name)
+        for name, value in request.counts.items():
+            self.counter(f"pr_{name}_total", f"Total {name.replace('_', ' ')}.").inc(value)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+
+registry = MetricsRegistry.from_env()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# -----------------------------
+# Internal helpers
+# -----------------------------
+
+def _labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    parts = []
+    for name, value in key:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
@@ -0,0 +1,442 @@
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from core.diff_parser import (
+    GitDiffParser,
+    FileDiff,
+    iter_byte_lines,
+    iter_text_lines,
+)
+from core.deadline import DEADLINE_REASON, Deadline
+from core.diff_semantics import DiffSemanticAnalyzer, FileSemantics
+from core.diff_stats import DiffStats
+from core.issue_parser import IssueParser, IssueIntent
+from core.change_classifier import ChangeClassifier, ChangeClassification
+from core.impact_analyzer import ImpactAnalyzer
+from core.move_detector import MoveDetector
+from core.sharded import ShardedDiffAnalyzer
+from core.file_filter import FileFilter
+
+from explanation.context_writer import ContextWriter
+from explanation.change_writer import ChangeWriter
+from explanation.impact_writer import ImpactWriter
+
+from formatter.checklist_builder import ChecklistBuilder
+from formatter.markdown_builder import MarkdownBuilder, SECTIONS
+from formatter.template_engine import CompiledTemplate, compile_template
+from formatter.template_registry import TemplateRegistry
+
+from cache.incremental import IncrementalAnalyzer
+
+from metrics import count, stage
+
+
+templates = TemplateRegistry()
+
+# Only fans out for very large diffs; see ShardedDiffAnalyzer
+sharded = ShardedDiffAnalyzer(
+    workers=int(os.getenv("PR_SHARD_WORKERS", 0)),
+    min_bytes=int(os.getenv("PR_SHARD_MIN_BYTES", 8 * 1024 * 1024)),
+    min_files=int(os.getenv("PR_SHARD_MIN_FILES", 64)),
+)
+
+# Generated / vendored / binary / pathological files are only counted
+file_filter = FileFilter.from_env()
+
+# Moved blocks and whitespace-only edits are left out of churn and logic
+move_detector = MoveDetector(
+    min_block_lines=int(os.getenv("PR_MOVE_MIN_LINES", 3)),
+    min_block_chars=int(os.getenv("PR_MOVE_MIN_CHARS", 24)),
+)
+
+# Issue text read for intent; pasted code, logs and quotes are skipped
+ISSUE_PROSE_BYTES = int(os.getenv("PR_ISSUE_PROSE_BYTES", 64 * 1024))
+ISSUE_SCAN_BYTES = int(os.getenv("PR_ISSUE_SCAN_BYTES", 256 * 1024))
+
+
+@dataclass
+class PipelineResult:
+    title: str
+    summary: str
+    parsed_diff: Dict[str, FileDiff]
+    semantics: Dict[str, FileSemantics]
+    issue: IssueIntent
+    classification: ChangeClassification
+    analysis_id: Optional[str] = None
+    recomputed: List[str] = field(default_factory=list)
+    stats: Optional[DiffStats] = None
+    # Rendered section bodies, keyed like SECTIONS
+    sections: Dict[str, str] = field(default_factory=dict)
+    # The time budget ran out; some files are only counted
+    partial: bool = False
+
+    @property
+    def markdown(self) -> str:
+        return self.summary
+
+
+DiffSource = Union[str, bytes, Iterable[str]]
+
+
+def generate_pr_markdown(
+    diff_text: DiffSource,
+    issue: str = "",
+    files: Optional[List[str]] = None,
+    payload: Optional[Dict] = None,
+    template: Union[str, CompiledTemplate, None] = None,
+    incremental: Optional[IncrementalAnalyzer] = None,
+    previous_analysis: Optional[str] = None,
+    file_contents: Optional[Dict[str, str]] = None,
+    gitattributes: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+) -> PipelineResult:
+    """
+    parse -> semantics -> classify -> render, without any HTTP layer.
+
+    `diff_text` may be a str, raw bytes or any iterable of lines.
+    `files` restricts the output to those paths. Without `template` the
+    registry's "base" template is used, honouring per-repo overrides for
+    `payload["owner"]/payload["repo"]`. With `incremental`, only files
+    changed since `previous_analysis` are re-analysed. `file_contents`
+    (path -> full new file) sharpens function attribution for those
+    files; section headers in the diff are used otherwise.
+    `gitattributes` adds the repository's `linguist-generated` /
+    `linguist-vendored` / `binary` rules to the file filter.
+    Past `deadline` the remaining files are only counted and the result
+    is marked `partial`.
+    """
+    template = _resolve_template(template, payload)
+    active_filter = _filter_for(gitattributes or "")
+
+    # -----------------------------
+    # Core analysis
+    # -----------------------------
+    analysis_id = None
+
+    if isinstance(diff_text, (str, bytes)):
+        count("diff_bytes", len(diff_text))
+
+    if incremental is not None:
+        previous = incremental.get_handle(previous_analysis)
+        with stage("analyze"):
+            if _should_shard(diff_text, file_contents):
+                analysis = incremental.analyze_sharded(
+                    sharded, diff_text, previous, active_filter, deadline
+                )
+            else:
+                analysis = incremental.analyze_lines(
+                    _iter_lines(diff_text),
+                    previous=previous,
+                    file_filter=active_filter,
+                    deadline=deadline,
+                    file_contents=file_contents,
+                )
+        parsed_diff = analysis.parsed_diff
+        recomputed = analysis.recomputed
+        analysis_id = analysis.handle.analysis_id
+        # Handles keep per-file semantics; moves depend on the whole diff
+        semantics, stats = _exclude_moves(
+            parsed_diff, analysis.semantics, analysis.stats, file_contents, deadline
+        )
+    else:
+        parsed_diff, semantics, stats = _analyze(
+            diff_text, active_filter, file_contents, deadline
+        )
+        recomputed = list(semantics.keys())
+
+    count("diff_files", len(parsed_diff))
+    count("diff_lines", int(stats.additions.sum() + stats.deletions.sum()))
+
+    if files:
+        # Accepts plain paths or GitHub "files" API entries
+        wanted = {f if isinstance(f, str) else f.get("filename") for f in files}
+        parsed_diff = {k: v for k, v in parsed_diff.items() if k in wanted}
+        semantics = {k: v for k, v in semantics.items() if k in wanted}
+        recomputed = [name for name in recomputed if name in wanted]
+        stats = stats.select(wanted)
+
+    result = build_result(parsed_diff, semantics, issue, template, stats, deadline=deadline)
+    result.analysis_id = analysis_id
+    result.recomputed = recomputed
+    return result
+
+
+def iter_pr_events(
+    diff_text: DiffSource,
+    issue: str = "",
+    payload: Optional[Dict] = None,
+    template: Union[str, CompiledTemplate, None] = None,
+    gitattributes: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    `generate_pr_markdown` as a sequence of (event, data) pairs, each
+    yielded as soon as its inputs exist:
+
+        issue       summary / intent / constraints, before the diff is read
+        file        one "What Changed" entry per file, as it is analysed
+        title, context, impact, checklist
+                    once every file is in (they depend on the whole diff)
+        done        title and the assembled markdown, identical to
+                    `generate_pr_markdown(...).summary`, and `partial`
+    """
+    template = _resolve_template(template, payload)
+    active_filter = _filter_for(gitattributes or "")
+
+    intent = parse_issue(issue)
+    yield "issue", {
+        "summary": intent.summary,
+        "intent": intent.intent,
+        "constraints": intent.constraints,
+    }
+
+    if isinstance(diff_text, (str, bytes)):
+        count("diff_bytes", len(diff_text))
+
+    parser = GitDiffParser(file_filter=active_filter, deadline=deadline)
+    writer = ChangeWriter({})
+    parsed_diff: Dict[str, FileDiff] = {}
+    semantics: Dict[str, FileSemantics] = {}
+
+    for file_diff in parser.iter_files(_iter_lines(diff_text)):
+        filename = file_diff.filename
+        with stage("analyze"):
+            # Reformatting and moves within the file; moves between files
+            # are only known once the whole diff is in
+            moves = move_detector.detect({filename: file_diff})
+            analyzer = DiffSemanticAnalyzer({}, deadline=deadline, moves=moves)
+            file_semantics = analyzer.analyze_file(filename, file_diff)
+        parsed_diff[filename] = file_diff
+        semantics[filename] = file_semantics
+
+        if file_semantics.skip_reason:
+            markdown = writer.skipped_entry(file_semantics)
+        else:
+            markdown = "\n".join(writer.write_file(filename, file_semantics))
+        yield "file", {
+            "filename": filename,
+            "markdown": markdown,
+            "additions": file_diff.additions,
+            "deletions": file_diff.deletions,
+            "skip_reason": file_semantics.skip_reason,
+        }
+
+    stats = parser.stats.build()
+    count("diff_files", len(parsed_diff))
+    count("diff_lines", int(stats.additions.sum() + stats.deletions.sum()))
+    semantics, stats = _exclude_moves(parsed_diff, semantics, stats, deadline=deadline)
+
+    result = build_result(
+        parsed_diff, semantics, issue, template, stats, issue_intent=intent, deadline=deadline
+    )
+
+    yield "title", {"title": result.title}
+    for name in ("context", "impact", "checklist"):
+        yield name, {"markdown": result.sections[name]}
+    yield "done", {
+        "title": result.title,
+        "summary": result.summary,
+        "analysis_id": None,
+        "recomputed_files": list(semantics),
+        "partial": result.partial,
+    }
+
+
+def _analyze(
+    diff_text: DiffSource,
+    active_filter: FileFilter,
+    file_contents: Optional[Dict[str, str]] = None,
+    deadline: Optional[Deadline] = None,
+):
+    if isinstance(diff_text, str):
+        if _should_shard(diff_text, file_contents):
+            with stage("analyze"):
+                parsed_diff, semantics, stats = sharded.run(diff_text, active_filter, deadline)
+            # Moves may cross shards
+            semantics, stats = _exclude_moves(parsed_diff, semantics, stats, deadline=deadline)
+            return parsed_diff, semantics, stats
+        parser = GitDiffParser(diff_text, active_filter, deadline)
+        with stage("parse"):
+            parsed_diff = parser.parse()
+    else:
+        parsed_diff = {}
+        parser = GitDiffParser(file_filter=active_filter, deadline=deadline)
+        with stage("parse"):
+            for file_diff in parser.iter_files(_iter_lines(diff_text)):
+                parsed_diff[file_diff.filename] = file_diff
+
+    with stage("moves"):
+        moves = move_detector.detect(parsed_diff)
+    with stage("semantics"):
+        semantics = DiffSemanticAnalyzer(parsed_diff, file_contents, deadline, moves).analyze()
+    return parsed_diff, semantics, parser.stats.build().with_moves(moves)
+
+
+def _exclude_moves(
+    parsed_diff: Dict[str, FileDiff],
+    semantics: Dict[str, FileSemantics],
+    stats: DiffStats,
+    file_contents: Optional[Dict[str, str]] = None,
+    deadline: Optional[Deadline] = None,
+) -> Tuple[Dict[str, FileSemantics], DiffStats]:
+    """
+    Moves for semantics computed file by file: only files with moved or
+    reformatted lines are analysed again. Returns new (semantics, stats);
+    the inputs are left as they were.
+    """
+    with stage("moves"):
+        moves = move_detector.detect(parsed_diff)
+    if not moves:
+        return semantics, stats
+
+    file_contents = file_contents or {}
+    analyzer = DiffSemanticAnalyzer(parsed_diff, file_contents, deadline, moves)
+    semantics = dict(semantics)
+    with stage("semantics"):
+        for filename in moves:
+            if semantics[filename].skip_reason is None:
+                semantics[filename] = analyzer.analyze_file(
+                    filename, parsed_diff[filename], file_contents.get(filename)
+                )
+    return semantics, stats.with_moves(moves)
+
+
+def _should_shard(
+    diff_text: DiffSource,
+    file_contents: Optional[Dict[str, str]] = None,
+) -> bool:
+    # Shards are cut from the text; streamed input is parsed as it arrives
+    return (
+        isinstance(diff_text, str)
+        and not file_contents
+        and sharded.should_parallelize(diff_text)
+    )
+
+
+def _iter_lines(diff_text: DiffSource) -> Iterable[str]:
+    if isinstance(diff_text, str):
+        return iter_text_lines(diff_text)
+    if isinstance(diff_text, (bytes, bytearray, memoryview)):
+        return iter_byte_lines([bytes(diff_text)])
+    return diff_text
+
+
+@lru_cache(maxsize=64)
+def _filter_for(gitattributes: str) -> FileFilter:
+    if not gitattributes:
+        return file_filter
+    return file_filter.with_gitattributes(gitattributes)
+
+
+def _resolve_template(
+    template: Union[str, CompiledTemplate, None],
+    payload: Optional[Dict],
+) -> CompiledTemplate:
+    if isinstance(template, CompiledTemplate):
+        return template
+    if template is not None:
+        return _compile_inline(template)
+
+    repo = None
+    if payload and payload.get("owner") and payload.get("repo"):
+        repo = f"{payload['owner']}/{payload['repo']}"
+    return templates.get("base", repo=repo)
+
+
+@lru_cache(maxsize=32)
+def _compile_inline(text: str) -> CompiledTemplate:
+    return compile_template(text, known=SECTIONS)
+
+
+def build_result(
+    parsed_diff: Dict[str, FileDiff],
+    semantics: Dict[str, FileSemantics],
+    issue_text: str,
+    template: CompiledTemplate,
+    stats: Optional[DiffStats] = None,
+    issue_intent: Optional[IssueIntent] = None,
+    deadline: Optional[Deadline] = None,
+) -> PipelineResult:
+    """
+    Issue parsing, classification and rendering over an analysed diff.
+    `stats` is the parser's per-file table; it is rebuilt from
+    `parsed_diff` when not given. `issue_intent` skips re-parsing an
+    issue that was already parsed. Writers stop adding detail once
+    `deadline` is overrun.
+    """
+    if stats is None:
+        stats = DiffStats.from_files(parsed_diff.values())
+
+    first_file = next(iter(parsed_diff.keys())) if parsed_diff else "unknown"
+
+    issue = issue_intent if issue_intent is not None else parse_issue(issue_text)
+
+    with stage("classify"):
+        classifier = ChangeClassifier(issue, semantics)
+        classification = classifier.classify()
+
+    impact = ImpactAnalyzer(stats)
+
+    # -----------------------------
+    # Explanation layers
+    # -----------------------------
+    with stage("writers"):
+        context = ContextWriter(issue, classification).write()
+        changes = ChangeWriter(semantics, deadline).write()
+        impact_text = ImpactWriter(impact, classification).write()
+        checklist = ChecklistBuilder(classification).build()
+
+    # -----------------------------
+    # Markdown assembly (summary)
+    # -----------------------------
+    with stage("render"):
+        builder = MarkdownBuilder(template)
+
+        sections = {
+            "context": context,
+            "changes": changes,
+            "impact": impact_text,
+            "checklist": checklist,
+        }
+        summary_md = builder.build(sections)
+
+    return PipelineResult(
+        title=make_title(classification, issue, first_file),
+        summary=summary_md,
+        parsed_diff=parsed_diff,
+        semantics=semantics,
+        issue=issue,
+        classification=classification,
+        stats=stats,
+        sections=sections,
+        partial=(deadline is not None and deadline.triggered) or any(
+            s.skip_reason == DEADLINE_REASON for s in semantics.values()
+        ),
+    )
+
+
+def parse_issue(issue_text: str) -> IssueIntent:
+    with stage("issue"):
+        return IssueParser(
+            issue_text,
+            max_prose_bytes=ISSUE_PROSE_BYTES,
+            max_scan_bytes=ISSUE_SCAN_BYTES,
+        ).parse()
+
+
+def make_title(
+    classification: ChangeClassification,
+    issue: IssueIntent,
+    first_file: str
+) -> str:
+    title_prefix = classification.change_type.title()
+
+    if classification.change_type == "refactor":
+        return f"Refactor: formatting cleanup in {first_file}"
+    if classification.change_type == "bug fix":
+        return f"Fix: {issue.summary.lower()}"
+    if classification.change_type == "feature":
+        return f"Feature: {issue.summary}"
+    return f"{title_prefix}: update {first_file}"
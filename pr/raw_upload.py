@@ -0,0 +1,130 @@
+import asyncio
+import zlib
+from typing import AsyncIterable, AsyncIterator, Iterator
+
+from metrics import count
+
+
+GZIP_ENCODINGS = ("gzip", "x-gzip")
+
+# Upper bound on the output of one decompress() call, so a small chunk of
+# a gzip bomb can't inflate far past the size limit before it's checked
+INFLATE_STEP = 1024 * 1024
+
+
+class BodyTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Diff exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+class UnreadableBody(Exception):
+    """
+    The compressed body is corrupt or truncated.
+    """
+
+
+def make_inflater(content_encoding: str = ""):
+    """
+    Decompressor for a `Content-Encoding` value, or None for identity.
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding in GZIP_ENCODINGS:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompressobj()
+    if encoding == "identity":
+        return None
+    raise UnsupportedEncoding(f"Unsupported Content-Encoding: {content_encoding}")
+
+
+async def limited_body(
+    chunks: AsyncIterable[bytes],
+    max_bytes: int,
+    inflater=None
+) -> AsyncIterator[bytes]:
+    """
+    Yields the decoded request body, raising `BodyTooLarge` as soon as
+    either the received or the decompressed size passes `max_bytes` and
+    `UnreadableBody` if it doesn't inflate.
+    """
+    received = 0
+    produced = 0
+
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise BodyTooLarge(max_bytes)
+
+        if inflater is None:
+            produced = received
+            yield chunk
+            continue
+
+        data = chunk
+        while data:
+            out = _inflate(inflater.decompress, data, INFLATE_STEP)
+            produced += len(out)
+            if produced > max_bytes:
+                raise BodyTooLarge(max_bytes)
+            if out:
+                yield out
+            data = inflater.unconsumed_tail
+
+    if inflater is not None:
+        out = _inflate(inflater.flush)
+        produced += len(out)
+        if produced > max_bytes:
+            raise BodyTooLarge(max_bytes)
+        if out:
+            yield out
+        if not inflater.eof:
+            raise UnreadableBody("Truncated compressed body")
+
+    count("diff_bytes", produced)
+
+
+def _inflate(method, *args) -> bytes:
+    try:
+        return method(*args)
+    except zlib.error as exc:
+        raise UnreadableBody(str(exc)) from exc
+
+
+class StreamBridge:
+    """
+    Hands an async byte stream to synchronous code running in a worker
+    thread. The queue is bounded, so a slow parser applies backpressure
+    to the upload instead of buffering it.
+    """
+
+    _DONE = object()
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int = 16):
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(max_chunks)
+
+    async def pump(self, chunks: AsyncIterable[bytes]):
+        try:
+            async for chunk in chunks:
+                await self._queue.put(chunk)
+        except Exception as exc:
+            # Re-raised on the consuming thread
+            await self._queue.put(exc)
+        else:
+            await self._queue.put(self._DONE)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(
+                self._queue.get(), self._loop
+            ).result()
+            if item is self._DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Tuple
+
+
+SSE_CONTENT_TYPE = "text/event-stream"
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+Event = Tuple[str, Dict]
+
+
+def encode_sse(event: str, data: Dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def encode_ndjson(event: str, data: Dict) -> bytes:
+    return (json.dumps({"event": event, "data": data}) + "\n").encode("utf-8")
+
+
+def negotiate(accept: str) -> Tuple[str, Callable[[str, Dict], bytes]]:
+    """
+    (media type, encoder) for an `Accept` header; SSE unless the client
+    asks for NDJSON.
+    """
+    if NDJSON_CONTENT_TYPE in (accept or "") and SSE_CONTENT_TYPE not in accept:
+        return NDJSON_CONTENT_TYPE, encode_ndjson
+    return SSE_CONTENT_TYPE, encode_sse
+
+
+class EventStream:
+    """
+    Runs a synchronous event producer on its own thread and hands the
+    encoded events to the event loop.
+
+    Consecutive events of a kind listed in `coalesce` are sent as one
+    chunk, flushed by the first event that pushes it past
+    `max_batch_bytes` or arrives `max_batch_delay` seconds after it
+    started, so tens of thousands of per-file events don't cost one
+    loop hop each. The queue is bounded; if the client goes away the
+    producer is told to stop at its next event.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self,
+        produce: Callable[[], Iterable[Event]],
+        encode: Callable[[str, Dict], bytes],
+        coalesce: Tuple[str, ...] = ("file",),
+        max_batch_bytes: int = 64 * 1024,
+        max_batch_delay: float = 0.05,
+        max_chunks: int = 16,
+    ):
+        self.produce = produce
+        self.encode = encode
+        self.coalesce = coalesce
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_delay = max_batch_delay
+        self.max_chunks = max_chunks
+        self._cancelled = threading.Event()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(self.max_chunks)
+        thread = threading.Thread(
+            target=self._run, args=(loop, queue), name="pr-event-stream", daemon=True
+        )
+        thread.start()
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is self._DONE:
+                    return
+                if isinstance(item, BaseException):
+                    yield self.encode("error", {"detail": str(item)})
+                    return
+                yield item
+        finally:
+            self._cancelled.set()
+            # Unblock a producer waiting on a full queue
+            while not queue.empty():
+                queue.get_nowait()
+
+    def _run(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        def put(item) -> bool:
+            if self._cancelled.is_set():
+                return False
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+            return True
+
+        batch: List[bytes] = []
+        batch_bytes = 0
+        batch_started = 0.0
+
+        try:
+            for event, data in self.produce():
+                chunk = self.encode(event, data)
+
+                if event in self.coalesce:
+                    if not batch:
+                        batch_started = time.monotonic()
+                    batch.append(chunk)
+                    batch_bytes += len(chunk)
+                    if (
+                        batch_bytes < self.max_batch_bytes
+                        and time.monotonic() - batch_started < self.max_batch_delay
+                    ):
+                        continue
+                    chunk = b""
+
+                if batch:
+                    batch.append(chunk)
+                    chunk = b"".join(batch)
+                    batch = []
+                    batch_bytes = 0
+                if not put(chunk):
+                    return
+
+            if batch and not put(b"".join(batch)):
+                return
+            put(self._DONE)
+        except Exception as exc:
+            put(exc)
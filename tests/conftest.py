@@ -0,0 +1,6 @@
+import os
+import sys
+
+# pr/ modules import each other as top-level packages (core, cache, ...)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "pr"), ROOT]
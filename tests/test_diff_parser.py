@@ -0,0 +1,73 @@
+import pickle
+
+from core.diff_parser import KIND_ADDED, DiffHunk, GitDiffParser
+
+
+DIFF = """diff --git a/src/a.py b/src/a.py
+--- a/src/a.py
++++ b/src/a.py
+@@ -1,4 +1,4 @@ def run(x):
+ def run(x):
+-    return 1
++    return 2
++
+     # done
+@@ -10,2 +10,3 @@ def other():
+ def other():
++    pass
+"""
+
+
+def test_hunks_read_lines_from_one_shared_store():
+    (file_diff,) = GitDiffParser(DIFF).parse().values()
+    first, second = file_diff.hunks
+
+    assert first.added_lines == ["    return 2", ""]
+    assert first.removed_lines == ["    return 1"]
+    assert first.context_lines == [" def run(x):", "     # done"]
+    assert bytes(first.line_kinds) == b"\x00\x02\x01\x01\x00"
+    assert first.text(KIND_ADDED) == "    return 2\n\n"
+    assert second.added_lines == ["    pass"]
+    assert first._store is second._store
+
+
+def test_hunk_from_lists_and_pickle_round_trip():
+    hunk = DiffHunk(1, 1, 1, 2, added_lines=["a", "b"], removed_lines=["c"])
+
+    assert bytes(hunk.line_kinds) == b"\x02\x01\x01"
+    assert hunk.context_lines == []
+
+    parsed = GitDiffParser(DIFF).parse()
+    assert pickle.loads(pickle.dumps(parsed)) == parsed
+
+
+DELETED = """diff --git a/f.py b/f.py
+--- a/f.py
++++ b/f.py
+@@ -1,1 +1,2 @@
+ a = 1
++b = 2
+diff --git a/gone.txt b/gone.txt
+deleted file mode 100644
+index 814f4a4..0000000
+--- a/gone.txt
++++ /dev/null
+@@ -1,2 +0,0 @@
+-one
+-two
+"""
+
+
+def test_deleted_file_is_parsed_and_counted():
+    from pipeline import generate_pr_markdown
+
+    parser = GitDiffParser(DELETED)
+    parsed = parser.parse()
+
+    assert list(parsed) == ["f.py", "gone.txt"]
+    assert parsed["gone.txt"].deletions == 2
+    assert parsed["gone.txt"].hunks[0].removed_lines == ["one", "two"]
+    assert int(parser.stats.build().deletions.sum()) == 2
+
+    result = generate_pr_markdown(DELETED, "")
+    assert "2 files, +1/-2 lines" in result.markdown
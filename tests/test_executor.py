@@ -0,0 +1,67 @@
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+import executor
+from executor import ExecutorCrashed, PipelineExecutor
+from pipeline import templates
+
+
+DIFF = """diff --git a/src/a.py b/src/a.py
+--- a/src/a.py
++++ b/src/a.py
+@@ -1,3 +1,3 @@ def run(x):
+ def run(x):
+-    return 1
++    return 2
+"""
+
+
+def _die(*args):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+@pytest.fixture
+def pool_executor():
+    pool_executor = PipelineExecutor(mode="process", workers=1, inline_max_bytes=0)
+    pool_executor.start()
+    yield pool_executor
+    pool_executor.shutdown()
+
+
+def _run(pool_executor):
+    return asyncio.run(
+        pool_executor.run(DIFF, "", templates.get("base"), inline=None)
+    )
+
+
+def test_pool_broken_between_runs_is_replaced(pool_executor):
+    broken = pool_executor._pool
+    for pid in list(broken._processes):
+        os.kill(pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not broken._broken and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    result = _run(pool_executor)
+
+    assert result["recomputed_files"] == ["src/a.py"]
+    assert pool_executor._pool is not broken
+
+
+def test_worker_dying_mid_run_fails_only_that_run(pool_executor, monkeypatch):
+    broken = pool_executor._pool
+    monkeypatch.setattr(executor, "_run_from_text", _die)
+
+    with pytest.raises(ExecutorCrashed):
+        _run(pool_executor)
+
+    monkeypatch.undo()
+    result = _run(pool_executor)
+
+    assert result["recomputed_files"] == ["src/a.py"]
+    assert pool_executor._pool is not broken
+    assert pool_executor._pending == 0
@@ -0,0 +1,16 @@
+import os
+import stat
+import tempfile
+
+import git_source
+
+
+def test_funcname_attributes_live_in_a_private_directory():
+    path = git_source._funcname_attributes()
+    directory = os.path.dirname(path)
+
+    assert os.path.dirname(directory) == tempfile.gettempdir()
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert os.stat(directory).st_uid == os.getuid()
+    assert "*.py diff=python\n" in open(path, encoding="ascii").read()
+    assert git_source._funcname_attributes() == path
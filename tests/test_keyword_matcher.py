@@ -0,0 +1,26 @@
+from core.languages import languages
+
+
+def _hits(language: str, lines) -> int:
+    matcher = languages.get(language).matcher
+    return matcher.scan(matcher.meaningful(lines)).logic_hits
+
+
+def test_javascript_keywords_match_whole_words():
+    assert _hits("javascript", ["const entry = retry(x);", "elsewhere();"]) == 0
+    assert _hits("javascript", ["try {", "} catch (e) {", "} else {"]) == 3
+
+
+def test_python_keywords_keep_substring_semantics():
+    # "for " also contains "or ", "elif " also contains "if "
+    assert _hits("python", ["for x in color:"]) == 2
+    assert _hits("python", ["elif a or b:"]) == 3
+
+
+def test_bulk_scan_matches_per_line_scan():
+    lines = ["if (entry && retry) {", "} else {", "return x ?? y;", "for (;;) {}"]
+    for language in ("python", "javascript", "go"):
+        matcher = languages.get(language).matcher
+        meaningful = matcher.meaningful(lines)
+        per_line = sum(matcher.scan_line(line).logic_hits for line in meaningful)
+        assert matcher.scan(meaningful).logic_hits == per_line
@@ -0,0 +1,54 @@
+from pipeline import generate_pr_markdown
+
+
+def _diff(filename: str, header: str, removed: str, added: str, context: str = "") -> str:
+    lines = [
+        f"diff --git a/{filename} b/{filename}",
+        f"--- a/{filename}",
+        f"+++ b/{filename}",
+        f"@@ -1,3 +1,3 @@ {header}",
+        f" {header}",
+        f"-{removed}",
+        f"+{added}",
+    ]
+    if context:
+        lines.append(f" {context}")
+    return "\n".join(lines) + "\n"
+
+
+def _only_formatting(diff_text: str) -> bool:
+    result = generate_pr_markdown(diff_text, "")
+    (semantics,) = result.semantics.values()
+    return semantics.only_formatting
+
+
+def test_whitespace_inside_string_literal_is_a_change():
+    diff_text = _diff("src/a.py", "def join(x):", '    sep = " "', '    sep = ""', "    return sep.join(x)")
+
+    assert not _only_formatting(diff_text)
+    assert "formatting cleanup" not in generate_pr_markdown(diff_text, "").title
+
+
+def test_python_reindent_into_block_is_a_change():
+    diff_text = (
+        "diff --git a/src/a.py b/src/a.py\n"
+        "--- a/src/a.py\n"
+        "+++ b/src/a.py\n"
+        "@@ -1,4 +1,4 @@ def run(x):\n"
+        " def run(x):\n"
+        "     if x:\n"
+        "         y = 1\n"
+        "-    return compute(x)\n"
+        "+        return compute(x)\n"
+    )
+
+    assert not _only_formatting(diff_text)
+
+
+def test_yaml_reindent_is_a_change():
+    assert not _only_formatting(_diff("ci.yml", "build:", "  steps: []", "    steps: []"))
+
+
+def test_whitespace_runs_outside_strings_are_formatting():
+    assert _only_formatting(_diff("src/a.js", "function f(a) {", "  return g(a,   b);", "    return g(a, b);", "}"))
+    assert _only_formatting(_diff("src/a.py", "def run(x):", "    return compute(x,   y)   ", "    return compute(x, y)"))
@@ -0,0 +1,59 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import pr_control
+from app.github_client import GitHubClient
+
+
+PR_FILES = [
+    {
+        "filename": "src/a.py",
+        "status": "modified",
+        "patch": "@@ -1,3 +1,3 @@ def run(x):\n def run(x):\n-    return 1\n+    return 2",
+    },
+    {"filename": "src/new.py", "status": "added", "patch": "@@ -0,0 +1 @@\n+VALUE = 1"},
+    {"filename": "logo.png", "status": "added"},
+]
+
+
+class _Files(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps(PR_FILES).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def github(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Files)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(
+        pr_control, "_github", GitHubClient(base_url=f"http://127.0.0.1:{server.server_port}")
+    )
+    yield
+    pr_control.close_github_client()
+    server.shutdown()
+
+
+def test_github_diff_rebuilds_file_headers():
+    diff = pr_control.github_diff(PR_FILES)
+
+    assert "--- /dev/null\n+++ b/src/new.py\n@@ -0,0 +1 @@\n+VALUE = 1\n" in diff
+    assert "logo.png" not in diff
+
+
+def test_payload_without_diff_fetches_the_pr_files(github):
+    result = pr_control.pr_controller({"owner": "o", "repo": "r", "pr_number": 7})
+
+    assert result["status"] == "success"
+    assert "2 files, +2/-1 lines" in result["pr_content"]
+    assert "### `src/new.py`" in result["pr_content"]
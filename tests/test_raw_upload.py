@@ -0,0 +1,51 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+
+DIFF = b"""diff --git a/src/a.py b/src/a.py
+--- a/src/a.py
++++ b/src/a.py
+@@ -1,3 +1,3 @@ def run(x):
+ def run(x):
+-    return 1
++    return 2
+"""
+
+
+@pytest.fixture
+def client():
+    return TestClient(api.app, raise_server_exceptions=False)
+
+
+def _post(client, body, content_type="application/gzip"):
+    return client.post(
+        "/generate-pr/raw", content=body, headers={"Content-Type": content_type}
+    )
+
+
+def test_gzip_body_is_inflated(client):
+    response = _post(client, gzip.compress(DIFF))
+
+    assert response.status_code == 200
+    assert response.json()["recomputed_files"] == ["src/a.py"]
+
+
+@pytest.mark.parametrize("body", [b"not gzip at all", gzip.compress(DIFF)[:-12]])
+def test_corrupt_or_truncated_body_is_a_client_error(client, body):
+    response = _post(client, body)
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Unreadable diff body")
+
+
+def test_pipeline_errors_are_not_blamed_on_the_body(client, monkeypatch):
+    def fail(*args):
+        raise ValueError("pipeline bug")
+
+    monkeypatch.setattr(api, "_build_pr", fail)
+
+    assert _post(client, DIFF, "text/x-diff").status_code == 500
@@ -0,0 +1,45 @@
+import sqlite3
+
+from cache.result_cache import SQLiteTier
+
+
+def _sum(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+
+def _total(tier):
+    return tier._conn.execute("SELECT total FROM results_size").fetchone()[0]
+
+
+def test_size_total_follows_inserts_replaces_and_evictions(tmp_path):
+    path = str(tmp_path / "cache.db")
+    tier = SQLiteTier(path, max_bytes=100)
+
+    assert tier.put("a", b"x" * 40) == 0
+    assert tier.put("a", b"x" * 30) == 0
+    assert tier.put("b", b"x" * 60) == 0
+    assert _total(tier) == _sum(path) == 90
+
+    assert tier.put("c", b"x" * 20) == 1
+    assert tier.get("a") is None
+    assert _total(tier) == _sum(path) == 80
+
+
+def test_size_total_is_shared_and_seeded_from_existing_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE results (key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO results VALUES ('old', x'00', 50, 0)")
+
+    first = SQLiteTier(path, max_bytes=100)
+    second = SQLiteTier(path, max_bytes=100)
+    first.put("a", b"x" * 30)
+
+    assert _total(second) == 80
+    assert second.put("b", b"x" * 30) == 1
+    assert second.get("old") is None
+    assert _total(first) == _sum(path) == 60
@@ -0,0 +1,58 @@
+import pytest
+
+from cache.incremental import IncrementalAnalyzer, pack_handle, unpack_handle
+from core import serialization
+from pipeline import generate_pr_markdown
+
+
+DIFF = """diff --git a/src/a.py b/src/a.py
+--- a/src/a.py
++++ b/src/a.py
+@@ -1,3 +1,3 @@ def run(x):
+ def run(x):
+-    return 1
++    return 2
+
+diff --git a/src/b.py b/src/b.py
+--- a/src/b.py
++++ b/src/b.py
+@@ -1,2 +1,3 @@ class B:
+ class B:
++    def go(self):
++        if self.ready: pass
+"""
+
+
+def test_round_trip():
+    result = generate_pr_markdown(DIFF, "")
+
+    parsed_diff, semantics = serialization.loads(
+        serialization.dumps(result.parsed_diff, result.semantics)
+    )
+
+    assert parsed_diff == result.parsed_diff
+    assert semantics == result.semantics
+
+
+def test_corrupt_record_raises_serialization_error():
+    result = generate_pr_markdown(DIFF, "")
+    data = bytearray(serialization.dumps(result.parsed_diff, result.semantics))
+    # Skip reason id of the first file record
+    offset = serialization._HEADER.size + 4
+    data[offset:offset + 4] = (0x0FFFFFFE).to_bytes(4, "little")
+
+    with pytest.raises(serialization.SerializationError):
+        serialization.loads(bytes(data))
+
+
+def test_packed_handle_carries_only_requested_semantics():
+    incremental = IncrementalAnalyzer()
+    previous = incremental.analyze(DIFF).handle
+    changed = incremental.analyze(DIFF.replace("return 2", "return 3"), previous=previous)
+
+    packed = pack_handle(changed.handle, changed.recomputed)
+
+    assert changed.recomputed == ["src/a.py"]
+    assert list(serialization.AnalysisArchive(packed[2]).all_semantics()) == ["src/a.py"]
+    assert unpack_handle(packed, previous) == changed.handle
+    assert unpack_handle(pack_handle(previous)) == previous